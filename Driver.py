@@ -5,30 +5,169 @@ from managers.np_manager import npManager
 from managers.Quest import Quest
 from units.Servant import Servant
 from units.Enemy import Enemy
-import logging
+import copy
 import re
+from collections import namedtuple
+from utils.log import init_logging
+from utils.trace import make_tracer
 
-# Configure logging
-logging.basicConfig(filename='./outputs/output.log', level=logging.INFO,
-                    format='%(asctime:s:%(levelname)s:%(message)s')
+# --- Token language -------------------------------------------------------
+# a-i: servant skills (servant = idx // 3, skill = idx % 3), optionally
+# followed by a target 1-3; j-l: mystic code skills, same targeting;
+# xAB: swap frontline A with backline B; 4-6: NPs; #: end turn.
+# Choice skills: a[Ch2A] and a([Ch2A]3) with a target.
+#
+# Tokens are parsed once into TokenActions: `kind` is one of skill,
+# mystic_code, swap, np, end_turn or invalid and `run` is a plain function of
+# (driver, *args), so executing a command list is a loop over prebuilt
+# tuples instead of rebuilding the grammar for every token.
+
+SKILL_LETTERS = 'abcdefghi'
+MC_LETTERS = 'jkl'
+NP_TOKENS = '456'
+
+TokenAction = namedtuple('TokenAction', ['token', 'kind', 'run', 'args', 'choice'])
+
+
+def _run_skill(driver, servant_idx, skill_idx):
+    return driver.skill_manager.use_skill(driver.game_manager.servants[servant_idx], skill_idx)
+
+
+def _run_targeted_skill(driver, servant_idx, skill_idx, target_idx):
+    servants = driver.game_manager.servants
+    return driver.skill_manager.use_skill(servants[servant_idx], skill_idx, servants[target_idx])
+
+
+def _run_choice_skill(driver, servant_idx, skill_idx, choice):
+    return driver.skill_manager.use_skill(driver.game_manager.servants[servant_idx], skill_idx, choice=choice)
+
+
+def _run_targeted_choice_skill(driver, servant_idx, skill_idx, target_idx, choice):
+    servants = driver.game_manager.servants
+    return driver.skill_manager.use_skill(servants[servant_idx], skill_idx, servants[target_idx], choice=choice)
+
+
+def _run_mystic_code(driver, skill_idx):
+    return driver.skill_manager.use_mystic_code_skill(skill_idx)
+
+
+def _run_targeted_mystic_code(driver, skill_idx, target_idx):
+    return driver.skill_manager.use_mystic_code_skill(skill_idx, driver.game_manager.servants[target_idx])
+
+
+def _run_swap(driver, *slots):
+    return driver.skill_manager.swap_servants(*slots)
+
+
+def _run_np(driver, servant_idx):
+    return driver.np_manager.use_np(driver.game_manager.servants[servant_idx])
+
+
+def _run_end_turn(driver):
+    return driver.turn_manager.end_turn()
+
+
+def _build_token_table():
+    table = {}
+    for idx, letter in enumerate(SKILL_LETTERS):
+        table[letter] = ('skill', _run_skill, (idx // 3, idx % 3))
+        for t in range(3):
+            table[f"{letter}{t+1}"] = ('skill', _run_targeted_skill, (idx // 3, idx % 3, t))
+    for idx, letter in enumerate(MC_LETTERS):
+        table[letter] = ('mystic_code', _run_mystic_code, (idx,))
+        for t in range(3):
+            table[f"{letter}{t+1}"] = ('mystic_code', _run_targeted_mystic_code, (idx, t))
+    for i in range(1, 4):
+        for j in range(1, 4):
+            table[f"x{i}{j}"] = ('swap', _run_swap, (i, j))
+    table['x'] = ('swap', _run_swap, ())
+    for idx, token in enumerate(NP_TOKENS):
+        table[token] = ('np', _run_np, (idx,))
+    table['#'] = ('end_turn', _run_end_turn, ())
+    return {token: TokenAction(token, kind, run, args, False) for token, (kind, run, args) in table.items()}
+
+
+TOKEN_TABLE = _build_token_table()
+
+_CHOICE_RE = re.compile(r"([a-i])\[Ch(\d+)([A-C])\]")
+_TARGETED_CHOICE_RE = re.compile(r"([a-i])\(\[Ch(\d+)([A-C])\](\d)\)")
+# Longest alternatives first so "a1" is not read as "a" followed by "1"
+_COMMAND_RE = re.compile(
+    r"\s*([a-i]\(\[Ch\d+[A-C]\]\d\)|[a-i]\[Ch\d+[A-C]\]|x[1-3][1-3]|[a-l][1-3]?|[x456#]|\S)"
+)
+
+
+def parse_token(token):
+    """Resolve a single token to a TokenAction (run is None if invalid)."""
+    action = TOKEN_TABLE.get(token)
+    if action is not None:
+        return action
+    match = _CHOICE_RE.match(token)
+    if match:
+        letter, choice_num, choice_letter = match.groups()
+        idx = SKILL_LETTERS.index(letter)
+        choice = (int(choice_num), ord(choice_letter) - ord('A'))
+        return TokenAction(token, 'skill', _run_choice_skill, (idx // 3, idx % 3, choice), True)
+    match = _TARGETED_CHOICE_RE.match(token)
+    if match:
+        letter, choice_num, choice_letter, target = match.groups()
+        idx = SKILL_LETTERS.index(letter)
+        choice = (int(choice_num), ord(choice_letter) - ord('A'))
+        return TokenAction(token, 'skill', _run_targeted_choice_skill, (idx // 3, idx % 3, int(target) - 1, choice), True)
+    return TokenAction(token, 'invalid', None, (), False)
+
+
+def tokenize(command_string):
+    """Split a command string such as "a b1 j2 4 #" or "ab14#" into tokens."""
+    return [match.group(1) for match in _COMMAND_RE.finditer(command_string) if match.group(1)]
+
+
+def parse_commands(commands):
+    """Parse a token list or a command string into a list of TokenActions."""
+    if isinstance(commands, str):
+        commands = tokenize(commands)
+    return [parse_token(token) for token in commands]
 
 class Driver:
-    def __init__(self, servant_init_dicts, quest_id, mc_id=260):
+    def __init__(self, servant_init_dicts, quest_id, mc_id=260, trace=None):
+        """trace is a utils.trace level ('off', 'summary', 'full', 'echo') or a
+        Tracer; by default SIM_TRACE, else 'echo'."""
+        init_logging()
+        self.tracer = make_tracer(trace)
         self.servant_init_dicts = servant_init_dicts  # List of dicts
         self.quest_id = quest_id
         self.mc_id = mc_id
         self.turn_manager = None
         self.skill_manager = None
         self.np_manager = None
-        self.game_manager = GameManager(self.servant_init_dicts, quest_id=self.quest_id, mc_id=self.mc_id)
+        self.game_manager = GameManager(self.servant_init_dicts, quest_id=self.quest_id, mc_id=self.mc_id, tracer=self.tracer)
         self.all_tokens = []
 
     def reset_state(self):
-        self.game_manager = GameManager(self.servant_init_dicts, self.quest_id, self.mc_id)
+        self.tracer.clear()
+        self.game_manager = GameManager(self.servant_init_dicts, self.quest_id, self.mc_id, tracer=self.tracer)
+        self.bind_managers()
+
+    def bind_managers(self):
         self.turn_manager = TurnManager(game_manager=self.game_manager)
         self.skill_manager = SkillManager(turn_manager=self.turn_manager)
         self.np_manager = npManager(skill_manager=self.skill_manager)
 
+    def snapshot(self):
+        return self.game_manager.snapshot()
+
+    def restore(self, snapshot):
+        # Managers hold a reference to the game manager, which is restored in place
+        self.game_manager.restore(snapshot)
+
+    def fork(self):
+        """Branch the simulation at the current token without replaying it."""
+        branch = copy.copy(self)
+        branch.game_manager = self.game_manager.fork()
+        branch.all_tokens = list(self.all_tokens)
+        branch.bind_managers()
+        return branch
+
     def decrement_cooldowns(self):
         for servant in self.game_manager.servants:
             for i in range(len(servant.skills.cooldowns)):
@@ -36,77 +175,31 @@ class Driver:
                     servant.skills.cooldowns[i] -= 1
 
     def execute_token(self, token):
-        # --- Programmatically generate standard tokens ---
-        token_actions = {}
-
-        # Servant skill tokens: a-i, with and without targets
-        skill_letters = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i']
-        for idx, letter in enumerate(skill_letters):
-            servant_idx = idx // 3
-            skill_idx = idx % 3
-            # No target
-            token_actions[letter] = lambda s=servant_idx, sk=skill_idx: self.skill_manager.use_skill(self.game_manager.servants[s], sk)
-            # With targets
-            for t in range(3):
-                token_actions[f"{letter}{t+1}"] = lambda s=servant_idx, sk=skill_idx, tgt=t: self.skill_manager.use_skill(self.game_manager.servants[s], sk, self.game_manager.servants[tgt])
-
-        # Mystic code skills: j, k, l, with and without targets
-        for idx, letter in enumerate(['j', 'k', 'l']):
-            token_actions[letter] = lambda i=idx: self.skill_manager.use_mystic_code_skill(i)
-            for t in range(3):
-                token_actions[f"{letter}{t+1}"] = lambda i=idx, tgt=t: self.skill_manager.use_mystic_code_skill(i, self.game_manager.servants[tgt])
-
-        # Swap tokens
-        for i in range(1, 4):
-            for j in range(1, 4):
-                token_actions[f"x{i}{j}"] = lambda a=i, b=j: self.skill_manager.swap_servants(a, b)
-        token_actions['x'] = lambda: self.skill_manager.swap_servants()
-
-        # NPs
-        for idx, np_token in enumerate(['4', '5', '6']):
-            token_actions[np_token] = lambda i=idx: self.np_manager.use_np(self.game_manager.servants[i])
-
-        # End turn
-        token_actions['#'] = lambda: self.turn_manager.end_turn()
-
-        # --- Handle choice tokens programmatically ---
-        # Pattern: a[Ch2A] (servant skill with choice, no target)
-        match = re.match(r"([a-i])\[Ch(\d+)([A-C])\]", token)
-        if match:
-            skill_map = {l: (i // 3, i % 3) for i, l in enumerate(skill_letters)}
-            s_letter, choice_num, choice_letter = match.groups()
-            servant_idx, skill_idx = skill_map[s_letter]
-            choice_idx = ord(choice_letter) - ord('A')
-
-            return self.skill_manager.use_skill(
-                self.game_manager.servants[servant_idx],
-                skill_idx,
-                choice=(int(choice_num), choice_idx)
-            )
-
-        # Pattern: a([Ch2A]3) (servant skill with choice and target)
-        match = re.match(r"([a-i])\(\[Ch(\d+)([A-C])\](\d)\)", token)
-        if match:
-            skill_map = {l: (i // 3, i % 3) for i, l in enumerate(skill_letters)}
-            s_letter, choice_num, choice_letter, target_idx = match.groups()
-            servant_idx, skill_idx = skill_map[s_letter]
-            choice_idx = ord(choice_letter) - ord('A')
-            target_idx = int(target_idx) - 1
-            return self.skill_manager.use_skill(
-                self.game_manager.servants[servant_idx],
-                skill_idx,
-                self.game_manager.servants[target_idx],
-                choice=(int(choice_num), choice_idx)
-            )
-
-        # --- Standard token execution ---
-        action = token_actions.get(token)
-        if action:
-            print(f"Executing TOKEN: {token}")
-            logging.info(f"Executing TOKEN: {token}")
-            retval = action()
-            if retval is False:
+        return self.execute_action(parse_token(token))
+
+    def execute_action(self, action):
+        """Run one parsed token; see parse_token()."""
+        tracer = self.tracer
+        if action.run is None:
+            if tracer.summary:
+                tracer.emit('invalid_token', token=action.token)
+            return self.game_manager
+        if action.choice:
+            # Choice tokens hand back whatever the skill returns
+            return action.run(self, *action.args)
+        if tracer.summary:
+            tracer.emit('token', token=action.token)
+        if action.run(self, *action.args) is False:
+            return False
+        return self.game_manager
+
+    def run_commands(self, commands):
+        """Execute a token list or command string, stopping at the first failure.
+
+        Returns the game manager, or False if a token failed.
+        """
+        execute_action = self.execute_action
+        for action in parse_commands(commands):
+            if execute_action(action) is False:
                 return False
-        else:
-            logging.info(f"Invalid token: {token}")
         return self.game_manager
@@ -1,17 +1,124 @@
-from pymongo import MongoClient
+"""MongoDB access for the API.
+
+The client is created on first use so the app imports without MONGO_URI;
+`db.client`, `db.servants_collection` etc. resolve through __getattr__.
+
+pymongo is synchronous, and the catalog endpoints are `async def`, so a
+query made directly in a handler blocks the event loop for its whole
+round-trip and concurrent requests serialize on it. Handlers instead
+`await db.run(fn, ...)`, which runs fn on a dedicated thread pool sized
+to the connection pool, so requests overlap their I/O up to the number
+of connections. Work that never touches the database (a fresh catalog
+or precompressed body) only pays a thread hand-off.
+
+Settings (environment):
+- MONGO_MAX_POOL_SIZE: connections per server (default 32); also the
+  number of I/O threads.
+- MONGO_MIN_POOL_SIZE: connections kept open while idle (default 4), so
+  the first requests after a quiet period skip the handshake.
+- MONGO_MAX_IDLE_TIME_MS: idle time before a connection above the
+  minimum is closed (default 300000).
+- MONGO_WAIT_QUEUE_TIMEOUT_MS: how long a query waits for a free
+  connection before failing (default 10000).
+- MONGO_SERVER_SELECTION_TIMEOUT_MS: how long to wait for a reachable
+  server (default 5000, instead of pymongo's 30000), so an outage fails
+  requests quickly.
+"""
+import asyncio
+import functools
 import os
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_lock = threading.Lock()
+_client = None
+_executor = None
+in_flight = 0
+
+
+def pool_options():
+    """MongoClient keyword arguments for the connection pool."""
+    return {
+        'maxPoolSize': int(os.getenv('MONGO_MAX_POOL_SIZE', '32')),
+        'minPoolSize': int(os.getenv('MONGO_MIN_POOL_SIZE', '4')),
+        'maxIdleTimeMS': int(os.getenv('MONGO_MAX_IDLE_TIME_MS', '300000')),
+        'waitQueueTimeoutMS': int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '10000')),
+        'serverSelectionTimeoutMS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+    }
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from pymongo import MongoClient
+
+                # Initialize MongoDB client from environment
+                mongo_uri = os.getenv('MONGO_URI')
+                if not mongo_uri:
+                    raise ValueError("No MONGO_URI environment variable set")
+                # Reduce pymongo logging noise
+                logging.getLogger('pymongo').setLevel(logging.WARNING)
+                from utils.metrics import mongo_listener
+
+                _client = MongoClient(mongo_uri, event_listeners=[mongo_listener()], **pool_options())
+    return _client
+
+
+def get_db():
+    return get_client()['FGOCanItFarmDatabase']
+
+
+def io_threads():
+    return max(1, pool_options()['maxPoolSize'])
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=io_threads(), thread_name_prefix='mongo-io')
+    return _executor
+
+
+async def run(fn, *args, **kwargs):
+    """Await fn(*args, **kwargs) run on the database I/O threads."""
+    global in_flight
+    in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            _get_executor(), functools.partial(fn, *args, **kwargs))
+    finally:
+        in_flight -= 1
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def stats():
+    return {'in_flight': in_flight, 'io_threads': io_threads(), **pool_options()}
+
 
-# Initialize MongoDB client from environment
-mongo_uri = os.getenv('MONGO_URI')
-if not mongo_uri:
-    raise ValueError("No MONGO_URI environment variable set")
+_COLLECTIONS = {
+    'servants_collection': 'servants',
+    'quests_collection': 'quests',
+    'mysticcode_collection': 'mysticcodes',
+}
 
-client = MongoClient(mongo_uri)
-db = client['FGOCanItFarmDatabase']
-servants_collection = db['servants']
-quests_collection = db['quests']
-mysticcode_collection = db['mysticcodes']
 
-# Reduce pymongo logging noise
-logging.getLogger('pymongo').setLevel(logging.WARNING)
+def __getattr__(name):
+    if name == 'client':
+        return get_client()
+    if name == 'db':
+        return get_db()
+    if name in _COLLECTIONS:
+        return get_db()[_COLLECTIONS[name]]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,21 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 import os
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
 
-from sim_entry_points.traverse_api_input import traverse_api_input
+from sim_entry_points.clear_probability import validate_samples
+from sim_entry_points.search_commands import search_commands
+from units.Servant import sync_servant_cache, servant_cache
+from utils.metrics import registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
 from . import db
 from . import read_helpers
+from .sim_pool import SimulationPool, PoolFull, QueueTimeout
+from .result_cache import ResultCache, request_fingerprint, report_version, simulate_for_cache
+from .servant_catalog import ServantCatalog, SERVANT_LIST_PROJECTION
+from .static_responses import StaticResponse, source_signature
+from .quest_listing import (QUEST_DETAIL_PROJECTION, QUEST_PAGE_MAX, InvalidListing, iter_quests, quest_filter,
+                            quest_listing)
 
 app = FastAPI()
 
@@ -22,6 +31,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Read by the front end: quest listing pages and /simulate cache status
+    expose_headers=["X-Next-Cursor", "X-Result-Cache"],
 )
 
 
@@ -30,95 +41,221 @@ class SimRequest(BaseModel):
     Mystic_Code_ID: int
     Quest_ID: int
     Commands: list
+    # Monte Carlo samples of the 0.9-1.1 damage roll; adds clear_probability
+    Samples: Optional[int] = None
+    Seed: Optional[int] = None
+    # 'summary' or 'full' returns the engine trace as text lines; off by default
+    Trace: Optional[str] = None
+
+
+# Simulations run on a bounded pool so a slow run cannot stall the event
+# loop; when the queue is full callers get a 503 straight away.
+sim_pool = SimulationPool.from_env()
+
+# Repeat requests are answered from here without touching the pool; see
+# api/result_cache.py for what the key covers.
+result_cache = ResultCache.from_env()
+metrics_registry.register_cache('simulate_results', result_cache)
+
+
+@app.on_event("shutdown")
+def shutdown_sim_pool():
+    sim_pool.shutdown(wait=False)
+    result_cache.close()
+    db.shutdown()
 
 
 @app.post("/simulate")
-async def simulate(req: SimRequest):
-    # Run simulation synchronously — simulations are very fast (<0.5s)
+async def simulate(req: SimRequest, response: Response):
+    if req.Samples is not None:
+        try:
+            validate_samples(req.Samples)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    trace = req.Trace or 'off'
+    if trace not in ('off', 'summary', 'full'):
+        raise HTTPException(status_code=400, detail="Trace must be one of off, summary, full")
+    request = (req.Team, req.Mystic_Code_ID, req.Quest_ID, req.Commands, req.Samples, req.Seed, trace)
+    key = request_fingerprint(*request) if result_cache.enabled else None
+    cached = result_cache.get(key)
+    if cached is not None:
+        response.headers['X-Result-Cache'] = 'hit'
+        return {"result": cached}
+    try:
+        result, version = await sim_pool.run(simulate_for_cache, *request)
+    except (PoolFull, QueueTimeout) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '1'})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if result_cache.enabled:
+        # The run has loaded the game data (possibly in a worker process),
+        # so a first request gets a key now
+        report_version(req.Team, req.Mystic_Code_ID, req.Quest_ID, version)
+        result = result_cache.put(key or request_fingerprint(*request), result)
+        response.headers['X-Result-Cache'] = 'miss'
+    return {"result": result}
+
+
+@app.get('/api/simulate/stats')
+async def simulate_stats():
+    """Queue depth, wait times and rejection counts of the simulation pool,
+    and result cache hit rates."""
+    return dict(sim_pool.stats(), result_cache=result_cache.stats())
+
+
+def _pool_samples():
+    stats = sim_pool.stats()
+    yield 'fgo_sim_pool_in_flight', 'gauge', 'Simulations running or queued.', [({}, stats['in_flight'])]
+    yield 'fgo_sim_pool_queue_depth', 'gauge', 'Simulations waiting for a worker.', [({}, stats['queue_depth'])]
+    yield 'fgo_sim_pool_wait_max_seconds', 'gauge', 'Longest queue wait so far.', [({}, stats['wait_seconds']['max'])]
+    for outcome in ('submitted', 'completed', 'failed', 'rejected', 'timed_out'):
+        yield 'fgo_sim_pool_requests_total', 'counter', 'Simulation requests by outcome.', [({'outcome': outcome}, stats[outcome])]
+
+
+metrics_registry.register_collector(_pool_samples)
+
+
+def _db_samples():
+    yield 'fgo_mongo_io_in_flight', 'gauge', 'API database calls running or waiting for an I/O thread.', \
+        [({}, db.in_flight)]
+
+
+metrics_registry.register_collector(_db_samples)
+
+
+@app.get('/metrics')
+def metrics():
+    """Prometheus metrics; see utils/metrics.py. The first scrape turns
+    recording on unless SIM_METRICS says otherwise."""
+    return Response(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+# Upper bound for /search so a single request cannot occupy a worker forever
+SEARCH_TIME_LIMIT = float(os.getenv('SEARCH_TIME_LIMIT', '10'))
+
+
+class SearchRequest(BaseModel):
+    Team: list
+    Mystic_Code_ID: int
+    Quest_ID: int
+    Objective: str = 'shortest'
+    Max_Turns: Optional[int] = None
+    Time_Budget: Optional[float] = None
+    Max_Solutions: int = 1
+
+
+@app.post("/search")
+async def search(req: SearchRequest):
+    # A search can take seconds of CPU, so it shares the bounded simulation
+    # pool with /simulate and gets the same 503 when that is full
+    time_budget = min(req.Time_Budget or SEARCH_TIME_LIMIT, SEARCH_TIME_LIMIT)
     try:
-        result = traverse_api_input(
+        result = await sim_pool.run(
+            search_commands,
             req.Team,
             req.Mystic_Code_ID,
             req.Quest_ID,
-            req.Commands,
+            req.Objective,
+            req.Max_Turns,
+            time_budget,
+            req.Max_Solutions,
         )
+    except (PoolFull, QueueTimeout) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '1'})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    return {"result": result}
+    return result
+
+
+# Listing filters and name search are answered from memory; see
+# api/servant_catalog.py
+servant_catalog = ServantCatalog(lambda: db.servants_collection)
+
+MYSTIC_CODE_LIST_PROJECTION = {
+    '_id': 0,
+    'id': 1,
+    'name': 1,
+    'extraAssets.item.male': 1
+}
+
+
+def _quests_version():
+    return source_signature(db.quests_collection.find({}, {'_id': 0, 'id': 1, 'sourceHash': 1}), 'id')
+
+
+def _all_quests():
+    quests = list(iter_quests(db.quests_collection, {}))
+    if not quests:
+        raise Exception('No quests found in the database')
+    return quests
+
+
+def _war_long_names():
+    warLongNames = db.quests_collection.distinct('warLongName')
+    if not warLongNames:
+        raise Exception('No warLongNames found in the database')
+    return warLongNames
+
+
+# Unfiltered listings, served pre-serialized and pre-compressed with ETags
+# (api/static_responses.py). The servant list is versioned by the catalog
+# snapshot, which revalidates itself; mystic code documents carry no
+# sourceHash, so that body is rebuilt and compared on expiry.
+static_responses = {
+    'servants': StaticResponse(lambda: list(servant_catalog.current().rows),
+                               lambda: servant_catalog.current(), ttl=0),
+    'mysticcodes': StaticResponse(lambda: list(db.mysticcode_collection.find({}, MYSTIC_CODE_LIST_PROJECTION))),
+    'quests': StaticResponse(_all_quests, _quests_version),
+    'warLongNames': StaticResponse(_war_long_names, _quests_version),
+}
+
+
+def _warm_servants():
+    # db.client is available from api.db
+    db.client.admin.command('ping')
+    servant_catalog.current()
 
 
 @app.get('/api/servants')
-async def get_servants(rarity: Optional[List[int]] = Query(None), className: Optional[str] = '', npType: Optional[str] = '', attackType: Optional[str] = '', search: Optional[str] = '', team: Optional[List[int]] = Query(None), warm: Optional[bool] = False):
-    # Build query similar to Flask
+async def get_servants(request: Request, rarity: Optional[List[int]] = Query(None), className: Optional[str] = '', npType: Optional[str] = '', attackType: Optional[str] = '', search: Optional[str] = '', team: Optional[List[int]] = Query(None), warm: Optional[bool] = False):
     # Warm-up short-circuit: if warm=true, do a light DB ping to establish connections and return quickly.
     if warm:
         try:
             # ping the server to open connections / warm pools
-            # db.client is available from api.db
-            db.client.admin.command('ping')
+            await db.run(_warm_servants)
         except Exception:
             # Ignore any errors during warm so the client call remains fire-and-forget
             pass
         # Return an empty list quickly; the front-end ignores response content.
         return []
 
-    query = {'$and': []}
-
-    if rarity:
-        query['$and'].append({'rarity': {'$in': [int(r) for r in rarity]}})
-    if className:
-        class_list = className.split(',') if className else []
-        if class_list:
-            query['$and'].append({'className': {'$in': class_list}})
-    if npType:
-        np_list = npType.split(',') if npType else []
-        if np_list:
-            query['$and'].append({'noblePhantasms.card': {'$in': np_list}})
-    if attackType:
-        attack_list = attackType.split(',') if attackType else []
-        if attack_list:
-            query['$and'].append({'noblePhantasms.effectFlags': {'$in': attack_list}})
-    if search:
-        query['$and'].append({'name': {'$regex': search, '$options': 'i'}})
-
-    if not query['$and']:
-        query = {}
-
-    servants = list(db.servants_collection.find(query, {
-        '_id': 0,
-        'id': 1,
-        'name': 1,
-        'collectionNo': 1,
-        'className': 1,
-        'rarity': 1,
-        'noblePhantasms.card': 1,
-        'noblePhantasms.effectFlags': 1,
-        'extraAssets.faces.ascension.4': 1
-    }))
-
-    if team:
-        team_collection_nos = [int(no) for no in team]
-        filtered_servants = [servant for servant in servants if servant.get('collectionNo') not in team_collection_nos]
-    else:
-        filtered_servants = servants
-
-    return filtered_servants
+    if not (rarity or className or npType or attackType or search or team):
+        return await db.run(static_responses['servants'].respond, request)
+    return await db.run(
+        servant_catalog.query,
+        rarity=[int(r) for r in rarity] if rarity else None,
+        class_names=className.split(',') if className else None,
+        cards=npType.split(',') if npType else None,
+        effect_flags=attackType.split(',') if attackType else None,
+        search=search,
+        exclude=[int(no) for no in team] if team else None,
+    )
+
+
+def _servant_by_collection_no(collectionNo):
+    servant = servant_catalog.get(collectionNo)
+    if servant is None:
+        # Added since the catalog was last checked
+        servant = db.servants_collection.find_one({'collectionNo': collectionNo}, SERVANT_LIST_PROJECTION)
+    return servant
 
 
 @app.get('/api/servants/{collectionNo}')
 async def get_servant_by_collectionNo(collectionNo: int):
     try:
-        servant = db.servants_collection.find_one({'collectionNo': collectionNo}, {
-            '_id': 0,
-            'id': 1,
-            'name': 1,
-            'collectionNo': 1,
-            'className': 1,
-            'rarity': 1,
-            'noblePhantasms.card': 1,
-            'noblePhantasms.effectFlags': 1,
-            'extraAssets.faces.ascension.4': 1
-        })
+        servant = await db.run(_servant_by_collection_no, collectionNo)
         if servant:
             return servant
         else:
@@ -128,53 +265,52 @@ async def get_servant_by_collectionNo(collectionNo: int):
 
 
 @app.get('/api/mysticcodes')
-async def get_mysticcodes():
-    mysticcodes = list(db.mysticcode_collection.find({}, {
-        '_id': 0,
-        'id': 1,
-        'name': 1,
-        'extraAssets.item.male': 1
-    }))
-    return mysticcodes
+async def get_mysticcodes(request: Request):
+    return await db.run(static_responses['mysticcodes'].respond, request)
 
 
 @app.get('/api/mysticcodes/{mysticcode_id}')
 async def get_mysticcodes_by_id(mysticcode_id: int):
     # Query the database by id
-    mysticcode = list(db.mysticcode_collection.find({'id': mysticcode_id}, {
-        '_id': 0,
-        'id': 1,
-        'name': 1,
-        'extraAssets.item.male': 1
-    }))
+    mysticcode = await db.run(lambda: list(db.mysticcode_collection.find({'id': mysticcode_id},
+                                                                         MYSTIC_CODE_LIST_PROJECTION)))
     return mysticcode
 
 
-@app.get('/api/quests')
-async def get_quests(warLongNames: Optional[List[str]] = Query(None), recommendLv: Optional[str] = ''):
+def _list_quests(request, warLongNames, recommendLv, cursor, limit, format):
+    query = quest_filter(warLongNames, recommendLv)
     try:
-        query = {'$and': []}
-        if warLongNames:
-            query['$and'].append({'warLongName': {'$in': warLongNames}})
-        if recommendLv:
-            query['$and'].append({'recommendLv': recommendLv})
-        if not query['$and']:
-            query = {}
-        quests = list(db.quests_collection.find(query, {
-            '_id': 0,
-            'name': 1,
-            'warLongName': 1,
-            'id': 1,
-            'recommendLv': 1,
-            'stages': 1,
-        }))
-        if not quests:
-            raise Exception('No quests found in the database')
-        return quests
+        if not query and not cursor and not limit and format == 'json':
+            return static_responses['quests'].respond(request)
+        return quest_listing(db.quests_collection, query, cursor, limit, format)
+    except InvalidListing as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get('/api/quests')
+async def get_quests(request: Request, warLongNames: Optional[List[str]] = Query(None), recommendLv: Optional[str] = '',
+                     cursor: Optional[str] = None, limit: Optional[int] = Query(None, ge=1, le=QUEST_PAGE_MAX),
+                     format: Optional[str] = 'json'):
+    """Quests with slim enemies (api/quest_listing.py); paged when cursor
+    or limit is given, NDJSON with format=ndjson."""
+    return await db.run(_list_quests, request, warLongNames, recommendLv, cursor, limit, format)
+
+
+def _warmup():
+    db.client.admin.command('ping')
+    # Cheap place to catch servant updates: one projection query drops
+    # cached servant documents whose sourceHash changed.
+    evicted = sync_servant_cache()
+    # Builds the catalog on first use; afterwards it is only rechecked
+    # once SERVANT_CATALOG_TTL is up, however often clients warm up
+    servant_catalog.current()
+    return {"status": "ok", "servant_cache": dict(servant_cache.stats(), evicted=evicted),
+            "servant_catalog": servant_catalog.stats(),
+            "database": db.stats()}
+
+
 @app.get('/api/warmup')
 async def api_warmup():
     """Lightweight warmup endpoint that pings the DB and returns quickly.
@@ -183,70 +319,38 @@ async def api_warmup():
     connections / pools before heavier user requests.
     """
     try:
-        db.client.admin.command('ping')
-        return {"status": "ok"}
+        return await db.run(_warmup)
     except Exception:
         # Don't propagate errors to the client; warmup is best-effort
         return {"status": "error"}
 
 
 @app.get('/api/quests/warLongNames')
-async def get_quests_warLongNames():
+async def get_quests_warLongNames(request: Request):
     try:
-        warLongNames = db.quests_collection.distinct('warLongName')
-        if not warLongNames:
-            raise Exception('No warLongNames found in the database')
-        return warLongNames
+        return await db.run(static_responses['warLongNames'].respond, request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get('/api/quests/filter')
-async def get_filtered_quests(warLongNames: Optional[List[str]] = Query(None), recommendLv: Optional[str] = ''):
-    try:
-        match_stage = {}
-        project_stage = {
-            '$project': {
-                '_id': 0,
-                'name': 1,
-                'warLongName': 1,
-                'id': 1,
-                'recommendLv': 1,
-                'stages': {
-                    '$map': {
-                        'input': '$stages',
-                        'as': 'stage',
-                        'in': {
-                            'enemies': {
-                                '$cond': {
-                                    'if': {'$isArray': '$$stage.enemies'},
-                                    'then': '$$stage.enemies',
-                                    'else': []
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        }
-
-        if warLongNames:
-            match_stage['warLongName'] = {'$in': warLongNames}
-        if recommendLv:
-            match_stage['recommendLv'] = recommendLv
-
-        if not match_stage:
-            pipeline = [project_stage]
-        else:
-            pipeline = [{'$match': match_stage}, project_stage]
+async def get_filtered_quests(request: Request, warLongNames: Optional[List[str]] = Query(None),
+                              recommendLv: Optional[str] = '', cursor: Optional[str] = None,
+                              limit: Optional[int] = Query(None, ge=1, le=QUEST_PAGE_MAX),
+                              format: Optional[str] = 'json'):
+    return await db.run(_list_quests, request, warLongNames, recommendLv, cursor, limit, format)
 
-        quests = list(db.quests_collection.aggregate(pipeline))
 
-        if not quests:
-            raise Exception('No quests found in the database')
-        return quests
+@app.get('/api/quests/{quest_id}')
+async def get_quest_by_id(quest_id: int):
+    """One quest with its full stage and enemy detail."""
+    try:
+        quest = await db.run(db.quests_collection.find_one, {'id': quest_id}, QUEST_DETAIL_PROJECTION)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if quest is None:
+        raise HTTPException(status_code=404, detail='Quest not found')
+    return quest
 
 
 @app.get('/api/data')
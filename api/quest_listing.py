@@ -0,0 +1,156 @@
+"""Quest listings for /api/quests and /api/quests/filter.
+
+Listings used to return every matching quest with its full stages, which
+made the payloads huge and held them all in memory before the first
+byte. Listings now:
+
+- carry a slim view of each enemy (name, hp, svt.className and
+  svt.traits ids), trimmed in the MongoDB projection and reshaped here.
+  Every stage has an enemies list, as /api/quests/filter guaranteed.
+  The full stage detail is at /api/quests/{id};
+- are streamed from the database cursor in batches of QUEST_BATCH_SIZE,
+  as one JSON array (the default) or as NDJSON, one quest per line;
+- are paged when a limit or cursor is given. Pages are ordered by _id,
+  and the cursor is the _id of the last quest returned. The body is the
+  page's list, and the X-Next-Cursor header holds the cursor of the next
+  page until the last one.
+
+Either way, the memory a request holds is bounded by the batch or page
+size, not by how many quests match.
+"""
+import json
+import os
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+
+QUEST_PAGE_SIZE = int(os.getenv('QUEST_PAGE_SIZE', '100'))
+QUEST_PAGE_MAX = 1000
+QUEST_BATCH_SIZE = 100
+FORMATS = {'json': 'application/json', 'ndjson': 'application/x-ndjson'}
+
+_QUEST_FIELDS = {'id': 1, 'name': 1, 'warLongName': 1, 'recommendLv': 1}
+QUEST_SLIM_PROJECTION = dict(
+    _QUEST_FIELDS,
+    **{'stages.enemies.name': 1, 'stages.enemies.hp': 1, 'stages.enemies.svt.className': 1,
+       'stages.enemies.svt.traits.id': 1},
+)
+QUEST_DETAIL_PROJECTION = dict(_QUEST_FIELDS, _id=0, individuality=1, stages=1)
+
+
+class InvalidListing(ValueError):
+    """A cursor or format the listing cannot serve; a 400 for the client."""
+
+
+class NoQuestsFound(LookupError):
+    pass
+
+
+def quest_filter(warLongNames=None, recommendLv=''):
+    query = {}
+    if warLongNames:
+        query['warLongName'] = {'$in': list(warLongNames)}
+    if recommendLv:
+        query['recommendLv'] = recommendLv
+    return query
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        return ObjectId(cursor)
+    except (InvalidId, TypeError):
+        raise InvalidListing(f"Invalid cursor: {cursor!r}") from None
+
+
+def slim_enemy(enemy):
+    svt = enemy.get('svt') or {}
+    return {
+        'name': enemy.get('name'),
+        'hp': enemy.get('hp'),
+        'svt': {
+            'className': svt.get('className'),
+            'traits': [{'id': trait.get('id')} for trait in svt.get('traits') or ()],
+        },
+    }
+
+
+def slim_quest(document):
+    """Listing shape of a quest document (without _id)."""
+    quest = {field: document[field] for field in _QUEST_FIELDS if field in document}
+    quest['stages'] = [
+        {'enemies': [slim_enemy(enemy) for enemy in stage.get('enemies') or ()
+                     if isinstance(enemy, dict)] if isinstance(stage.get('enemies'), list) else []}
+        for stage in document.get('stages') or ()
+    ]
+    return quest
+
+
+def find_quests(collection, query, after=None, limit=None):
+    """Raw listing documents in _id order, _id included."""
+    if after is not None:
+        query = {'$and': [query, {'_id': {'$gt': after}}]} if query else {'_id': {'$gt': after}}
+    cursor = collection.find(query, QUEST_SLIM_PROJECTION).sort('_id', 1).batch_size(QUEST_BATCH_SIZE)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+    return cursor
+
+
+def iter_quests(collection, query):
+    """Every matching quest in listing shape, read batch by batch."""
+    for document in find_quests(collection, query):
+        yield slim_quest(document)
+
+
+def quest_page(collection, query, cursor=None, limit=None):
+    """(quests, next_cursor) of one page; next_cursor is None on the last."""
+    limit = min(limit or QUEST_PAGE_SIZE, QUEST_PAGE_MAX)
+    documents = list(find_quests(collection, query, decode_cursor(cursor), limit + 1))
+    next_cursor = str(documents[limit - 1]['_id']) if len(documents) > limit else None
+    return [slim_quest(document) for document in documents[:limit]], next_cursor
+
+
+def _encode(quest):
+    return json.dumps(quest, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def _json_array(first, rest):
+    yield ('[' + _encode(first)).encode('utf-8')
+    for quest in rest:
+        yield (',' + _encode(quest)).encode('utf-8')
+    yield b']'
+
+
+def _ndjson(first, rest):
+    yield (_encode(first) + '\n').encode('utf-8')
+    for quest in rest:
+        yield (_encode(quest) + '\n').encode('utf-8')
+
+
+def quest_listing(collection, query, cursor=None, limit=None, format='json'):
+    """The Response for a listing request.
+
+    Raises InvalidListing for a bad cursor or format, and NoQuestsFound
+    when an unpaged listing matches nothing.
+    """
+    if format not in FORMATS:
+        raise InvalidListing(f"Unknown format {format!r}; expected one of {', '.join(FORMATS)}")
+    if cursor or limit:
+        quests, next_cursor = quest_page(collection, query, cursor, limit)
+        headers = {'X-Next-Cursor': next_cursor} if next_cursor else {}
+        if format == 'ndjson':
+            body = ''.join(_encode(quest) + '\n' for quest in quests)
+        else:
+            body = '[' + ','.join(_encode(quest) for quest in quests) + ']'
+        return Response(body.encode('utf-8'), media_type=FORMATS[format], headers=headers)
+
+    quests = iter_quests(collection, query)
+    # Read the first quest up front so an empty listing is still an error
+    first = next(quests, None)
+    if first is None:
+        raise NoQuestsFound('No quests found in the database')
+    stream = _ndjson if format == 'ndjson' else _json_array
+    return StreamingResponse(stream(first, quests), media_type=FORMATS[format])
@@ -0,0 +1,248 @@
+"""Cache of /simulate results keyed on a normalized request fingerprint.
+
+A simulation is deterministic given its request and the game data, and
+the front end resubmits identical payloads all the time (reloads, shared
+links, edits that get undone). The fingerprint is a SHA-256 over:
+
+- the team (entries without a collectionNo dropped, as the engine does;
+  key order does not matter), mystic code id and quest id;
+- the command tokens (a command string and its token list match);
+- Samples, Seed and Trace, which change the result;
+- the sourceHash of every servant, quest and mystic code document the
+  run reads, so results computed on old game data stop matching. Runs
+  reading a servant or quest without a sourceHash are not cached.
+
+The data hashes are read from the in-process templates only, or, with
+a process pool, from the versions the workers reported with their last
+results. Until a request's data has been loaded there is nothing to
+match, so a lookup never queries the database. Requests with Samples
+but no Seed are random and are never cached.
+
+Entries expire after a TTL and the least recently used are dropped
+beyond the size cap. With a file configured, entries are also written to
+a small sqlite database so they survive restarts.
+
+Settings (environment):
+- SIM_RESULT_CACHE_SIZE: results kept (default 1024; 0 disables).
+- SIM_RESULT_CACHE_TTL: seconds a result stays valid (default 3600).
+- SIM_RESULT_CACHE_FILE: sqlite file to persist results to (default none).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from Driver import tokenize
+from managers.MysticCode import mystic_code_catalog
+from managers.Quest import quest_template_cache
+from sim_entry_points.batch_runner import preload_keys
+from sim_entry_points.traverse_api_input import simulate
+from units.Servant import servant_template_cache
+from utils.frozen import freeze
+from utils.lru import LRUCache
+
+# Bumped when SimulationResult changes shape, so persisted results are not reused
+RESULT_FORMAT = 1
+# How many puts between trims of the sqlite file down to max_size rows
+DISK_TRIM_INTERVAL = 256
+
+
+# Data versions reported by pool workers, keyed like _data_key()
+reported_versions = LRUCache(4096)
+
+
+def _data_key(team, mc_id, quest_id):
+    servants, _, _ = preload_keys([(team, mc_id, quest_id, ())])
+    return tuple(servants), quest_id, mc_id
+
+
+def _local_version(servants, quest_id, mc_id):
+    templates = [servant_template_cache.peek(key) for key in servants]
+    templates.append(quest_template_cache.peek(quest_id))
+    templates.append(mystic_code_catalog.peek(mc_id))
+    if any(template is None for template in templates):
+        return None
+    return tuple(template.source_hash for template in templates)
+
+
+def data_version(team, mc_id, quest_id):
+    """sourceHash of each game data document the run reads, or None if
+    they are not all known (or some have no sourceHash)."""
+    key = _data_key(team, mc_id, quest_id)
+    version = _local_version(*key)
+    if version is None:
+        version = reported_versions.peek(key)
+    if version is None or None in version:
+        return None
+    return version
+
+
+def report_version(team, mc_id, quest_id, version):
+    """Record the data version a worker process computed a result on."""
+    if version is not None:
+        reported_versions.put(_data_key(team, mc_id, quest_id), version)
+
+
+def simulate_for_cache(team, mc_id, quest_id, commands, samples=None, seed=None, trace='off'):
+    """simulate() for the pool: the result dict and the data version it was
+    computed on, taken where the data was loaded."""
+    result = simulate(team, mc_id, quest_id, commands, samples, seed, trace)
+    return result.to_dict(), data_version(team, mc_id, quest_id)
+
+
+def request_fingerprint(team, mc_id, quest_id, commands, samples=None, seed=None, trace='off'):
+    """Cache key of a /simulate request, or None if it cannot be cached."""
+    if samples and seed is None:
+        return None
+    version = data_version(team, mc_id, quest_id)
+    if version is None:
+        return None
+    tokens = tokenize(commands) if isinstance(commands, str) else [str(token) for token in commands]
+    payload = {
+        'format': RESULT_FORMAT,
+        'team': [servant for servant in team if servant.get('collectionNo')],
+        'mc_id': mc_id,
+        'quest_id': quest_id,
+        'commands': tokens,
+        'samples': samples or None,
+        'seed': seed if samples else None,
+        'trace': trace or 'off',
+        'data': list(version),
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """TTL + LRU map from fingerprints to SimulationResult dicts.
+
+    Stored results are frozen (utils.frozen), so a hit can be handed to
+    every caller without copying.
+    """
+
+    def __init__(self, max_size=1024, ttl=3600.0, path=None, clock=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.clock = clock
+        self._memory = LRUCache(max_size) if max_size > 0 else None
+        self._lock = threading.Lock()
+        self._conn = None
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.disk_hits = 0
+        if path and self._memory is not None:
+            self._open(path)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_size=int(os.getenv('SIM_RESULT_CACHE_SIZE', '1024')),
+            ttl=float(os.getenv('SIM_RESULT_CACHE_TTL', '3600')),
+            path=os.getenv('SIM_RESULT_CACHE_FILE') or None,
+        )
+
+    @property
+    def enabled(self):
+        return self._memory is not None
+
+    def _open(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, "
+            "body TEXT NOT NULL) WITHOUT ROWID"
+        )
+        self._trim_disk()
+
+    def _trim_disk(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE expires_at <= ?", (self.clock(),))
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY expires_at DESC "
+                "LIMIT -1 OFFSET ?)", (self.max_size,)
+            )
+            self._conn.commit()
+
+    def _read_disk(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at, body FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], freeze(json.loads(row[1]))
+
+    def get(self, key):
+        """The cached result for key, or None."""
+        if key is None or self._memory is None:
+            return None
+        entry = self._memory.peek(key)
+        if entry is None and self._conn is not None:
+            entry = self._read_disk(key)
+            if entry is not None:
+                self.disk_hits += 1
+                self._memory.put(key, entry)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, result = entry
+        if expires_at <= self.clock():
+            self._memory.pop(key)
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._memory.get(key)  # refresh recency
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """Store a result dict; returns the frozen copy that was cached."""
+        if key is None or self._memory is None:
+            return result
+        expires_at = self.clock() + self.ttl
+        frozen = freeze(result)
+        self._memory.put(key, (expires_at, frozen))
+        if self._conn is not None:
+            body = json.dumps(result, separators=(',', ':'), default=str)
+            with self._lock:
+                self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, expires_at, body))
+                self._conn.commit()
+                self._puts += 1
+                trim = self._puts % DISK_TRIM_INTERVAL == 0
+            if trim:
+                self._trim_disk()
+        return frozen
+
+    def clear(self):
+        if self._memory is not None:
+            self._memory.clear()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM results")
+                self._conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        memory = self._memory.stats() if self._memory is not None else {'size': 0, 'evictions': 0}
+        return {
+            'enabled': self.enabled,
+            'size': memory['size'],
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'persistent': self._conn is not None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'disk_hits': self.disk_hits,
+            'evictions': memory['evictions'],
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,229 @@
+"""In-memory index of the servant list served by /api/servants.
+
+The catalog is a few hundred documents and only changes when the updater
+runs, yet every /api/servants call used to send an ad-hoc query to
+MongoDB, including an unanchored case-insensitive $regex on name that no
+index can serve. ServantCatalog loads the listing projection once and
+answers filters from precomputed facets:
+
+- rarity, className, NP card and NP effectFlags map each value to a
+  bitmask of the rows having it (an int, one bit per row), so a filter
+  is a few ORs and ANDs;
+- every 1-, 2- and 3-character substring of the lower-cased names maps
+  to a bitmask too. A search of up to three characters is a single
+  lookup; a longer one ANDs its trigrams and checks the few candidates
+  with a substring test. Searches with regex syntax fall back to the
+  regex, as MongoDB treated them.
+
+Results keep the database's natural order, as before. Each load builds
+a complete CatalogSnapshot and swaps it in with one assignment, so a
+reader always sees one consistent version. Every
+SERVANT_CATALOG_TTL seconds (default 300) a projection of collectionNo
+and sourceHash is compared against the loaded one; the catalog is only
+rebuilt when that changed. refresh() forces the check.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+
+from utils.frozen import freeze
+
+SERVANT_CATALOG_TTL = float(os.getenv('SERVANT_CATALOG_TTL', '300'))
+
+# Fields /api/servants and /api/servants/{collectionNo} return
+SERVANT_LIST_PROJECTION = {
+    '_id': 0,
+    'id': 1,
+    'name': 1,
+    'collectionNo': 1,
+    'className': 1,
+    'rarity': 1,
+    'noblePhantasms.card': 1,
+    'noblePhantasms.effectFlags': 1,
+    'extraAssets.faces.ascension.4': 1,
+}
+SIGNATURE_PROJECTION = {'_id': 0, 'collectionNo': 1, 'sourceHash': 1}
+MAX_GRAM = 3
+_REGEX_SYNTAX = re.compile(r'[.^$*+?{}\[\]\\|()]')
+
+
+def catalog_signature(rows):
+    """Digest of every (collectionNo, sourceHash) pair; changes whenever the
+    updater writes a servant."""
+    pairs = sorted((str(row.get('collectionNo')), str(row.get('sourceHash'))) for row in rows)
+    return hashlib.sha1(repr(pairs).encode('utf-8')).hexdigest()
+
+
+def _grams(text):
+    for size in range(1, MAX_GRAM + 1):
+        for start in range(len(text) - size + 1):
+            yield text[start:start + size]
+
+
+def _iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class CatalogSnapshot:
+    """One immutable version of the catalog and its indexes."""
+
+    def __init__(self, documents, signature=None):
+        rows = []
+        names = []
+        self.facets = {'rarity': {}, 'className': {}, 'card': {}, 'effectFlags': {}}
+        self.name_grams = {}
+        self.by_collection_no = {}
+        for index, document in enumerate(documents):
+            document = {k: v for k, v in document.items() if k != 'sourceHash'}
+            bit = 1 << index
+            rows.append(freeze(document))
+            name = str(document.get('name') or '').lower()
+            names.append(name)
+            self.by_collection_no[document.get('collectionNo')] = index
+            self._add('rarity', document.get('rarity'), bit)
+            self._add('className', document.get('className'), bit)
+            for np in document.get('noblePhantasms') or ():
+                self._add('card', np.get('card'), bit)
+                for flag in np.get('effectFlags') or ():
+                    self._add('effectFlags', flag, bit)
+            for gram in set(_grams(name)):
+                self.name_grams[gram] = self.name_grams.get(gram, 0) | bit
+        self.rows = tuple(rows)
+        self.names = tuple(names)
+        self.all = (1 << len(rows)) - 1
+        self.signature = signature
+        self.loaded_at = time.monotonic()
+
+    def _add(self, facet, value, bit):
+        if value is not None:
+            values = self.facets[facet]
+            values[value] = values.get(value, 0) | bit
+
+    def _facet_mask(self, facet, values):
+        index = self.facets[facet]
+        mask = 0
+        for value in values:
+            mask |= index.get(value, 0)
+        return mask
+
+    def _search_mask(self, search):
+        if _REGEX_SYNTAX.search(search):
+            try:
+                pattern = re.compile(search, re.IGNORECASE)
+            except re.error:
+                pass
+            else:
+                return sum(1 << i for i, row in enumerate(self.rows) if pattern.search(row.get('name') or ''))
+        needle = search.lower()
+        if len(needle) <= MAX_GRAM:
+            return self.name_grams.get(needle, 0)
+        mask = self.all
+        for start in range(len(needle) - MAX_GRAM + 1):
+            mask &= self.name_grams.get(needle[start:start + MAX_GRAM], 0)
+            if not mask:
+                return 0
+        # Trigrams can all be present without forming the whole string
+        return sum(1 << i for i in _iter_bits(mask) if needle in self.names[i])
+
+    def query(self, rarity=None, class_names=None, cards=None, effect_flags=None, search='', exclude=None):
+        """Rows matching every given filter, in catalog order.
+
+        Each list filter matches any of its values; search is a
+        case-insensitive substring (or regex) of the name; exclude is a
+        collection of collectionNos to leave out.
+        """
+        mask = self.all
+        for facet, values in (('rarity', rarity), ('className', class_names),
+                              ('card', cards), ('effectFlags', effect_flags)):
+            if values:
+                mask &= self._facet_mask(facet, values)
+        if search and mask:
+            mask &= self._search_mask(search)
+        for collection_no in exclude or ():
+            index = self.by_collection_no.get(collection_no)
+            if index is not None:
+                mask &= ~(1 << index)
+        return [self.rows[i] for i in _iter_bits(mask)]
+
+    def get(self, collection_no):
+        index = self.by_collection_no.get(collection_no)
+        return self.rows[index] if index is not None else None
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class ServantCatalog:
+    """Lazily loaded, periodically revalidated CatalogSnapshot holder.
+
+    collection is a zero-argument callable returning the servants
+    collection, so the database is only touched on first use.
+    """
+
+    def __init__(self, collection, ttl=SERVANT_CATALOG_TTL, clock=time.monotonic):
+        self._collection = collection
+        self.ttl = ttl
+        self.clock = clock
+        self.snapshot = None
+        self.checked_at = None
+        self.loads = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        documents = list(self._collection().find({}, dict(SERVANT_LIST_PROJECTION, sourceHash=1)))
+        self.snapshot = CatalogSnapshot(documents, catalog_signature(documents))
+        self.loads += 1
+
+    def refresh(self, force=False):
+        """Rebuild if the servants changed (or unconditionally with force).
+
+        Returns True when a new snapshot was swapped in.
+        """
+        with self._lock:
+            return self._revalidate(force)
+
+    def _revalidate(self, force=False):
+        self.checked_at = self.clock()
+        if force or self.snapshot is None:
+            self._load()
+            return True
+        current = catalog_signature(self._collection().find({}, SIGNATURE_PROJECTION))
+        if current == self.snapshot.signature:
+            return False
+        self._load()
+        return True
+
+    def current(self):
+        """The snapshot to read from, revalidated once the TTL is up.
+
+        While one caller revalidates, others keep reading the old snapshot.
+        """
+        snapshot = self.snapshot
+        if snapshot is None:
+            self.refresh()
+            return self.snapshot
+        if self.clock() - self.checked_at >= self.ttl and self._lock.acquire(blocking=False):
+            try:
+                self._revalidate()
+            finally:
+                self._lock.release()
+        return self.snapshot
+
+    def query(self, **filters):
+        return self.current().query(**filters)
+
+    def get(self, collection_no):
+        return self.current().get(collection_no)
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {
+            'size': len(snapshot) if snapshot is not None else 0,
+            'loads': self.loads,
+            'signature': snapshot.signature if snapshot is not None else None,
+        }
@@ -0,0 +1,142 @@
+"""Bounded executor for running simulations off the event loop.
+
+Simulations are synchronous and CPU-bound. Awaiting them directly inside an
+``async def`` endpoint stalls every other request on the same uvicorn worker.
+SimulationPool runs them on a thread or process pool. It also caps how many
+may be queued, so under overload callers get an immediate PoolFull instead of
+unbounded latency.
+
+Settings (environment):
+- SIM_POOL_KIND: ``thread`` (default) or ``process``. Process pools use
+  spawn, so workers never inherit the parent's MongoDB client.
+- SIM_POOL_WORKERS: worker count (default: CPU count, at most 8).
+- SIM_POOL_QUEUE: simulations allowed to wait beyond the running ones
+  (default 32).
+- SIM_QUEUE_TIMEOUT: seconds a queued simulation may wait before it is
+  dropped unrun (default 30).
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class PoolFull(Exception):
+    """Raised when the queue is at capacity; map to 503."""
+
+
+class QueueTimeout(Exception):
+    """Raised when a queued simulation waited longer than queue_timeout."""
+
+
+def _timed_call(fn, args, submitted, queue_timeout):
+    # Runs in the worker, so wall-clock time is comparable across processes
+    started = time.time()
+    if queue_timeout is not None and started - submitted > queue_timeout:
+        raise QueueTimeout(f"waited {started - submitted:.1f}s in queue")
+    return started, fn(*args)
+
+
+class SimulationPool:
+    def __init__(self, max_workers=None, max_queue=32, kind='thread', queue_timeout=30.0):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown pool kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._executor = None
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_last = 0.0
+        self.wait_max = 0.0
+        self._wait_total = 0.0
+        self._waits = 0
+
+    @classmethod
+    def from_env(cls):
+        workers = os.getenv('SIM_POOL_WORKERS')
+        timeout = float(os.getenv('SIM_QUEUE_TIMEOUT', '30'))
+        return cls(
+            max_workers=int(workers) if workers else None,
+            max_queue=int(os.getenv('SIM_POOL_QUEUE', '32')),
+            kind=os.getenv('SIM_POOL_KIND', 'thread'),
+            queue_timeout=timeout if timeout > 0 else None,
+        )
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='simulate')
+        return self._executor
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in the pool, raising PoolFull if the queue is at capacity.
+
+        Bookkeeping happens on the event loop thread, so it needs no lock.
+        """
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise PoolFull(f"simulation queue full ({self.in_flight} in flight)")
+        self.in_flight += 1
+        self.submitted += 1
+        submitted = time.time()
+        loop = asyncio.get_running_loop()
+        try:
+            started, result = await loop.run_in_executor(
+                self._get_executor(), _timed_call, fn, args, submitted, self.queue_timeout
+            )
+        except QueueTimeout:
+            self.timed_out += 1
+            self._record_wait(time.time() - submitted)
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        self._record_wait(max(0.0, started - submitted))
+        return result
+
+    def _record_wait(self, wait):
+        self.wait_last = wait
+        self.wait_max = max(self.wait_max, wait)
+        self._wait_total += wait
+        self._waits += 1
+
+    def stats(self):
+        return {
+            'kind': self.kind,
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'in_flight': self.in_flight,
+            'queue_depth': max(0, self.in_flight - self.max_workers),
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'wait_seconds': {
+                'last': round(self.wait_last, 6),
+                'avg': round(self._wait_total / self._waits, 6) if self._waits else 0.0,
+                'max': round(self.wait_max, 6),
+            },
+        }
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,218 @@
+"""Pre-serialized, pre-compressed bodies for the unfiltered catalog endpoints.
+
+/api/servants (without filters), /api/mysticcodes, /api/quests (without
+filters) and /api/quests/warLongNames return the same JSON to every
+visitor, and each call used to re-query MongoDB and re-serialize it.
+A StaticResponse builds the body once per data version and keeps:
+
+- the JSON bytes, plus gzip and (with the optional `brotli` package)
+  brotli encodings of them, so a request only picks one;
+- a strong ETag derived from the JSON bytes; an If-None-Match that names
+  it gets an empty 304.
+
+Each encoding has its own ETag ("<hash>", "<hash>-gzip", "<hash>-br"),
+as strong validators must differ between byte-for-byte different
+representations. Any of them validates the version, so a client keeps
+its 304s if its Accept-Encoding changes.
+
+Responses carry Cache-Control: no-cache, so browsers revalidate every
+load and a repeat load is a 304 without a body.
+
+The data version is checked at most every STATIC_RESPONSE_TTL seconds
+(default 300) through a version callable, for example a digest of the
+collection's (id, sourceHash) pairs. When a version is unknown (None),
+the body is rebuilt on expiry and its bytes are compared instead; the
+compressed encodings are only recomputed when they changed.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from fastapi import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_RESPONSE_TTL = float(os.getenv('STATIC_RESPONSE_TTL', '300'))
+CACHE_CONTROL = 'public, no-cache'
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 512
+
+ENCODERS = {'gzip': lambda body: gzip.compress(body, compresslevel=9, mtime=0)}
+if brotli is not None:
+    ENCODERS['br'] = lambda body: brotli.compress(body, quality=11)
+# Preferred first when the client accepts several equally
+ENCODING_PREFERENCE = ('br', 'gzip')
+
+
+def serialize(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def source_signature(rows, key):
+    """Digest of every (key, sourceHash) pair, or None if a row has no
+    sourceHash (its changes could not be seen)."""
+    pairs = []
+    for row in rows:
+        source_hash = row.get('sourceHash')
+        if source_hash is None:
+            return None
+        pairs.append((str(row.get(key)), str(source_hash)))
+    return hashlib.sha1(repr(sorted(pairs)).encode('utf-8')).hexdigest()
+
+
+def accepted_encodings(accept_encoding):
+    """Map of content codings to their q-values from an Accept-Encoding header."""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding, available):
+    """The best of the available encodings the client accepts, or None for
+    the identity body."""
+    accepted = accepted_encodings(accept_encoding)
+    best, best_q = None, 0.0
+    for coding in ENCODING_PREFERENCE:
+        if coding not in available:
+            continue
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def etag_matches(if_none_match, tag):
+    """Weak comparison of an If-None-Match header against tag, ignoring the
+    encoding suffix."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.strip('"').split('-', 1)[0] == tag:
+            return True
+    return False
+
+
+class MaterializedBody:
+    """One version of a response: JSON bytes and their encodings."""
+
+    def __init__(self, body, version=None):
+        self.body = body
+        self.version = version
+        self.tag = hashlib.sha1(body).hexdigest()
+        self.encoded = {}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            for coding, encode in ENCODERS.items():
+                encoded = encode(body)
+                if len(encoded) < len(body):
+                    self.encoded[coding] = encoded
+
+    def etag(self, coding=None):
+        return f'"{self.tag}-{coding}"' if coding else f'"{self.tag}"'
+
+    def respond(self, headers):
+        """A Response for a request with these headers (a mapping with
+        case-insensitive keys, like Request.headers)."""
+        coding = negotiate_encoding(headers.get('accept-encoding'), self.encoded)
+        response_headers = {'ETag': self.etag(coding), 'Cache-Control': CACHE_CONTROL, 'Vary': 'Accept-Encoding'}
+        if etag_matches(headers.get('if-none-match'), self.tag):
+            return Response(status_code=304, headers=response_headers)
+        if coding:
+            response_headers['Content-Encoding'] = coding
+            return Response(self.encoded[coding], media_type='application/json', headers=response_headers)
+        return Response(self.body, media_type='application/json', headers=response_headers)
+
+
+class StaticResponse:
+    """Lazily built MaterializedBody, rebuilt when its data version changes.
+
+    build returns the JSON-able data; version (optional) returns a cheap
+    token that changes with it, or None when it cannot tell. Both are
+    called at most once per ttl, from whichever request finds it expired;
+    concurrent requests keep serving the previous body meanwhile.
+    """
+
+    def __init__(self, build, version=None, ttl=STATIC_RESPONSE_TTL, clock=time.monotonic):
+        self._build = build
+        self._version = version
+        self.ttl = ttl
+        self.clock = clock
+        self.materialized = None
+        self.checked_at = None
+        self.builds = 0
+        self._lock = threading.Lock()
+
+    def _materialize(self, version):
+        body = serialize(self._build())
+        self.builds += 1
+        current = self.materialized
+        if current is not None and current.body == body:
+            # Same bytes: keep the compressed encodings already computed
+            current.version = version
+            return current
+        return MaterializedBody(body, version)
+
+    def _revalidate(self):
+        self.checked_at = self.clock()
+        version = self._version() if self._version is not None else None
+        current = self.materialized
+        if current is not None and version is not None and version == current.version:
+            return
+        self.materialized = self._materialize(version)
+
+    def current(self):
+        """The MaterializedBody to serve, revalidated once the TTL is up."""
+        if self.materialized is None:
+            with self._lock:
+                if self.materialized is None:
+                    self._revalidate()
+            return self.materialized
+        if self.clock() - self.checked_at >= self.ttl and self._lock.acquire(blocking=False):
+            try:
+                self._revalidate()
+            finally:
+                self._lock.release()
+        return self.materialized
+
+    def respond(self, request):
+        return self.current().respond(request.headers)
+
+    def invalidate(self):
+        """Revalidate on the next request regardless of the TTL."""
+        self.checked_at = float('-inf')
+
+    def clear(self):
+        self.materialized = None
+
+    def stats(self):
+        materialized = self.materialized
+        return {
+            'builds': self.builds,
+            'etag': materialized.etag() if materialized is not None else None,
+            'bytes': len(materialized.body) if materialized is not None else 0,
+            'encoded_bytes': {coding: len(body) for coding, body in materialized.encoded.items()}
+            if materialized is not None else {},
+        }
@@ -1,52 +1,143 @@
+import hashlib
 import json
 import pprint
+import threading
+
 from scripts.connectDB import db
+from utils.frozen import freeze
+from utils.metrics import timed, DATA_LOAD_SECONDS
+
+
+def compile_skills(skills_data):
+    """Engine-ready MC skills with each function's svals at max level."""
+    skills = []
+    for skill in skills_data:
+        parsed_skill = {
+            'id': skill.get('id'),
+            'num': skill.get('num'),
+            'name': skill.get('name'),
+            'detail': skill.get('detail'),
+            'cooldown': skill.get('coolDown', [0])[-1],
+            'functions': [],
+            'icon': skill.get('icon', ''),
+        }
+        for func in skill.get('functions', []):
+            # Always use the last svals entry (max level)
+            svals = func.get('svals', [])
+            if isinstance(svals, list) and svals:
+                svals = svals[-1]
+            elif isinstance(svals, dict):
+                svals = svals
+            else:
+                svals = {}
+            parsed_func = dict(func)  # shallow copy
+            parsed_func['svals'] = svals
+            parsed_skill['functions'].append(parsed_func)
+        skills.append(parsed_skill)
+    return skills
+
+
+def content_hash(document):
+    body = json.dumps({k: v for k, v in document.items() if k != '_id'}, sort_keys=True, default=str)
+    return hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+
+class MysticCodeTemplate:
+    """Compiled, read-only mystic code shared by every run.
+
+    Skills are frozen (FrozenDicts and tuples), so the engine cannot change
+    them in place and one template can serve every thread and, through
+    fork, every worker process. Per-run cooldowns live on MysticCode.
+    """
+
+    def __init__(self, document):
+        self.data = document
+        self.mc_id = document.get('id')
+        # The updater does not write mystic codes, so most have no sourceHash
+        self.source_hash = document.get('sourceHash') or content_hash(document)
+        self.name = document.get('name', '')
+        self.short_name = document.get('shortName', '')
+        self.detail = document.get('detail', '')
+        self.max_lv = document.get('maxLv', 10)
+        self.skills = freeze(compile_skills(document.get('skills', [])))
+
+    def __repr__(self):
+        return f"MysticCodeTemplate(id={self.mc_id}, name={self.name})"
+
+
+class MysticCodeCatalog:
+    """Every mystic code, compiled once on first use.
+
+    There are only a few dozen, so the first lookup loads the whole
+    collection in one query. An id missing from that load (a code added
+    since) is fetched on its own.
+    """
+
+    def __init__(self):
+        self._templates = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if not self._loaded:
+                for document in db.mysticcodes.find({}):
+                    if document.get('id') is not None:
+                        self._templates[document['id']] = MysticCodeTemplate(document)
+                self._loaded = True
+
+    def get(self, mc_id):
+        if not self._loaded:
+            self.load()
+        template = self._templates.get(mc_id)
+        if template is None:
+            document = db.mysticcodes.find_one({'id': mc_id})
+            if document is None:
+                return None
+            with self._lock:
+                template = self._templates.setdefault(mc_id, MysticCodeTemplate(document))
+        return template
+
+    def peek(self, mc_id):
+        """The template if it is already compiled; never queries the database."""
+        return self._templates.get(mc_id)
+
+    def clear(self):
+        with self._lock:
+            self._templates = {}
+            self._loaded = False
+
+    def __len__(self):
+        return len(self._templates)
+
+
+mystic_code_catalog = MysticCodeCatalog()
+
+
+def select_mystic_code(mc_id):
+    template = mystic_code_catalog.get(mc_id)
+    return template.data if template is not None else None
+
 
 class MysticCode:
     def __init__(self, mc_id):
         self.db = db
         self.mc_id = mc_id
-        self.data = self.load_mystic_code(mc_id)
-        self.name = self.data.get('name', '')
-        self.short_name = self.data.get('shortName', '')
-        self.detail = self.data.get('detail', '')
-        self.max_lv = self.data.get('maxLv', 10)
-        self.skills = self.parse_skills(self.data.get('skills', []))
+        self.template = self.load_mystic_code(mc_id)
+        self.data = self.template.data
+        self.name = self.template.name
+        self.short_name = self.template.short_name
+        self.detail = self.template.detail
+        self.max_lv = self.template.max_lv
+        self.skills = self.template.skills
         self.cooldowns = {i: 0 for i in range(3)}  # Track cooldowns for each skill
 
+    @timed(DATA_LOAD_SECONDS, 'mystic_code')
     def load_mystic_code(self, mc_id):
-        # Find the mystic code by id in the database
-        document = self.db.mysticcodes.find_one({'id': mc_id})
-        if not document:
+        template = mystic_code_catalog.get(mc_id)
+        if template is None:
             raise ValueError(f"Mystic Code with id {mc_id} not found in the database.")
-        return document
-
-    def parse_skills(self, skills_data):
-        skills = []
-        for skill in skills_data:
-            parsed_skill = {
-                'id': skill.get('id'),
-                'num': skill.get('num'),
-                'name': skill.get('name'),
-                'detail': skill.get('detail'),
-                'cooldown': skill.get('coolDown', [0])[-1],
-                'functions': [],
-                'icon': skill.get('icon', ''),
-            }
-            for func in skill.get('functions', []):
-                # Always use the last svals entry (max level)
-                svals = func.get('svals', [])
-                if isinstance(svals, list) and svals:
-                    svals = svals[-1]
-                elif isinstance(svals, dict):
-                    svals = svals
-                else:
-                    svals = {}
-                parsed_func = dict(func)  # shallow copy
-                parsed_func['svals'] = svals
-                parsed_skill['functions'].append(parsed_func)
-            skills.append(parsed_skill)
-        return skills
+        return template
 
     def get_skill_by_num(self, num):
         # num is 0-based index (0, 1, 2)
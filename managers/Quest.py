@@ -1,42 +1,132 @@
-from units.Enemy import Enemy
+import os
+from collections import Counter
+from types import MappingProxyType
+
+from data import class_indices
+from units.Enemy import Enemy, np_gain_per_hit
 from scripts.connectDB import db
-import numpy as np
+from utils.lru import LRUCache
+from utils.metrics import registry as metrics_registry, timed, DATA_LOAD_SECONDS
+
+# Quest documents are read-only once fetched. They are compiled once into
+# QuestTemplates, and every Quest stamps fresh Enemy objects out of those;
+# the raw document is not kept once its template is built.
+QUEST_CACHE_SIZE = int(os.getenv('QUEST_CACHE_SIZE', '256'))
+quest_template_cache = LRUCache(max_size=QUEST_CACHE_SIZE)
+metrics_registry.register_cache('quest_templates', quest_template_cache)
+
+
+def select_quest(quest_id):
+    """The raw quest document, read from the database on every call."""
+    return db.quests.find_one({"id": quest_id})
+
+
+def get_quest_template(quest_id):
+    template = quest_template_cache.get(quest_id)
+    if template is None:
+        document = select_quest(quest_id)
+        if document is None:
+            return None
+        template = QuestTemplate(document)
+        quest_template_cache.put(quest_id, template)
+    return template
+
+
+class EnemyTemplate:
+    """Read-only data of one enemy slot; Enemy.from_template builds the
+    per-run copy holding HP and buffs."""
+
+    __slots__ = ('name', 'max_hp', 'death_rate', 'class_name', 'class_index', 'traits', 'trait_set',
+                 'attribute', 'state', 'np_per_hit_mult')
+
+    def __init__(self, enemy):
+        self.name = enemy['name']
+        self.max_hp = enemy['hp']
+        self.death_rate = enemy['deathRate']
+        self.class_name = enemy['svt']['className']
+        self.class_index = class_indices.get(self.class_name)
+        # Kept in document order with duplicates; trait counts scale SE damage
+        self.traits = tuple(trait['id'] for trait in enemy['svt']['traits'])
+        self.trait_set = frozenset(self.traits)
+        self.attribute = enemy['svt']['attribute']
+        self.state = enemy['state'] if 'state' in enemy else None
+        self.np_per_hit_mult = np_gain_per_hit(self.class_name, self.trait_set)
+
+    def __repr__(self):
+        return f"EnemyTemplate(name={self.name}, hp={self.max_hp}, class={self.class_name})"
+
+
+class WaveTemplate:
+    """Enemies of one wave with the totals used for quick feasibility checks."""
+
+    __slots__ = ('enemies', 'total_hp', 'max_hp', 'class_makeup')
+
+    def __init__(self, enemies):
+        self.enemies = tuple(enemies)
+        self.total_hp = sum(enemy.max_hp for enemy in self.enemies)
+        self.max_hp = max((enemy.max_hp for enemy in self.enemies), default=0)
+        # className -> number of enemies of that class
+        self.class_makeup = MappingProxyType(Counter(enemy.class_name for enemy in self.enemies))
+
+    def build(self):
+        return [Enemy.from_template(enemy) for enemy in self.enemies]
+
+    def __len__(self):
+        return len(self.enemies)
+
+
+class QuestTemplate:
+    """Compiled, read-only quest shared by every Quest with the same id.
+
+    Nothing on a template may be mutated at runtime; HP, buffs and traits
+    gained in battle live on the Enemy objects build_waves() returns.
+    """
+
+    def __init__(self, document):
+        self.quest_id = document.get('id')
+        self.source_hash = document.get('sourceHash')
+        self.fields = tuple(field['id'] for field in document['individuality'])
+        self.waves = tuple(WaveTemplate(EnemyTemplate(enemy) for enemy in wave['enemies'])
+                           for wave in document['stages'])
+        self.total_waves = len(self.waves)
+        self.total_hp = sum(wave.total_hp for wave in self.waves)
+
+    def wave(self, wave_no):
+        """WaveTemplate of the 1-based wave_no."""
+        return self.waves[wave_no - 1]
+
+    def build_waves(self):
+        return {i + 1: wave.build() for i, wave in enumerate(self.waves)}
+
+    def __repr__(self):
+        return f"QuestTemplate(id={self.quest_id}, waves={self.total_waves}, total_hp={self.total_hp})"
+
 
 class Quest:
     def __init__(self, quest_id):
         self.db = db
         self.quest_id = quest_id
+        self.template = None
         self.fields = []
         self.waves = {}
         self.total_waves = 0
         self.current_wave_index = 1  # Initialize wave index to 1
         self.retrieve_quest()
 
+    @timed(DATA_LOAD_SECONDS, 'quest')
     def retrieve_quest(self):
-        query = {"id": self.quest_id}
-        document = self.db.quests.find_one(query)
-        if document:
-            self.process_quest(document)
+        template = get_quest_template(self.quest_id)
+        if template is not None:
+            self.load_template(template)
 
     def process_quest(self, document):
-        waves = document['stages']
-        for field in document['individuality']:
-            self.fields.append(field['id'])
-        for i, wave in enumerate(waves):
-            wave_data = []  # Initialize wave_data here
-            for enemy in wave['enemies']:
-                enemydata = [
-                    enemy['name'],
-                    enemy['hp'],
-                    enemy['deathRate'],
-                    enemy['svt']['className'],
-                    [trait['id'] for trait in enemy['svt']['traits']],
-                    enemy['svt']['attribute'],
-                    enemy['state'] if 'state' in enemy else None
-                ]
-                wave_data.append(Enemy(enemydata))
-            self.waves[i + 1] = wave_data
-        self.total_waves = len(self.waves)
+        self.load_template(QuestTemplate(document))
+
+    def load_template(self, template):
+        self.template = template
+        self.fields = list(template.fields)
+        self.waves = template.build_waves()
+        self.total_waves = template.total_waves
 
     def get_wave(self, wave_no=0):
         if wave_no == 0:
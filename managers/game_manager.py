@@ -2,15 +2,31 @@ from .Quest import Quest
 from units.Servant import Servant
 from .MysticCode import MysticCode
 import copy
-import logging
+from utils.trace import make_tracer
+
+class BattleSnapshot:
+    """Mutable battle state captured by GameManager.snapshot().
+
+    Holds private clones of the servants and of every enemy the battle can
+    still touch; parsed servant/quest/mystic code data is shared by
+    reference. Treat it as read-only: restore() clones from it again so one
+    snapshot can be restored any number of times.
+    """
+    __slots__ = ('servants', 'waves', 'wave', 'fields', 'mc_cooldowns')
+
+    def __init__(self, servants, waves, wave, fields, mc_cooldowns):
+        self.servants = servants
+        self.waves = waves
+        self.wave = wave
+        self.fields = fields
+        self.mc_cooldowns = mc_cooldowns
 
-# Configure logging
-logging.basicConfig(filename='./outputs/output.log', level=logging.INFO,
-                    format='%(asctime)s:%(levelname)s:%(message)s')
 
 class GameManager:
-    def __init__(self, servant_init_dicts, quest_id, mc_id):
+    def __init__(self, servant_init_dicts, quest_id, mc_id, tracer=None):
         self.servant_init_dicts = servant_init_dicts  # List of dicts
+        # Run-scoped event trace shared by every manager; see utils/trace.py
+        self.tracer = make_tracer(tracer)
         self.quest_id = quest_id
         self.mc_id = mc_id
         self.servants = [Servant(**params) for params in self.servant_init_dicts]
@@ -38,28 +54,91 @@ class GameManager:
         self.reset_servants()
         self.fields = []
 
+    def snapshot(self):
+        """Capture HP, buffs, cooldowns, NP gauges, wave and fields."""
+        return BattleSnapshot(
+            servants=[servant.clone() for servant in self.servants],
+            waves=self._clone_waves(self.quest.waves, self.wave),
+            wave=self.wave,
+            fields=[list(field) for field in self.fields],
+            mc_cooldowns=dict(self.mc.cooldowns),
+        )
+
+    def restore(self, snapshot):
+        """Reset this game to a snapshot without rebuilding servants or quest data."""
+        self._install(
+            servants=[servant.clone() for servant in snapshot.servants],
+            waves=self._clone_waves(snapshot.waves, snapshot.wave),
+            wave=snapshot.wave,
+            fields=[list(field) for field in snapshot.fields],
+            mc_cooldowns=dict(snapshot.mc_cooldowns),
+        )
+
+    def fork(self):
+        """Return an independent GameManager branched from the current state."""
+        branch = copy.copy(self)
+        state = self.snapshot()
+        # The snapshot is private to the branch, so adopt it without recloning
+        branch._install(state.servants, state.waves, state.wave, state.fields, state.mc_cooldowns)
+        return branch
+
+    def state_key(self):
+        """Canonical, hashable key of the battle state.
+
+        Two games with equal keys play out identically from here on:
+        servants and enemies keep their slot order (targeting depends on
+        it) but buffs, traits and fields compare as multisets. Waves not
+        reached yet are left out because nothing can have touched them.
+        """
+        return (
+            self.wave,
+            tuple(servant.state_key() for servant in self.servants),
+            tuple(enemy.state_key() for enemy in self.enemies),
+            tuple(sorted(tuple(field) for field in self.fields)),
+            tuple(self.mc.cooldowns.values()),
+        )
+
+    @staticmethod
+    def _clone_waves(waves, current_wave):
+        # Cleared waves are never touched again, so they can be shared
+        return {
+            wave_no: ([enemy.clone() for enemy in enemies] if wave_no >= current_wave else enemies)
+            for wave_no, enemies in waves.items()
+        }
+
+    def _install(self, servants, waves, wave, fields, mc_cooldowns):
+        # Quest and mystic code objects may be shared with other branches, so
+        # give this game its own shells before swapping in the state.
+        self.quest = copy.copy(self.quest)
+        self.quest.waves = waves
+        self.mc = copy.copy(self.mc)
+        self.mc.cooldowns = mc_cooldowns
+        self.servants = servants
+        self.fields = fields
+        self.wave = wave
+        self.enemies = self.quest.get_wave(wave)
+
     def swap_servants(self, frontline_idx, backline_idx):
         self.servants[frontline_idx], self.servants[backline_idx] = self.servants[backline_idx], self.servants[frontline_idx]
 
     # TODO part of the transformation refactoring mega todo
     def transform_aoko(self, aoko_buffs, aoko_cooldowns, aoko_np_gauge=None):
-        print("What? \nAoko is transforming!")
-        servants_list = [servant.name for servant in self.servants]
-        logging.info(f"servants are: {servants_list}")
+        tracer = self.tracer
+        if tracer.summary:
+            tracer.emit('transform', message="What? \nAoko is transforming!")
         for i, servant in enumerate(self.servants):
             if servant.id == 413:
                 # Create a fresh transformed Aoko instance
                 transformed = Servant(collectionNo=4132)
                 # Copy buffs, cooldowns, and optionally NP gauge
-                transformed.buffs.buffs = copy.deepcopy(aoko_buffs)
+                transformed.buffs.replace_buffs(copy.deepcopy(aoko_buffs))
                 transformed.skills.cooldowns = copy.deepcopy(aoko_cooldowns)
                 if aoko_np_gauge is not None:
                     transformed.np_gauge = aoko_np_gauge
                 # Replace in the party
                 self.servants[i] = transformed
-                print(f"Contratulations! Your 'Aoko Aozaki' transformed into '{transformed.name}' ")
-        servants_list = [servant.name for servant in self.servants]
-        logging.info(f"servants are: {servants_list}")
+                if tracer.summary:
+                    tracer.emit('transform', message=f"Contratulations! Your 'Aoko Aozaki' transformed into '{transformed.name}' ")
     
     def init_quest(self):
         self.quest = Quest(self.quest_id)
@@ -71,7 +150,8 @@ class GameManager:
             self.wave += 1
             next_wave = self.quest.get_wave(self.wave)  # Fetch the next wave
             self.enemies = next_wave  # Update self.enemies with the new wave
-            print(f"Advancing to wave {self.wave}")  # Debug statement
+            if self.tracer.summary:
+                self.tracer.emit('next_wave', wave=self.wave)
         except StopIteration:
             print("All waves completed. Ending program.")
             exit(0)  # Ends the program
@@ -1,8 +1,4 @@
-import logging
-
-# Configure logging
-logging.basicConfig(filename='./outputs/output.log', level=logging.INFO,
-                    format='%(asctime)s:%(levelname)s:%(message)s')
+from .damage_kernel import NPAttacker, NPTargets, merge_batches, np_damage_kernel
 
 # needed to increase consecutivly used NPs OC levels
 # should be static 
@@ -13,17 +9,24 @@ class npManager:
         self.sm = skill_manager
         self.tm = self.sm.tm
         self.gm = self.tm.gm
+        # NP refund of the last damaging NP; reported only, never applied
+        self.last_np_refund = 0
+        # Random damage modifier applied to every NP total; FGO rolls it in
+        # 0.9-1.1, the engine uses a flat 1.0 (see clear_probability)
+        self.damage_roll = 1.0
+        # Called as damage_listener(target, total_damage) for every target hit
+        self.damage_listener = None
 
     def use_np(self, servant):
-        logging.info("\n BEGINNING NP LOG \n")
-                
+        tracer = self.gm.tracer
         if servant.stats.get_npgauge() >= 99:
             for i in range(int(servant.stats.get_npgauge() // 100)-1):
-                print(f"Servant {servant.name} has {servant.np_gauge} NP% and can apply OVERCHARGE UP 1 * {servant.stats.get_npgauge() // 100} times")
+                if tracer.summary:
+                    tracer.emit('np_overcharge', servant=servant.name, gauge=servant.np_gauge, times=servant.stats.get_npgauge() // 100)
                 self.sm.apply_effect(np_oc_1_turn, servant)
                 servant.buffs.process_servant_buffs()
 
-            functions = servant.nps.get_np_values(servant.stats.get_np_level(), servant.stats.get_oc_level())
+            functions = [func.get('_legacy', func) for func in servant.nps.get_np_values(servant.stats.get_np_level(), servant.stats.get_oc_level())]
             servant.stats.set_npgauge(0)  # Reset NP gauge after use
             
             # initialize maintarget to None and max_hp to 0
@@ -40,13 +43,12 @@ class npManager:
             # Apply effects and damage
             for i, func in enumerate(functions):
                 if func['funcType'] in ['damageNp', 'damageNpPierce']:
-                    logging.info(f"firing basic ST or AOE NP of servant {servant}")
+                    if tracer.full:
+                        tracer.emit('np_fire', kind='basic ST or AOE', servant=servant.name)
                     # if non-SE NP check for AoE or ST    
                     if (func['funcTargetType'] == 'enemyAll'):
                         servant.buffs.process_servant_buffs()
-                        for enemy in self.gm.get_enemies():
-                            enemy.buffs.process_enemy_buffs()
-                            self.apply_np_damage(servant, enemy)
+                        self.apply_np_damage_all(servant, self.gm.get_enemies())
                     
                     elif (func['funcTargetType'] == 'enemy'):
                         servant.buffs.process_servant_buffs()
@@ -56,12 +58,11 @@ class npManager:
 
                 elif func['funcType'] in ['damageNpIndividualSum', 'damageNpStateIndividualFix', 'damageNpIndividual']:
                     # SE NPs
-                    logging.info(f"firing SE NP of servant {servant}")
+                    if tracer.full:
+                        tracer.emit('np_fire', kind='SE', servant=servant.name)
                     if (func['funcTargetType'] == 'enemyAll'):
                         servant.buffs.process_servant_buffs()
-                        for enemy in self.gm.get_enemies():
-                            enemy.buffs.process_enemy_buffs()
-                            self.apply_np_odd_damage(servant, enemy)
+                        self.apply_np_damage_all(servant, self.gm.get_enemies(), super_effective=True)
  
                     elif (func['funcTargetType'] == 'enemy'):
                         servant.buffs.process_servant_buffs()
@@ -88,7 +89,8 @@ class npManager:
             # If the NP had side-effects that mark the caster for death (self-sacrifice)
             # handle removal immediately so the effect is visible to the rest of the command flow.
             if getattr(servant, 'kill', False):
-                logging.info(f"Servant {servant.name} flagged for kill after NP; removing from party")
+                if tracer.summary:
+                    tracer.emit('servant_removed', message=f"Servant {servant.name} flagged for kill after NP; removing from party")
                 try:
                     idx = self.gm.servants.index(servant)
                 except ValueError:
@@ -100,167 +102,43 @@ class npManager:
                         swap = self.gm.servants[3]
                         self.gm.servants[idx] = swap
                         self.gm.servants.pop(3)
-                        logging.info(f"Replaced dead frontline servant with backline {swap.name}")
+                        if tracer.summary:
+                            tracer.emit('servant_removed', message=f"Replaced dead frontline servant with backline {swap.name}")
                     else:
                         # Otherwise just remove the servant from the list
                         removed = self.gm.servants.pop(idx)
-                        logging.info(f"Removed servant {removed.name} from party")
+                        if tracer.summary:
+                            tracer.emit('servant_removed', message=f"Removed servant {removed.name} from party")
 
                 # Reset the flag
                 servant.kill = False
-
-            logging.info("\n ENDING NP LOG \n")
         else:
-            print(f"{servant.name} does not have enough NP gauge: {servant.get_npgauge()}")
+            if tracer.summary:
+                tracer.emit('np_not_ready', servant=servant.name, gauge=servant.get_npgauge())
 
     def apply_np_damage(self, servant, target):
-        card_damage_value = None
-        card_type = servant.nps.card
-        card_np_value = 1
-        if card_type == 'buster':
-            card_damage_value = 1.5
-            card_eff_mod = servant.stats.get_b_up()
-            card_damage_mod = servant.stats.get_b_up() + servant.stats.get_buster_card_damage_up()
-            enemy_res_mod = target.get_b_resdown()
-        elif card_type == 'quick':
-            card_damage_value = 0.8
-            card_eff_mod = servant.stats.get_q_up()
-            card_damage_mod = servant.stats.get_q_up() + servant.stats.get_quick_card_damage_up()
-            enemy_res_mod = target.get_q_resdown()
-        elif card_type == 'arts':
-            card_damage_value = 1
-            card_np_value = 3
-            card_eff_mod = servant.stats.get_a_up()
-            card_damage_mod = servant.stats.get_a_up() + servant.stats.get_arts_card_damage_up()
-            enemy_res_mod = target.get_a_resdown()
-
-        class_modifier = servant.stats.get_class_multiplier(target.get_class())
-        attribute_modifier = servant.stats.get_attribute_modifier(target)
-        atk_mod = servant.stats.get_atk_mod()
-        enemy_def_mod = target.get_def()
-        power_mod = servant.stats.get_power_mod(target)
-        self_damage_mod = 0
-        np_damage_mod = servant.stats.get_np_damage_mod()
-        np_damage_multiplier, np_damage_correction_init, np_correction, np_correction_id, np_correction_target = servant.nps.get_np_damage_values(np_level=servant.stats.get_np_level(), oc=servant.stats.get_oc_level())
-
-
-        servant_atk = servant.stats.get_base_atk()
-        # Print all buffs and modifiers for debugging
-        logging.info(f"Servant ATK: {servant_atk} | NP Damage Multiplier: {np_damage_multiplier} | Card Damage Value: {card_damage_value} | Card damage Mod: {card_damage_mod} | Card eff Mod: {card_eff_mod} | Enemy Res Mod: {enemy_res_mod} | Class Modifier: {class_modifier} | Attribute Modifier: {attribute_modifier} | ATK Mod: {atk_mod} | Enemy Def Mod: {enemy_def_mod} | Power Mod: {power_mod} | Self Damage Mod: {self_damage_mod} | NP Damage Mod: {np_damage_mod}")
-
-        total_damage = (servant_atk * np_damage_multiplier * (card_damage_value * (1 + card_damage_mod - enemy_res_mod)) *
-                        class_modifier * attribute_modifier * 0.23 * (1 + atk_mod - enemy_def_mod) *
-                        (1 + self_damage_mod + np_damage_mod + power_mod))
-
-        # Record initial HP before damage
-        initial_hp = getattr(target, 'initial_hp', None)
-        if initial_hp is None:
-            initial_hp = target.get_hp()
-            setattr(target, 'initial_hp', initial_hp)
-
-        servant.stats.set_npgauge(0)
-        np_gain = servant.stats.get_npgain() * servant.stats.get_np_gain_mod()
-        np_distribution = servant.stats.get_npdist()
-        damage_per_hit = [total_damage * value/100 for value in np_distribution]
-
-        cumulative_damage = 0
-        for i, hit in enumerate(np_distribution):
-            hit_damage = damage_per_hit[i]
-            cumulative_damage += hit_damage
-            overkill_bonus = 1.5 if cumulative_damage > target.get_hp() else 1
-            specific_enemy_modifier = target.np_per_hit_mult
-
-            np_per_hit = (np_gain * card_np_value * (1 + card_eff_mod) * specific_enemy_modifier * overkill_bonus)
-
-            # Trigger handling: delegate to SkillManager.run_triggered_buff which
-            # understands the preserved svals/count and a registry of trigger
-            # handlers. This avoids hardcoding behaviors here and centralizes
-            # trigger semantics in SkillManager.
-            try:
-                for buff in list(servant.buffs.buffs):
-                    # let SkillManager decide if the buff should run for this card
-                    ran = False
-                    try:
-                        ran = self.sm.run_triggered_buff(buff=buff, source_servant=servant, target=target, card_type=card_type)
-                    except Exception:
-                        ran = False
-                    # If the triggered handler ran and the buff has a finite count,
-                    # decrement and drop if depleted. Handlers may also handle this.
-                    if ran:
-                        count = buff.get('count') or (buff.get('svals') or {}).get('Count')
-                        if isinstance(count, int):
-                            new_count = count - 1
-                            buff['count'] = new_count
-                            if new_count <= 0:
-                                try:
-                                    servant.buffs.buffs.remove(buff)
-                                except ValueError:
-                                    pass
-            except Exception:
-                pass
-
-            target.set_hp(hit_damage)
-            logging.info(f"{servant.name} deals {hit_damage} to {target.name} who has {target.get_hp()} hp left and gains {np_per_hit}% np")
-
-            if target.get_hp() <= 0:
-                logging.info(f"{target.get_name()} has been defeated by hit {i+1}!")
-
-        # Store damage and HP info for FSM serialization
-        if hasattr(target, 'fsm_damage_log'):
-            target.fsm_damage_log.append({
-                'servant': servant.name,
-                'damage': total_damage,
-                'initial_hp': initial_hp,
-                'current_hp': target.get_hp(),
-                'fraction_remaining': round(target.get_hp()/initial_hp, 4) if initial_hp else None
-            })
-        else:
-            target.fsm_damage_log = [{
-                'servant': servant.name,
-                'damage': total_damage,
-                'initial_hp': initial_hp,
-                'current_hp': target.get_hp(),
-                'fraction_remaining': round(target.get_hp()/initial_hp, 4) if initial_hp else None
-            }]
-        print(f"{servant.name} deals {total_damage} to {target.name} who has {target.get_hp()} hp left and gains {np_per_hit}% np | HP: {target.get_hp()}/{initial_hp} | Fraction Remaining: {round(target.get_hp()/initial_hp, 4) if initial_hp else None}")
+        return self.apply_np_damage_batch(servant, [target])
 
     def apply_np_odd_damage(self, servant, target):
-        card_damage_value = None
-        card_type = servant.nps.card
-        card_np_value = 1
-        
+        return self.apply_np_damage_batch(servant, [target], super_effective=True)
+
+    def _card_terms(self, servant, card_type):
+        """(card_damage_value, card_np_value, card_eff_mod, card_damage_mod, resist getter)."""
         if card_type == 'buster':
-            card_damage_value = 1.5
-            card_eff_mod = servant.stats.get_b_up()
-            card_damage_mod = servant.stats.get_b_up() + servant.stats.get_buster_card_damage_up()
-            enemy_res_mod = target.get_b_resdown()
+            return (1.5, 1, servant.stats.get_b_up(),
+                    servant.stats.get_b_up() + servant.stats.get_buster_card_damage_up(), lambda enemy: enemy.get_b_resdown())
         elif card_type == 'quick':
-            card_damage_value = 0.8
-            card_eff_mod = servant.stats.get_q_up()
-            card_damage_mod = servant.stats.get_q_up() + servant.stats.get_quick_card_damage_up()
-            enemy_res_mod = target.get_q_resdown()
+            return (0.8, 1, servant.stats.get_q_up(),
+                    servant.stats.get_q_up() + servant.stats.get_quick_card_damage_up(), lambda enemy: enemy.get_q_resdown())
         elif card_type == 'arts':
-            card_damage_value = 1
-            card_np_value = 3
-            card_eff_mod = servant.stats.get_a_up()
-            card_damage_mod = servant.stats.get_a_up() + servant.stats.get_arts_card_damage_up()
-            enemy_res_mod = target.get_a_resdown()
-        
-        class_modifier = servant.stats.get_class_multiplier(target.get_class())
-        attribute_modifier = servant.stats.get_attribute_modifier(target)
-        atk_mod = servant.stats.get_atk_mod()
-        enemy_def_mod = target.get_def()
-        power_mod = servant.stats.get_power_mod(target)
-        self_damage_mod = 0
-        np_damage_mod = servant.stats.get_np_damage_mod()
-        
-        # Cumulative Damage Logic
-        np_damage_multiplier, np_damage_correction_init, np_correction, np_correction_id, np_correction_target = servant.nps.get_np_damage_values(np_level=servant.stats.get_np_level(), oc=servant.stats.get_oc_level())
-        is_super_effective = 1
+            return (1, 3, servant.stats.get_a_up(),
+                    servant.stats.get_a_up() + servant.stats.get_arts_card_damage_up(), lambda enemy: enemy.get_a_resdown())
+        return (None, 1, None, None, lambda enemy: None)
+
+    def _super_effective(self, servant, target, np_correction, np_correction_id, np_correction_target):
+        """(modifier, is_super_effective) of a trait/buff-scaling NP against target."""
         super_effective_modifier = 1
         is_super_effective = 1 if np_correction_target in target.traits else 0
-        servant_atk = servant.stats.get_base_atk()
-        
         if np_correction_id:
             if np_correction_target == 1:
                 for id in np_correction_id:
@@ -275,68 +153,190 @@ class npManager:
                         super_effective_modifier += cum * np_correction
                         if super_effective_modifier > 0:
                             is_super_effective = 1
+        return super_effective_modifier, is_super_effective
+
+    def apply_np_damage_all(self, servant, enemies, super_effective=False):
+        """Process each enemy's buffs and fire servant's NP at all of them.
+
+        Each enemy's buffs are processed right before it is hit, as the
+        enemy-by-enemy loop did, since an on-hit trigger fired against one
+        enemy can debuff the next. Without on-hit triggers the NP cannot
+        change any enemy's buffs, so all of them are processed first and
+        the damage goes through one kernel call.
+        """
+        on_hit = self._on_hit_buffs(servant)
+        if on_hit and len(enemies) > 1:
+            batches = []
+            for enemy in enemies:
+                enemy.buffs.process_enemy_buffs()
+                batches.append(self._fire_np(servant, [enemy], super_effective, on_hit))
+            batch = merge_batches(batches)
+        else:
+            for enemy in enemies:
+                enemy.buffs.process_enemy_buffs()
+            batch = self._fire_np(servant, enemies, super_effective, on_hit)
+        self.last_np_refund = batch.refund
+        return batch
+
+    def apply_np_damage_batch(self, servant, targets, super_effective=False):
+        """Fire servant's NP at every target through one damage kernel call.
+
+        Enemy buffs must already be processed. managers.damage_kernel works out
+        damage, overkill and refund for all targets and hits at once; this
+        method applies HP, runs on-hit triggers hit by hit in the original
+        order and keeps the logs and per-target bookkeeping. Returns the
+        NPDamageBatch. Its refund is also kept in last_np_refund but, as
+        before, not added to the gauge.
+        """
+        on_hit = self._on_hit_buffs(servant)
+        if on_hit and len(targets) > 1:
+            # A trigger can consume buffs a later target's terms read (Magic
+            # Bullet stacks), so resolve the targets one at a time
+            batch = merge_batches([self._fire_np(servant, [target], super_effective, on_hit) for target in targets])
+        else:
+            batch = self._fire_np(servant, targets, super_effective, on_hit)
+        self.last_np_refund = batch.refund
+        return batch
+
+    def _on_hit_buffs(self, servant):
+        # Only on-hit buffs can make run_triggered_buff act, so skip the rest
+        # instead of offering every buff on every hit
+        on_hit = []
+        for buff in servant.buffs.buffs:
+            try:
+                svals = buff.get('svals')
+                trigger_type = buff.get('trigger_type') or (svals and 'TriggeredFuncPosition' in svals and 'on-hit')
+            except Exception:
+                trigger_type = 'on-hit'
+            if trigger_type == 'on-hit':
+                on_hit.append(buff)
+        return on_hit
 
-        # Print all buffs and modifiers for debugging  
-        logging.info(f"Servant ATK: {servant_atk} | NP Damage Multiplier: {np_damage_multiplier} | initial np correction amount: {np_damage_correction_init} | np correction: {np_correction} | what id is used for the correction {np_correction_id} | target or buff that effects np_correction amounts:{np_correction_target} | Card Damage Value: {card_damage_value} | Card Mod: {card_eff_mod} | Card Damage Mod: {card_damage_mod} | Enemy Res Mod: {enemy_res_mod} | Class Modifier: {class_modifier} | Attribute Modifier: {attribute_modifier} | ATK Mod: {atk_mod} | Enemy Def Mod: {enemy_def_mod} | Power Mod: {power_mod} | Self Damage Mod: {self_damage_mod} | NP Damage Mod: {np_damage_mod} | Super Effective Modifier: {super_effective_modifier} | Is Super Effective: {is_super_effective}")
-        
-        if super_effective_modifier:
-            is_super_effective = 1
-
-        if np_correction_id:
-            logging.info(f"does this enemy {target.name} with traits {target.traits} get super effected with this servants np who is SE against {np_correction_id}? {any(trait in target.traits for trait in np_correction_id)}")
-        else: 
-            logging.info(f"does this enemy {target.name} with traits {target.traits} get super effected with this servants np who is SE against")
-
-        total_damage = (servant_atk * np_damage_multiplier * (card_damage_value * (1 + card_damage_mod - enemy_res_mod)) *
-            class_modifier * attribute_modifier * 0.23 * (1 + atk_mod - enemy_def_mod) *
-            (1 + self_damage_mod + np_damage_mod + power_mod) * 
-            (1 + (((super_effective_modifier if is_super_effective == 1 else 0) - 1))))
+    def _fire_np(self, servant, targets, super_effective, on_hit):
+        tracer = self.gm.tracer
+        card_type = servant.nps.card
+        card_damage_value, card_np_value, card_eff_mod, card_damage_mod, resist_of = self._card_terms(servant, card_type)
+        atk_mod = servant.stats.get_atk_mod()
+        self_damage_mod = 0
+        np_damage_mod = servant.stats.get_np_damage_mod()
+        np_damage_multiplier, np_damage_correction_init, np_correction, np_correction_id, np_correction_target = servant.nps.get_np_damage_values(np_level=servant.stats.get_np_level(), oc=servant.stats.get_oc_level())
+        servant_atk = servant.stats.get_base_atk()
 
-        logging.info(f"Total Damage: {total_damage}")
+        columns = {field: [] for field in NPTargets._fields}
+        details = []
+        for target in targets:
+            if super_effective:
+                super_effective_modifier, is_super_effective = self._super_effective(
+                    servant, target, np_correction, np_correction_id, np_correction_target)
+                if super_effective_modifier:
+                    is_super_effective = 1
+                se_factor = (1 + (((super_effective_modifier if is_super_effective == 1 else 0) - 1)))
+            else:
+                super_effective_modifier, is_super_effective, se_factor = None, None, 1
+            columns['class_mod'].append(servant.stats.get_class_multiplier(target.get_class()))
+            columns['attribute_mod'].append(servant.stats.get_attribute_modifier(target))
+            columns['defense'].append(target.get_def())
+            columns['resist'].append(resist_of(target))
+            columns['power_mod'].append(servant.stats.get_power_mod(target))
+            columns['se_factor'].append(se_factor)
+            columns['hp'].append(target.get_hp())
+            columns['np_mult'].append(target.np_per_hit_mult)
+            details.append((super_effective_modifier, is_super_effective))
 
         np_gain = servant.stats.get_npgain() * servant.stats.get_np_gain_mod()
-        np_distribution = servant.stats.get_npdist()
-        damage_per_hit = [total_damage * value/100 for value in np_distribution]
-
-        cumulative_damage = 0
-        for i, hit in enumerate(np_distribution):
-            hit_damage = damage_per_hit[i]
-            cumulative_damage += hit_damage
-            overkill_bonus = 1.5 if cumulative_damage > target.get_hp() else 1
-            specific_enemy_modifier = target.np_per_hit_mult
-
-            np_per_hit = (np_gain * card_np_value * (1 + card_eff_mod) * specific_enemy_modifier * overkill_bonus)
-
-            # Trigger handling: delegate to SkillManager.run_triggered_buff which
-            # understands the preserved svals/count and a registry of trigger
-            # handlers. This avoids hardcoding behaviors here and centralizes
-            # trigger semantics in SkillManager.
-            try:
-                for buff in list(servant.buffs.buffs):
-                    # let SkillManager decide if the buff should run for this card
+        attacker = NPAttacker(servant_atk, np_damage_multiplier, card_damage_value, card_damage_mod, atk_mod,
+                              np_damage_mod, np_gain, card_np_value, card_eff_mod)
+        batch = np_damage_kernel(attacker, NPTargets(**columns), servant.stats.get_npdist(), roll=self.damage_roll)
+
+        for e, target in enumerate(targets):
+            if tracer.full:
+                terms = {
+                    'atk': servant_atk, 'np_multiplier': np_damage_multiplier, 'card_damage_value': card_damage_value,
+                    'card_eff_mod': card_eff_mod, 'card_damage_mod': card_damage_mod, 'enemy_res_mod': columns['resist'][e],
+                    'class_mod': columns['class_mod'][e], 'attribute_mod': columns['attribute_mod'][e], 'atk_mod': atk_mod,
+                    'enemy_def_mod': columns['defense'][e], 'power_mod': columns['power_mod'][e],
+                    'self_damage_mod': self_damage_mod, 'np_damage_mod': np_damage_mod, 'total': batch.total[e],
+                }
+                if super_effective:
+                    terms.update(np_correction_init=np_damage_correction_init, np_correction=np_correction,
+                                 np_correction_id=np_correction_id, np_correction_target=np_correction_target,
+                                 super_effective_modifier=details[e][0], is_super_effective=details[e][1],
+                                 traits=list(target.traits))
+                tracer.emit('np_terms', servant=servant.name, target=target.name, terms=terms)
+
+            total_damage = batch.total[e]
+            if self.damage_listener is not None:
+                self.damage_listener(target, total_damage)
+            if not super_effective:
+                # Record initial HP before damage
+                initial_hp = getattr(target, 'initial_hp', None)
+                if initial_hp is None:
+                    initial_hp = target.get_hp()
+                    setattr(target, 'initial_hp', initial_hp)
+                servant.stats.set_npgauge(0)
+
+            hits = batch.hits[e]
+            for i, hit_damage in enumerate(hits):
+                if on_hit:
+                    self._run_on_hit_triggers(servant, target, card_type, on_hit)
+                if tracer.full:
+                    tracer.emit('np_hit', servant=servant.name, target=target.name, damage=hit_damage,
+                                hp=batch.hp_after[e][i], refund=batch.refund_per_hit[e][i])
+                    if batch.hp_after[e][i] <= 0:
+                        tracer.emit('np_defeated', target=target.get_name(), hit=i + 1)
+            if hits:
+                # The kernel subtracted the hits one by one, exactly as set_hp would
+                target.hp = batch.hp_after[e][-1]
+            np_per_hit = batch.refund_per_hit[e][-1] if hits else None
+
+            if super_effective:
+                if tracer.summary:
+                    tracer.emit('np_se_damage', servant=servant.stats.get_name(), target=target.get_name(),
+                                damage=total_damage, hp=target.hp)
+                continue
+            # Store damage and HP info for FSM serialization
+            entry = {
+                'servant': servant.name,
+                'damage': total_damage,
+                'initial_hp': initial_hp,
+                'current_hp': target.get_hp(),
+                'fraction_remaining': round(target.get_hp()/initial_hp, 4) if initial_hp else None
+            }
+            if hasattr(target, 'fsm_damage_log'):
+                target.fsm_damage_log.append(entry)
+            else:
+                target.fsm_damage_log = [entry]
+            if tracer.summary:
+                tracer.emit('np_damage', servant=servant.name, target=target.name, damage=total_damage, hp=target.get_hp(),
+                            refund=np_per_hit, initial_hp=initial_hp, fraction=entry['fraction_remaining'])
+
+        return batch
+
+    def _run_on_hit_triggers(self, servant, target, card_type, on_hit):
+        # Trigger handling: delegate to SkillManager.run_triggered_buff which
+        # understands the preserved svals/count and a registry of trigger
+        # handlers. This avoids hardcoding behaviors here and centralizes
+        # trigger semantics in SkillManager.
+        try:
+            for buff in list(on_hit):
+                # let SkillManager decide if the buff should run for this card
+                ran = False
+                try:
+                    ran = self.sm.run_triggered_buff(buff=buff, source_servant=servant, target=target, card_type=card_type)
+                except Exception:
                     ran = False
-                    try:
-                        ran = self.sm.run_triggered_buff(buff=buff, source_servant=servant, target=target, card_type=card_type)
-                    except Exception:
-                        ran = False
-                    # If the triggered handler ran and the buff has a finite count,
-                    # decrement and drop if depleted. Handlers may also handle this.
-                    if ran:
-                        count = buff.get('count') or (buff.get('svals') or {}).get('Count')
-                        if isinstance(count, int):
-                            new_count = count - 1
-                            buff['count'] = new_count
-                            if new_count <= 0:
-                                try:
-                                    servant.buffs.buffs.remove(buff)
-                                except ValueError:
-                                    pass
-            except Exception:
-                pass
-
-            target.set_hp(hit_damage)
-            logging.info(f"{servant.name} deals {hit_damage} to {target.name} who has {target.get_hp()} hp left and gains {np_per_hit}% np")
-
-            if target.get_hp() <= 0:
-                logging.info(f"{target.get_name()} has been defeated by hit {i+1}!")
-        print(f"{servant.stats.get_name()} attacks {target.get_name()} with Noble Phantasm for {'%.0f' % total_damage} total damage! {target.get_name()} is left with {target.hp} hp")
+                # If the triggered handler ran and the buff has a finite count,
+                # decrement and drop if depleted. Handlers may also handle this.
+                if ran:
+                    count = buff.get('count') or (buff.get('svals') or {}).get('Count')
+                    if isinstance(count, int):
+                        new_count = count - 1
+                        buff['count'] = new_count
+                        if new_count <= 0:
+                            on_hit.remove(buff)
+                            try:
+                                servant.buffs.remove(buff)
+                            except ValueError:
+                                pass
+        except Exception:
+            pass
@@ -1,8 +1,3 @@
-import logging
-
-# Configure logging
-logging.basicConfig(filename='./outputs/output.log', level=logging.INFO,
-                    format='%(asctime)s:%(levelname)s:%(message)s')
 
 # Module-level trigger registry for future extensibility. We prefer
 # data-driven detection of trigger semantics (on-hit, end-turn, counter)
@@ -182,7 +177,8 @@ class SkillManager:
         functvals = state.get('functvals', [])
         tvals = [tval.get('id') for tval in state.get('tvals', [])] if state.get('tvals') else []
         turns = state.get('turns')
-        logging.info(f"added buff {buff} to {getattr(target, 'name', '<unknown>')}")
+        if self.gm.tracer.full:
+            self.gm.tracer.emit('buff_added', buff=buff, target=getattr(target, 'name', '<unknown>'))
 
         raw_svals = state.get('svals')
         count = state.get('count')
@@ -208,7 +204,10 @@ class SkillManager:
         """
         trigger_type = buff.get('trigger_type') or (buff.get('svals') and ('TriggeredFuncPosition' in buff.get('svals')) and 'on-hit')
         svals = buff.get('svals', {}) or {}
-        logging.info(f"run_triggered_buff check: buff={buff.get('buff')} trigger_type={trigger_type} card_type={card_type} svals={svals} tvals={buff.get('tvals')} count={buff.get('count')}")
+        tracer = self.gm.tracer
+        if tracer.full:
+            tracer.emit('trigger_check', buff=buff.get('buff'), trigger_type=trigger_type, card_type=card_type,
+                        svals=svals, tvals=buff.get('tvals'), count=buff.get('count'))
 
         # Respect card-type restrictions if present
         if card_type and buff.get('tvals'):
@@ -235,14 +234,16 @@ class SkillManager:
 
             if grant:
                 # interpret small numbers as percentages
-                logging.info(f"run_triggered_buff: granting NP {grant}% to {getattr(source_servant,'name',None)}")
+                if tracer.full:
+                    tracer.emit('trigger_grant', grant=grant, servant=getattr(source_servant, 'name', None))
                 source_servant.set_npgauge(grant / 100)
                 return True
 
             # Counter-style on-hit: if no numeric grant but Count exists, we
             # treat this as a stack-consuming effect with no direct grant here.
             if isinstance(buff.get('count'), int) or ('Count' in svals):
-                logging.info(f"run_triggered_buff: detected counter-style trigger for {buff.get('buff')}")
+                if tracer.full:
+                    tracer.emit('trigger_counter', buff=buff.get('buff'))
                 # nothing to do here at generic level; caller may decrement
                 return True
 
@@ -268,31 +269,33 @@ class SkillManager:
             mystic_code.cooldowns = {0: 0, 1: 0, 2: 0}
         if mystic_code.cooldowns[skill_num] == 0:
             skill = mystic_code.get_skill_by_num(skill_num)
-            print(f"Using Mystic Code skill: {skill['name']}")
+            if self.gm.tracer.summary:
+                self.gm.tracer.emit('mc_skill_used', name=skill['name'])
+            # svals were resolved to max level when the catalog compiled the
+            # skill; the functions are shared and read-only
             for effect in skill['functions']:
-                # Always use the last svals if it's a list
-                svals = effect.get('svals', [])
-                if isinstance(svals, list) and svals:
-                    effect['svals'] = svals[-1]
                 # Pass None as servant; apply_effect will handle targeting
                 self.apply_effect(effect, None, target)
             mystic_code.cooldowns[skill_num] = skill['cooldown']
         else:
-            print(f"Mystic Code skill {skill_num} is on cooldown: {mystic_code.cooldowns[skill_num]} turns remaining")
+            if self.gm.tracer.summary:
+                self.gm.tracer.emit('mc_skill_on_cooldown', skill=skill_num, cooldown=mystic_code.cooldowns[skill_num])
 
     def use_skill(self, servant, skill_num, target=None):
-        logging.info(f"BEGINNING USE_SKILL OF {servant.name}' SKILL {servant.skills.get_skill_by_num(skill_num+1)}")
+        tracer = self.gm.tracer
         skill_num += 1
         if self.skill_available(servant, skill_num):
             skill = servant.skills.get_skill_by_num(skill_num)
             servant.skills.set_skill_cooldown(skill_num)
-            logging.info(f"Skill {skill_num} used. Cooldown remaining: {servant.skills.get_skill_cooldowns()[skill_num]} turns")
-            logging.info(f"Applying {servant.name}'s {servant.skills.get_skill_by_num(skill_num)}")
+            if tracer.summary:
+                tracer.emit('skill_used', skill=skill_num, servant=servant.name, cooldown=servant.skills.get_skill_cooldowns()[skill_num])
             for effect in skill['functions']:
-                self.apply_effect(effect, servant, target)
+                # Normalized effects carry the flat engine format under _legacy
+                self.apply_effect(effect.get('_legacy', effect), servant, target)
 
         else:
-            print(f"{servant.name} skill {skill_num} is on cooldown: {servant.skills.cooldowns[skill_num]} turns remaining")
+            if tracer.summary:
+                tracer.emit('skill_on_cooldown', servant=servant.name, skill=skill_num, cooldown=servant.skills.cooldowns[skill_num])
             return False
 
     # TODO check API call to see what indexing is necessary for swapping
@@ -303,12 +306,14 @@ class SkillManager:
 
         # Check if indices are valid
         if frontline_index < 0 or frontline_index > 2 or backline_index < 3 or backline_index >= len(self.gm.servants):
-            print(f"Invalid swap indices: frontline {frontline_idx}, backline {backline_idx}")
+            if self.gm.tracer.summary:
+                self.gm.tracer.emit('invalid_swap', front=frontline_idx, back=backline_idx)
             return False
 
-        # Print before swap for clarity
-        print(f"Swapping frontline servant {frontline_idx}:{self.gm.servants[frontline_index].name} (ID {self.gm.servants[frontline_index].id}) "
-            f"with backline servant {backline_idx}:{self.gm.servants[backline_index].name} (ID {self.gm.servants[backline_index].id})")
+        if self.gm.tracer.summary:
+            front, back = self.gm.servants[frontline_index], self.gm.servants[backline_index]
+            self.gm.tracer.emit('swap', front=f"{frontline_idx}:{front.name} (ID {front.id})",
+                                back=f"{backline_idx}:{back.name} (ID {back.id})")
 
         self.gm.swap_servants(frontline_index, backline_index)
         return True
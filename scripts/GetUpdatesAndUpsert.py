@@ -1,8 +1,6 @@
-import requests
 import json
 import os
 import re
-import time
 try:
     from pymongo import MongoClient
 except Exception as e:
@@ -12,6 +10,11 @@ import logging
 import hashlib
 from copy import deepcopy
 import argparse
+try:
+    from scripts.downloader import TokenBucket, fetch_json, make_session, run_concurrently
+except ImportError:
+    # Run as `python scripts/GetUpdatesAndUpsert.py`
+    from downloader import TokenBucket, fetch_json, make_session, run_concurrently
 
 # Configure logging: write to file and to console. LOG_LEVEL env can override.
 log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
@@ -54,15 +57,15 @@ servants_collection = db['servants']
 quests_collection = db['quests']
 mysticcode_collection = db['mysticcodes']
 
-# Reuse a single session for connection pooling
-session = requests.Session()
-session.headers.update({
-    'Accept': 'application/json',
-    'User-Agent': 'FGO-CanItFarm-Updater/1.0'
-})
-
 # Rate limiting: seconds between requests (can be fractional). Default 1s.
 RATE_LIMIT_SECONDS = float(os.getenv('RATE_LIMIT_SECONDS', '1'))
+# Requests in flight at once; the rate limit still spaces out their starts
+DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', '4'))
+
+# Reuse a single session for connection pooling, shared by the download threads
+session = make_session(DOWNLOAD_WORKERS)
+# Every request, retries included, takes a token (scripts/downloader.py)
+rate_limiter = TokenBucket.from_interval(RATE_LIMIT_SECONDS)
 
 def _compute_source_hash(obj):
     """Compute a stable hash for a JSON-serializable object.
@@ -152,60 +155,23 @@ def upsert_servant(data):
     else:
         logging.error("Servant data missing 'collectionNo' field")
 
-def download_and_upsert(url, upsert_function):
+def fetch(url):
+    """Download url's JSON through the shared session and rate limiter."""
     # Configurable retry/backoff
-    MAX_RETRIES = int(os.getenv('MAX_RETRIES', '4'))
-    BACKOFF_BASE = float(os.getenv('BACKOFF_BASE', '1.0'))  # base seconds for exponential backoff
-    MAX_BACKOFF = float(os.getenv('MAX_BACKOFF', '60'))
+    return fetch_json(
+        url, session, rate_limiter,
+        max_retries=int(os.getenv('MAX_RETRIES', '4')),
+        backoff_base=float(os.getenv('BACKOFF_BASE', '1.0')),  # base seconds for exponential backoff
+        max_backoff=float(os.getenv('MAX_BACKOFF', '60')),
+    )
 
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = session.get(url, timeout=30)
-
-            # Handle rate limiting explicitly
-            if response.status_code == 429:
-                retry_after = response.headers.get('Retry-After')
-                if retry_after:
-                    try:
-                        sleep_seconds = float(retry_after)
-                    except Exception:
-                        sleep_seconds = BACKOFF_BASE * (2 ** attempt)
-                else:
-                    sleep_seconds = min(MAX_BACKOFF, BACKOFF_BASE * (2 ** attempt))
-
-                # jitter: +/-20%
-                jitter = sleep_seconds * 0.2 * (0.5 - os.urandom(1)[0] / 255.0)
-                sleep_seconds = max(0.1, sleep_seconds + jitter)
-                logging.warning(f"429 received for {url}, sleeping {sleep_seconds:.1f}s before retry")
-                time.sleep(sleep_seconds)
-                continue
 
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    upsert_function(data)
-                    return True
-                except json.JSONDecodeError as e:
-                    logging.error(f"JSONDecodeError: {e}")
-                    logging.error(f"Response content: {response.content}")
-                    return False
-
-            # Other non-200 responses are treated as transient; log and retry with backoff
-            logging.debug(f"Non-200 response {response.status_code} for {url}")
-
-        except requests.RequestException as e:
-            logging.warning(f"RequestException for {url}: {e}")
-
-        # Exponential backoff with jitter before next attempt
-        backoff = min(MAX_BACKOFF, BACKOFF_BASE * (2 ** attempt))
-        # jitter +/- 30%
-        jitter = backoff * 0.3 * (0.5 - os.urandom(1)[0] / 255.0)
-        sleep_seconds = max(0.1, backoff + jitter)
-        logging.debug(f"Sleeping {sleep_seconds:.1f}s before retrying {url} (attempt {attempt + 1}/{MAX_RETRIES})")
-        time.sleep(sleep_seconds)
-
-    logging.error(f"Exceeded max retries ({MAX_RETRIES}) for {url}")
-    return False
+def download_and_upsert(url, upsert_function):
+    data = fetch(url)
+    if data is None:
+        return False
+    upsert_function(data)
+    return True
 
 def retrieve_servants():
     servant_url = 'https://api.atlasacademy.io/nice/JP/servant/{}?lore=true&expand=true&lang=en'
@@ -241,17 +207,18 @@ def retrieve_servants():
 
     # If last_known_servant_id is provided, use the simple loop (manual mode)
     if last_known_servant_id:
-        while current_servant_id <= last_known_servant_id:
-            if current_servant_id in skip_ids:
-                logging.debug(f"Skipping hardcoded non-playable id {current_servant_id}")
-                current_servant_id += 1
-                continue
+        servant_ids = []
+        for servant_id in range(current_servant_id, last_known_servant_id + 1):
+            if servant_id in skip_ids:
+                logging.debug(f"Skipping hardcoded non-playable id {servant_id}")
+            else:
+                servant_ids.append(servant_id)
 
-            url = servant_url.format(current_servant_id)
-            if not download_and_upsert(url, upsert_servant):
-                logging.error(f"Failed to process servant ID: {current_servant_id}")
-            current_servant_id += 1
-            time.sleep(RATE_LIMIT_SECONDS)  # Adding a configurable delay between requests
+        def process(servant_id):
+            if not download_and_upsert(servant_url.format(servant_id), upsert_servant):
+                logging.error(f"Failed to process servant ID: {servant_id}")
+
+        run_concurrently(servant_ids, process, DOWNLOAD_WORKERS)
         return
 
     # Otherwise fall back to auto-discovery (conservative defaults)
@@ -261,37 +228,28 @@ def retrieve_servants():
 
     consecutive_misses = 0
     max_checked_id = 0
+    last_checked_id = 0
 
     while consecutive_misses < CONSECUTIVE_MISS_LIMIT and current_servant_id <= MAX_ID_LIMIT:
-        if current_servant_id in skip_ids:
-            logging.debug(f"Skipping hardcoded non-playable id {current_servant_id}")
-            current_servant_id += 1
-            continue
-
-        url = servant_url.format(current_servant_id)
-
-        try:
-            resp = session.get(url, timeout=30)
-        except requests.RequestException as e:
-            logging.error(f"RequestException while checking servant {current_servant_id}: {e}")
-            # treat network issues as a miss and continue with backoff logic
-            consecutive_misses += 1
+        # Probe the next DOWNLOAD_WORKERS ids at once, then walk the results
+        # in id order; a window may fetch a few ids past the last miss.
+        window = []
+        while len(window) < DOWNLOAD_WORKERS and current_servant_id <= MAX_ID_LIMIT:
+            if current_servant_id in skip_ids:
+                logging.debug(f"Skipping hardcoded non-playable id {current_servant_id}")
+            else:
+                window.append(current_servant_id)
             current_servant_id += 1
-            time.sleep(RATE_LIMIT_SECONDS)
-            continue
-
-        if resp.status_code != 200:
-            # Not a valid servant page
-            logging.debug(f"Servant {current_servant_id} returned {resp.status_code}")
-            consecutive_misses += 1
-        else:
-            try:
-                data = resp.json()
-            except Exception:
-                logging.error(f"Invalid JSON for servant {current_servant_id}")
+        probes = run_concurrently([servant_url.format(servant_id) for servant_id in window], fetch, DOWNLOAD_WORKERS)
+
+        for servant_id, data in zip(window, probes):
+            if consecutive_misses >= CONSECUTIVE_MISS_LIMIT:
+                break
+            last_checked_id = servant_id
+            if data is None:
+                # Not a valid servant page (or it kept failing)
+                logging.debug(f"Servant {servant_id} not found")
                 consecutive_misses += 1
-                current_servant_id += 1
-                time.sleep(RATE_LIMIT_SECONDS)
                 continue
 
             # Heuristic: treat entries without playable indicators as non-playable (bosses / NPCs)
@@ -303,50 +261,49 @@ def retrieve_servants():
 
             if not collection_no or not (has_mst_skill or has_skills or has_cards):
                 # This appears to be a non-playable or invalid servant (e.g., boss). Count as a miss.
-                logging.debug(f"Servant {current_servant_id} not playable or missing collectionNo/playable fields (mstSkill/skills/cards)")
+                logging.debug(f"Servant {servant_id} not playable or missing collectionNo/playable fields (mstSkill/skills/cards)")
                 consecutive_misses += 1
             else:
-                # Valid playable servant found — process and reset consecutive misses
+                # Valid playable servant found — upsert the probed document and reset consecutive misses
                 consecutive_misses = 0
-                max_checked_id = max(max_checked_id, current_servant_id)
-                # Use the existing download_and_upsert pipeline so retries/backoff apply
-                if not download_and_upsert(url, upsert_servant):
-                    logging.error(f"Failed to process servant ID: {current_servant_id}")
+                max_checked_id = max(max_checked_id, servant_id)
+                upsert_servant(data)
 
-        current_servant_id += 1
-        time.sleep(RATE_LIMIT_SECONDS)
+    logging.info(f"Finished servant discovery. Last checked id: {last_checked_id}, max playable id seen: {max_checked_id}")
+
+
+def quest_ids_from_war(data):
+    """Ids of the repeatable 40 AP farming quests of a war document."""
+    quest_ids = []
+    spots = data.get('spots', [])
+    for spot in spots:
+        quests = spot.get('quests', [])
+        for quest in quests:
+            recommend_lv = quest.get('recommendLv', '')
+            consume = quest.get('consume', 0)
+            after_clear = quest.get('afterClear', '')
+            if recommend_lv in ['90', '90+', '90++', '90★', '90★★', '90★★★', '100★★', '100★★★'] and consume == 40 and after_clear == 'repeatLast':
+                quest_ids.append(quest.get('id', 'UnknownID'))
+    return quest_ids
 
-    logging.info(f"Finished servant discovery. Last checked id: {current_servant_id-1}, max playable id seen: {max_checked_id}")
 
 def get_quest_ids_from_api(war_id):
     url = f'https://api.atlasacademy.io/nice/JP/war/{war_id}?lang=en'
-    try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            quest_ids = []
-            spots = data.get('spots', [])
-            for spot in spots:
-                quests = spot.get('quests', [])
-                for quest in quests:
-                    recommend_lv = quest.get('recommendLv', '')
-                    consume = quest.get('consume', 0)
-                    after_clear = quest.get('afterClear', '')
-                    if recommend_lv in ['90', '90+', '90++', '90★', '90★★', '90★★★', '100★★', '100★★★'] and consume == 40 and after_clear == 'repeatLast':
-                        quest_ids.append(quest.get('id', 'UnknownID'))
-            return quest_ids
-        else:
-            logging.error(f"Failed to download data from {url}, status code: {response.status_code}")
-    except requests.RequestException as e:
-        logging.error(f"RequestException: {e}")
-    return []
+    data = fetch(url)
+    if data is None:
+        logging.error(f"Failed to download data from {url}")
+        return []
+    return quest_ids_from_war(data)
+
 
 def get_quest_details_and_upsert(quest_ids):
-    for quest_id in quest_ids:
+    def process(quest_id):
         url = f'https://api.atlasacademy.io/nice/JP/quest/{quest_id}/1?lang=en'
         if not download_and_upsert(url, upsert_quest):
             logging.error(f"Failed to process quest ID: {quest_id}")
-        time.sleep(RATE_LIMIT_SECONDS)  # Adding a configurable delay between requests
+
+    run_concurrently(quest_ids, process, DOWNLOAD_WORKERS)
+
 
 def main(run_quests: bool = True, run_servants: bool = True):
     """Run quests and/or servants update phases.
@@ -377,8 +334,7 @@ def main(run_quests: bool = True, run_servants: bool = True):
 
     all_quest_ids = []
     if run_quests:
-        for war_id in war_ids:
-            quest_ids = get_quest_ids_from_api(war_id)
+        for quest_ids in run_concurrently(war_ids, get_quest_ids_from_api, DOWNLOAD_WORKERS):
             all_quest_ids.extend(quest_ids)
 
         logging.info(f"Found {len(all_quest_ids)} quest ids to process")
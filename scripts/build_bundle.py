@@ -0,0 +1,43 @@
+"""Export servants, quests and mystic codes from MongoDB into a local bundle.
+
+Point FGO_DATA_BUNDLE at the output to run the simulator, command search
+and batch runner without MongoDB:
+
+    python -m scripts.build_bundle fgo_data.bundle
+    FGO_DATA_BUNDLE=fgo_data.bundle python -m sim_entry_points.batch_runner jobs.json
+"""
+import argparse
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+from utils.bundle import COLLECTION_KEYS, write_bundle
+
+
+def build_bundle(db, path):
+    collections = {name: db[name].find({}) for name in COLLECTION_KEYS}
+    return write_bundle(path, collections)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export game data from MongoDB into a local bundle file')
+    parser.add_argument('path', help='bundle file to write')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s:%(levelname)s:%(message)s')
+    load_dotenv()
+    mongo_uri = os.getenv('MONGO_URI_READ') or os.getenv('MONGO_URI')
+    if not mongo_uri:
+        raise ValueError("No MONGO_URI_READ or MONGO_URI environment variable set")
+
+    from pymongo import MongoClient
+    client = MongoClient(mongo_uri)
+    start = time.perf_counter()
+    counts = build_bundle(client['FGOCanItFarmDatabase'], args.path)
+    logging.info(f"Wrote {counts} to {args.path} ({os.path.getsize(args.path) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,90 @@
 import os
-from pymongo import MongoClient
-from dotenv import load_dotenv
-import sys
-
-# Connect to MongoDB
-# Load environment variables from .env file
-load_dotenv()
-# Get the username and password from environment variables
-# Set the encoding to UTF-8
-
-# MongoDB connection
-mongo_uri = os.getenv('MONGO_URI_READ')
-if not mongo_uri:
-    raise ValueError("No MONGO_URI_READ environment variable set")
-
-client = MongoClient(mongo_uri)
-db = client['FGOCanItFarmDatabase']
-servants_collection = db['servants']
-quests_collection = db['quests']
-mysticcode_collection = db['mysticcodes']
-
-# Set the encoding to UTF-8
-sys.stdout.reconfigure(encoding='utf-8')
+import threading
+
+# Nothing connects at import time: `db` is a proxy that opens the real
+# database on first use, so importing the simulator stays cheap and needs
+# no credentials until a document is actually read.
+
+_lock = threading.Lock()
+_client = None
+_db = None
+
+
+def get_db():
+    """Return the game data database, connecting on first call.
+
+    Uses the local bundle named by FGO_DATA_BUNDLE when set (see
+    scripts/build_bundle.py), otherwise MongoDB at MONGO_URI_READ.
+    """
+    global _client, _db
+    if _db is not None:
+        return _db
+    with _lock:
+        if _db is None:
+            from dotenv import load_dotenv
+
+            # Load environment variables from .env file
+            load_dotenv()
+            bundle_path = os.getenv('FGO_DATA_BUNDLE')
+            if bundle_path:
+                from utils.bundle import BundleDB
+
+                _db = BundleDB(bundle_path)
+            else:
+                from pymongo import MongoClient
+
+                mongo_uri = os.getenv('MONGO_URI_READ')
+                if not mongo_uri:
+                    raise ValueError("No MONGO_URI_READ environment variable set")
+                from utils.metrics import mongo_listener
+
+                _client = MongoClient(mongo_uri, event_listeners=[mongo_listener()])
+                _db = _client['FGOCanItFarmDatabase']
+    return _db
+
+
+def get_client():
+    """The MongoClient behind get_db(), or None when reading a bundle."""
+    get_db()
+    return _client
+
+
+def close_client():
+    """Close the MongoClient, if one is open; the next get_db() reconnects.
+
+    pymongo clients are not fork-safe, so call this before forking
+    processes that may read the database. A bundle is left open: its
+    sqlite connections are already per process.
+    """
+    global _client, _db
+    with _lock:
+        client, _client = _client, None
+        if client is not None:
+            _db = None
+    if client is not None:
+        client.close()
+
+
+class LazyDatabase:
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+    def __getitem__(self, name):
+        return get_db()[name]
+
+
+db = LazyDatabase()
+
+_COLLECTIONS = {
+    'servants_collection': 'servants',
+    'quests_collection': 'quests',
+    'mysticcode_collection': 'mysticcodes',
+}
+
+
+def __getattr__(name):
+    if name == 'client':
+        return get_client()
+    if name in _COLLECTIONS:
+        return get_db()[_COLLECTIONS[name]]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,161 @@
+"""Rate-limited, concurrent JSON downloads for GetUpdatesAndUpsert.py.
+
+The updater used to fetch one URL at a time and sleep RATE_LIMIT_SECONDS
+after each, so a refresh took (latency + delay) per URL. Here a shared
+TokenBucket spaces out request starts, and a small thread pool keeps
+several requests in flight. A refresh then takes about
+URLs x RATE_LIMIT_SECONDS, however slow each response is.
+
+fetch_json() has the retry, backoff and 429 handling that
+download_and_upsert() used to have inline. Every attempt, retries
+included, takes a token. A 429 also pauses the bucket for every
+thread, not just the one that got it.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, `burst` at once.
+
+    acquire() reserves a token and sleeps until it is due, so waiting
+    threads are served in arrival order without busy-waiting. A rate of
+    0 (or less) disables limiting.
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(burst)
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_interval(cls, seconds, burst=1):
+        """Bucket allowing one request every `seconds` (0 disables it)."""
+        return cls(1.0 / seconds if seconds > 0 else 0, burst)
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Take a token, sleeping until one is available; returns the wait."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(self.clock())
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """Hold back every caller for `seconds`, e.g. after a 429."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill(self.clock())
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+def _jitter(seconds, fraction):
+    # +/- fraction/2 of seconds
+    return seconds * fraction * (0.5 - os.urandom(1)[0] / 255.0)
+
+
+def fetch_json(url, session, limiter=None, max_retries=4, backoff_base=1.0, max_backoff=60.0, sleep=time.sleep):
+    """GET url and parse its JSON, retrying transient failures.
+
+    Returns the parsed body, or None if the URL does not exist (404), the
+    body is not JSON, or max_retries attempts failed. A 429 waits once for
+    Retry-After (or exponential backoff), through the limiter's pause when
+    there is one; other errors back off exponentially with jitter.
+    """
+    for attempt in range(max_retries):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            response = session.get(url, timeout=30)
+
+            # Handle rate limiting explicitly
+            if response.status_code == 429:
+                retry_after = response.headers.get('Retry-After')
+                if retry_after:
+                    try:
+                        sleep_seconds = float(retry_after)
+                    except Exception:
+                        sleep_seconds = backoff_base * (2 ** attempt)
+                else:
+                    sleep_seconds = min(max_backoff, backoff_base * (2 ** attempt))
+
+                # jitter: +/-20%
+                sleep_seconds = max(0.1, sleep_seconds + _jitter(sleep_seconds, 0.2))
+                logging.warning(f"429 received for {url}, sleeping {sleep_seconds:.1f}s before retry")
+                if limiter is not None and limiter.rate > 0:
+                    # The next acquire() waits the pause out, here and in
+                    # every other thread sharing the limiter
+                    limiter.pause(sleep_seconds)
+                else:
+                    sleep(sleep_seconds)
+                continue
+
+            if response.status_code == 200:
+                try:
+                    return response.json()
+                except json.JSONDecodeError as e:
+                    logging.error(f"JSONDecodeError: {e}")
+                    logging.error(f"Response content: {response.content}")
+                    return None
+
+            if response.status_code == 404:
+                # Missing ids are expected while probing; retrying will not help
+                logging.debug(f"404 for {url}")
+                return None
+
+            # Other non-200 responses are treated as transient; log and retry with backoff
+            logging.debug(f"Non-200 response {response.status_code} for {url}")
+
+        except requests.RequestException as e:
+            logging.warning(f"RequestException for {url}: {e}")
+
+        # Exponential backoff with jitter before next attempt
+        backoff = min(max_backoff, backoff_base * (2 ** attempt))
+        # jitter +/- 30%
+        sleep_seconds = max(0.1, backoff + _jitter(backoff, 0.3))
+        logging.debug(f"Sleeping {sleep_seconds:.1f}s before retrying {url} (attempt {attempt + 1}/{max_retries})")
+        sleep(sleep_seconds)
+
+    logging.error(f"Exceeded max retries ({max_retries}) for {url}")
+    return None
+
+
+def run_concurrently(items, fn, workers):
+    """[fn(item) for item in items] on up to `workers` threads, in order."""
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='download') as executor:
+        return list(executor.map(fn, items))
+
+
+def make_session(workers, user_agent='FGO-CanItFarm-Updater/1.0'):
+    """A requests.Session whose connection pool fits `workers` threads."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=max(10, workers))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Accept': 'application/json',
+        'User-Agent': user_agent,
+    })
+    return session
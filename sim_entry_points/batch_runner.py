@@ -0,0 +1,201 @@
+"""Run many simulations across worker processes.
+
+Jobs look like the /simulate payload (``Team``, ``Mystic_Code_ID``,
+``Quest_ID``, ``Commands``) or are ``(team, mc_id, quest_id, commands)``
+tuples. Results are yielded as workers finish them, tagged with the
+index of the job they belong to.
+
+Servant and quest templates and mystic code documents are loaded into the
+process caches once, in the parent, before the pool starts. With the fork
+start method the workers inherit those caches copy-on-write and never go
+back to MongoDB for them; with spawn the worker initializer preloads the
+same keys once per worker instead. A key that fails to load fails only
+the jobs that need it; they are reported with an ``error`` like any other
+failed job. The parent's MongoDB client is closed before forking, since
+pymongo clients are not fork-safe; a worker that does need the database
+opens its own connection.
+
+    python -m sim_entry_points.batch_runner jobs.json --workers 8
+"""
+import argparse
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from managers.MysticCode import select_mystic_code
+from managers.Quest import get_quest_template
+from scripts.connectDB import close_client
+from units.Servant import get_servant_template
+from sim_entry_points.traverse_api_input import simulate
+from utils.quiet import quiet_engine, silence_engine
+
+
+def normalize_job(job):
+    if isinstance(job, dict):
+        return job['Team'], job['Mystic_Code_ID'], job['Quest_ID'], job['Commands']
+    team, mc_id, quest_id, commands = job
+    return team, mc_id, quest_id, commands
+
+
+def job_keys(job):
+    """The (kind, ...) preload keys one job touches."""
+    team, mc_id, quest_id, _ = normalize_job(job)
+    keys = {('quest', quest_id), ('mystic_code', mc_id)}
+    for servant in team:
+        collection_no = servant.get('collectionNo')
+        if not collection_no:
+            continue
+        keys.add(('servant', collection_no, servant.get('ascension', 1), bool(servant.get('append_5', False))))
+        if collection_no == 413:
+            # Aoko's transformed form is built mid-battle
+            keys.add(('servant', 4132, 1, False))
+    return keys
+
+
+def preload_keys(jobs):
+    """Collect the servant/quest/mystic code keys a batch will touch."""
+    servants, quests, mystic_codes = set(), set(), set()
+    for job in jobs:
+        for kind, *key in job_keys(job):
+            if kind == 'servant':
+                servants.add(tuple(key))
+            elif kind == 'quest':
+                quests.add(key[0])
+            else:
+                mystic_codes.add(key[0])
+    return sorted(servants), sorted(quests), sorted(mystic_codes)
+
+
+def preload_game_data(keys):
+    """Load keys into the process caches.
+
+    Returns {(kind, ...): error} for the keys that raised, so one bad
+    document or lookup does not stop the others from loading.
+    """
+    servants, quests, mystic_codes = keys
+    loads = [(('servant',) + key, get_servant_template, key) for key in servants]
+    loads += [(('quest', quest_id), get_quest_template, (quest_id,)) for quest_id in quests]
+    loads += [(('mystic_code', mc_id), select_mystic_code, (mc_id,)) for mc_id in mystic_codes]
+    failures = {}
+    for key, load, args in loads:
+        try:
+            load(*args)
+        except Exception as e:
+            logging.exception(f"preloading {key} failed")
+            failures[key] = f"{type(e).__name__}: {e}"
+    return failures
+
+
+def _init_worker(keys, quiet):
+    if quiet:
+        # Every token prints and logs; across N workers that is pure overhead
+        silence_engine()
+    # A no-op after fork; under spawn this is the one load per worker
+    preload_game_data(keys)
+
+
+def job_summary(index, job):
+    team, mc_id, quest_id, _ = normalize_job(job)
+    return {
+        'index': index,
+        'team': [servant.get('collectionNo') for servant in team],
+        'mc_id': mc_id,
+        'quest_id': quest_id,
+    }
+
+
+def failed_job(index, job, error):
+    """Summary of a job that was not run because its game data failed to load."""
+    summary = job_summary(index, job)
+    summary.update(cleared=False, error=error, elapsed=0.0)
+    return summary
+
+
+def run_job(index, job):
+    """Simulate one job; the summary is its SimulationResult as a dict."""
+    start = time.perf_counter()
+    team, mc_id, quest_id, commands = normalize_job(job)
+    summary = job_summary(index, job)
+    try:
+        result = simulate(team, mc_id, quest_id, commands)
+    except Exception as e:
+        logging.exception(f"batch job {index} failed")
+        summary.update(cleared=False, error=f"{type(e).__name__}: {e}")
+    else:
+        summary.update(result.to_dict(), error=None)
+    summary['elapsed'] = round(time.perf_counter() - start, 6)
+    return summary
+
+
+def run_chunk(chunk):
+    return [run_job(index, job) for index, job in chunk]
+
+
+def run_batch(jobs, max_workers=None, chunksize=None, quiet=True, mp_context=None):
+    """Yield one summary dict per job, in completion order.
+
+    max_workers defaults to the CPU count; max_workers=1 runs in-process,
+    which is easier to debug and profile. Jobs go to the workers in chunks
+    since a single simulation is often only a millisecond or two, about
+    what the round trip to a worker costs; by default each worker gets
+    around eight chunks so results still stream steadily.
+    """
+    jobs = list(enumerate(jobs))
+    if not jobs:
+        return
+    failures = preload_game_data(preload_keys(job for _, job in jobs))
+    if failures:
+        runnable = []
+        for index, job in jobs:
+            errors = [failures[key] for key in sorted(job_keys(job), key=repr) if key in failures]
+            if errors:
+                yield failed_job(index, job, errors[0])
+            else:
+                runnable.append((index, job))
+        jobs = runnable
+        if not jobs:
+            return
+    keys = preload_keys(job for _, job in jobs)
+
+    if max_workers == 1:
+        for index, job in jobs:
+            with quiet_engine() if quiet else contextlib.nullcontext():
+                result = run_job(index, job)
+            yield result
+        return
+
+    if mp_context is None:
+        methods = multiprocessing.get_all_start_methods()
+        mp_context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    if mp_context.get_start_method() == 'fork':
+        close_client()
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    if not chunksize:
+        chunksize = max(1, min(64, len(jobs) // (max_workers * 8)))
+    chunks = [jobs[i:i + chunksize] for i in range(0, len(jobs), chunksize)]
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context,
+                             initializer=_init_worker, initargs=(keys, quiet)) as pool:
+        futures = [pool.submit(run_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a batch of simulations and print one JSON line per result.")
+    parser.add_argument('jobs', help="JSON file holding a list of /simulate payloads")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunksize', type=int, default=None, help="jobs sent to a worker at a time (default: automatic)")
+    args = parser.parse_args(argv)
+
+    with open(args.jobs) as f:
+        jobs = json.load(f)
+    for result in run_batch(jobs, max_workers=args.workers, chunksize=args.chunksize):
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,358 @@
+import logging
+import time
+
+from Driver import Driver, SKILL_LETTERS, MC_LETTERS, NP_TOKENS, parse_token
+from utils.transposition import TranspositionTable
+
+OBJECTIVES = ('shortest', 'cheapest')
+NP_CHARGE_FUNCS = ('gainNp', 'gainMultiplyNp')
+
+
+class CommandSearch:
+    """Depth-first branch-and-bound search over the Driver token language.
+
+    Every candidate token is executed on a single Driver and undone with
+    GameManager snapshots, so the solutions are exactly what
+    traverse_api_input would replay.
+
+    Objectives:
+      shortest -- fewest tokens.
+      cheapest -- fewest cooldown turns spent on servant and mystic code
+                  skills (ties broken by token count), i.e. keep the most
+                  resources for later.
+
+    Pruning:
+      * skills on cooldown, mystic code skills on cooldown and NPs below
+        99% gauge are never generated;
+      * actions inside a turn are generated in a canonical order (servant
+        skills, mystic code, swap, NPs), so permutations of the same set are
+        explored once; a swap reopens the skills of the new frontline;
+      * '#' is only generated once the wave is cleared, and a turn that has
+        fired an NP without clearing can only fire more NPs;
+      * a state already reached at equal or lower cost (see
+        GameManager.state_key and utils.transposition) is dominated, so
+        orderings that reach the same buffs, cooldowns and gauges are
+        explored once;
+      * branches whose cost plus a lower bound cannot beat the best known
+        solution are cut.
+    """
+
+    def __init__(self, servant_init_dicts, mc_id, quest_id, objective='shortest',
+                 max_turns=None, time_budget=None, max_solutions=1, max_nodes=None, table_size=None):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective {objective!r}, expected one of {OBJECTIVES}")
+        servant_init_dicts = [s for s in servant_init_dicts if s.get("collectionNo")]
+        self.driver = Driver(servant_init_dicts, quest_id, mc_id, trace='off')
+        self.driver.reset_state()
+        self.objective = objective
+        total_waves = self.driver.game_manager.total_waves
+        # Each turn has to clear a wave, so there is never a reason to look
+        # further than the wave count.
+        self.max_turns = min(max_turns, total_waves) if max_turns else total_waves
+        self.time_budget = time_budget
+        self.max_solutions = max(1, max_solutions)
+        self.max_nodes = max_nodes
+        # Upper bound on sequence length: every skill, mystic code skill and
+        # NP once per turn plus a swap and the end of turn marker.
+        self.max_tokens = self.max_turns * (len(SKILL_LETTERS) + len(MC_LETTERS) + len(NP_TOKENS) + 2)
+        self.token_limit = None
+        self._stop_at_first = False
+
+        self.solutions = []
+        self.table = TranspositionTable(table_size) if table_size else TranspositionTable()
+        self.nodes = 0
+        self.pruned = 0
+        self.timed_out = False
+        self._deadline = None
+
+    # --- public -------------------------------------------------------
+
+    def run(self):
+        start = time.perf_counter()
+        self._deadline = start + self.time_budget if self.time_budget else None
+        # The Driver traces nothing, so the engine neither prints nor logs per action
+        try:
+            if self.max_turns < self.driver.game_manager.total_waves:
+                pass  # one wave per turn at most, nothing to search
+            elif self.objective == 'shortest':
+                self._deepen()
+            else:
+                self._search(tokens=[], cost=0, turn=1, floor=0, fired_np=False)
+        except _SearchStopped:
+            self.timed_out = True
+        elapsed = time.perf_counter() - start
+        logging.info(f"command search explored {self.nodes} nodes, pruned {self.pruned}, "
+                     f"found {len(self.solutions)} solutions in {elapsed:.3f}s")
+        return {
+            'objective': self.objective,
+            'solutions': [
+                {'commands': tokens, 'turns': tokens.count('#'), 'cost': cost}
+                for cost, tokens in self.solutions
+            ],
+            'complete': not self.timed_out,
+            'nodes': self.nodes,
+            'pruned': self.pruned,
+            'transpositions': self.table.stats(),
+            'elapsed': round(elapsed, 4),
+        }
+
+    # --- search -------------------------------------------------------
+
+    def _deepen(self):
+        """Iterative deepening on token count for the shortest objective.
+
+        Depth-first search with a plain bound tends to commit to the first
+        long sequence it finds; raising a token limit one step at a time
+        makes the first solutions found the shortest ones. A plain pass
+        seeds one solution first so a run cut short by the time budget still
+        has an answer.
+        """
+        gm = self.driver.game_manager
+        root = gm.snapshot()
+        self._stop_at_first = True
+        try:
+            self._search(tokens=[], cost=0, turn=1, floor=0, fired_np=False)
+        except _FirstSolution:
+            # Unwound past the per-node restores
+            gm.restore(root)
+        self._stop_at_first = False
+        if not self.solutions:
+            # The seeding pass ran to completion without a bound: no solution
+            return
+
+        self.token_limit = 2 * gm.total_waves
+        while self.token_limit <= self.max_tokens:
+            if len(self.solutions) >= self.max_solutions and len(self.solutions[-1][1]) <= self.token_limit:
+                return
+            self.table.clear()
+            self._search(tokens=[], cost=0, turn=1, floor=0, fired_np=False)
+            self.token_limit += 1
+
+    def _search(self, tokens, cost, turn, floor, fired_np):
+        self.nodes += 1
+        if self._deadline and self.nodes % 64 == 0 and time.perf_counter() > self._deadline:
+            raise _SearchStopped()
+        if self.max_nodes and self.nodes > self.max_nodes:
+            raise _SearchStopped()
+
+        gm = self.driver.game_manager
+        if self._bounded_out(cost, len(tokens)):
+            self.pruned += 1
+            return
+        # A lower floor and not having fired yet both leave more moves open,
+        # so they rank like cost: smaller dominates.
+        if self.table.check_and_store(gm.state_key(), (cost, len(tokens), floor, int(fired_np))):
+            self.pruned += 1
+            return
+
+        snapshot = gm.snapshot()
+        for move in self._moves(gm, floor, fired_np):
+            move_tokens, move_cost, next_floor, is_np, ends_turn, apply = move
+            # Cheap bound before paying for apply/restore: after anything but
+            # '#' this wave still needs its end of turn, later waves need two.
+            tail = 2 * (gm.total_waves - gm.wave) + (0 if ends_turn else 1)
+            if self._cannot_improve(cost + move_cost, len(tokens) + len(move_tokens), tail):
+                self.pruned += 1
+                continue
+            result = apply()
+            if result is False:
+                gm.restore(snapshot)
+                continue
+            path = tokens + move_tokens
+            if ends_turn:
+                if result is True:
+                    self._record(cost + move_cost, path)
+                elif turn < self.max_turns:
+                    self._search(path, cost + move_cost, turn + 1, 0, False)
+            elif not is_np or self._any_np_left(gm, next_floor) or self._wave_cleared(gm):
+                self._search(path, cost + move_cost, turn, next_floor, fired_np or is_np)
+            else:
+                self.pruned += 1
+            gm.restore(snapshot)
+
+    def _moves(self, gm, floor, fired_np):
+        """Yield (tokens, cost, next_floor, is_np, ends_turn, apply) in search order.
+
+        NPs and end of turn come first so a solution is found early and the
+        bound can start cutting; skills are tried afterwards.
+        """
+        if self._wave_cleared(gm):
+            # execute_token('#') hides end_turn's final-wave True, so call it directly
+            yield (['#'], 0, 0, False, True, self.driver.turn_manager.end_turn)
+            return
+
+        np_base = len(SKILL_LETTERS) + len(MC_LETTERS) + 1
+        for idx, token in enumerate(NP_TOKENS):
+            order = np_base + idx
+            if order < floor or idx >= len(gm.servants[:3]):
+                continue
+            if gm.servants[idx].stats.get_npgauge() >= 99:
+                yield ([token], 0, order + 1, True, False, self._token(token))
+        if fired_np:
+            return
+
+        # Skills that fill NP gauge are tried first: they are what unlocks
+        # the next NP, so the depth-first pass reaches a solution sooner.
+        # Order inside a turn is still fixed by the floor, so this changes
+        # which branch is explored first, never which sets are explored.
+        actions = []
+        for idx, letter in enumerate(SKILL_LETTERS):
+            if idx < floor or idx // 3 >= len(gm.servants[:3]):
+                continue
+            servant = gm.servants[idx // 3]
+            skill_num = idx % 3 + 1
+            if not servant.skills.skill_available(skill_num):
+                continue
+            skill = _peek_skill(servant.skills, skill_num)
+            if skill is None:
+                continue
+            skill_cost = servant.skills.max_cooldowns.get(skill_num, 0)
+            for token in self._targets(letter, skill['functions'], len(gm.servants[:3])):
+                actions.append((self._priority(gm, token, skill),
+                                ([token], skill_cost, idx + 1, False, False, self._token(token))))
+
+        mc = gm.mc
+        for idx, letter in enumerate(MC_LETTERS):
+            order = len(SKILL_LETTERS) + idx
+            if order < floor or idx >= len(mc.skills) or mc.cooldowns.get(idx, 0) != 0:
+                continue
+            skill = mc.skills[idx]
+            if _is_order_change(skill):
+                continue
+            for token in self._targets(letter, skill['functions'], len(gm.servants[:3])):
+                actions.append((self._priority(gm, token, skill),
+                                ([token], skill['cooldown'], order + 1, False, False, self._token(token))))
+
+        swap_order = len(SKILL_LETTERS) + len(MC_LETTERS)
+        if floor <= swap_order and len(gm.servants) > 3:
+            for idx, skill in enumerate(mc.skills):
+                if _is_order_change(skill) and mc.cooldowns.get(idx, 0) == 0:
+                    for front in range(1, 4):
+                        for back in range(1, len(gm.servants) - 2):
+                            token = f"x{front}{back}"
+                            # A swap brings in new skills, so reopen the skill range
+                            actions.append(((1, 0), ([token], skill['cooldown'], 0, False, False,
+                                                     self._swap(token, idx, skill['cooldown']))))
+                    break
+
+        actions.sort(key=lambda action: action[0])
+        for _, move in actions:
+            yield move
+
+    @staticmethod
+    def _priority(gm, token, skill):
+        if not any(func.get('funcType') in NP_CHARGE_FUNCS for func in skill['functions']):
+            return (1, 0)
+        if len(token) == 2:
+            # Charge whoever is closest to firing first
+            return (0, -gm.servants[int(token[1]) - 1].np_gauge)
+        return (0, 0)
+
+    def _token(self, token):
+        action = parse_token(token)
+        return lambda: self.driver.execute_action(action)
+
+    def _swap(self, token, mc_idx, cooldown):
+        action = parse_token(token)
+
+        def apply():
+            result = self.driver.execute_action(action)
+            # The token language swaps directly; charge the order change skill
+            # here so the search cannot swap twice.
+            self.driver.game_manager.mc.cooldowns[mc_idx] = cooldown
+            return result
+        return apply
+
+    @staticmethod
+    def _targets(letter, functions, frontline):
+        if any(_target_type(func) == 'ptOne' for func in functions):
+            return [f"{letter}{t}" for t in range(1, frontline + 1)]
+        return [letter]
+
+    def _any_np_left(self, gm, floor):
+        np_base = len(SKILL_LETTERS) + len(MC_LETTERS) + 1
+        return any(
+            np_base + idx >= floor and servant.stats.get_npgauge() >= 99
+            for idx, servant in enumerate(gm.servants[:3])
+        )
+
+    @staticmethod
+    def _wave_cleared(gm):
+        return all(enemy.get_hp() <= 0 for enemy in gm.get_enemies())
+
+    # --- bookkeeping --------------------------------------------------
+
+    def _score(self, cost, length):
+        return (length, cost) if self.objective == 'shortest' else (cost, length)
+
+    def _bounded_out(self, cost, length):
+        # Every wave still standing needs at least an NP and an end of turn
+        gm = self.driver.game_manager
+        if self._wave_cleared(gm):
+            remaining = 1
+        elif self._any_np_left(gm, 0):
+            remaining = 2
+        else:
+            # Nobody can fire yet, so at least one charge is still needed
+            remaining = 3
+        remaining += 2 * (gm.total_waves - gm.wave)
+        return self._cannot_improve(cost, length, remaining)
+
+    def _cannot_improve(self, cost, length, remaining):
+        if self.token_limit is not None and length + remaining > self.token_limit:
+            return True
+        if len(self.solutions) < self.max_solutions:
+            return False
+        optimistic = self._score(cost, length + remaining)
+        worst_cost, worst_tokens = self.solutions[-1]
+        worst = self._score(worst_cost, len(worst_tokens))
+        return optimistic >= worst
+
+    def _record(self, cost, tokens):
+        if any(found == tokens for _, found in self.solutions):
+            return
+        self.solutions.append((cost, tokens))
+        self.solutions.sort(key=lambda s: self._score(s[0], len(s[1])))
+        del self.solutions[self.max_solutions:]
+        if self._stop_at_first:
+            raise _FirstSolution()
+
+
+class _SearchStopped(Exception):
+    pass
+
+
+class _FirstSolution(Exception):
+    pass
+
+
+def _peek_skill(skills, skill_num):
+    # Skills.get_skill_by_num flips Melusine's one-shot flag, so look without it
+    variants = skills.skills.get(skill_num)
+    if not variants:
+        return None
+    if not skills.melusine_skill and variants[0]['id'] == 888550:
+        return variants[0]
+    return variants[-1]
+
+
+def _target_type(func):
+    return func.get('funcTargetType') or func.get('targetType')
+
+
+def _is_order_change(skill):
+    return any(func.get('funcType') == 'replaceMember' for func in skill['functions'])
+
+
+def search_commands(servant_init_dicts, mc_id, quest_id, objective='shortest',
+                    max_turns=None, time_budget=None, max_solutions=1, max_nodes=None, table_size=None):
+    """Find token sequences that clear every wave of the quest.
+
+    Returns a dict with the best ``solutions`` (each a command list ready for
+    traverse_api_input, its turn count and cost), whether the search space
+    was exhausted (``complete``) and search statistics.
+    """
+    search = CommandSearch(servant_init_dicts, mc_id, quest_id, objective=objective,
+                           max_turns=max_turns, time_budget=time_budget,
+                           max_solutions=max_solutions, max_nodes=max_nodes, table_size=table_size)
+    return search.run()
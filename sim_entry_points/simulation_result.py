@@ -0,0 +1,139 @@
+"""Compact, JSON-ready summary of a simulation run.
+
+ResultRecorder watches each token as traverse_api_input executes it and
+fills in a SimulationResult as it goes. The size of the result therefore
+depends only on the number of waves, NPs fired and enemies. The Driver
+object graph (raw servant documents, buff dicts, damage logs) never goes
+out over the wire.
+"""
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+from sim_entry_points.clear_probability import ClearProbability
+
+
+@dataclass
+class WaveResult:
+    wave: int
+    cleared: bool = False
+    # Turn (1-based) on which the wave was cleared
+    turn: Optional[int] = None
+
+
+@dataclass
+class NPDamage:
+    token: str
+    servant: str
+    wave: int
+    turn: int
+    # HP removed from each enemy of the wave, overkill included
+    damage: List[float]
+    total: float
+
+
+@dataclass
+class SimulationResult:
+    quest_id: int
+    mc_id: int
+    team: List[int]
+    cleared: bool = False
+    wave: int = 1
+    total_waves: int = 0
+    turns: int = 0
+    waves: List[WaveResult] = field(default_factory=list)
+    np_damage: List[NPDamage] = field(default_factory=list)
+    enemy_hp: List[float] = field(default_factory=list)
+    np_gauges: List[float] = field(default_factory=list)
+    tokens_executed: int = 0
+    failed_token: Optional[str] = None
+    # Only filled in when samples are requested
+    clear_probability: Optional[ClearProbability] = None
+    # Rendered utils.trace lines, when a trace level was requested
+    trace: Optional[List[str]] = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class ResultRecorder:
+    """Builds a SimulationResult from the actions a Driver executes."""
+
+    def __init__(self, driver, mc_id, quest_id):
+        gm = driver.game_manager
+        self.driver = driver
+        self.result = SimulationResult(
+            quest_id=quest_id,
+            mc_id=mc_id,
+            team=[servant.id for servant in gm.servants],
+            total_waves=gm.total_waves,
+            waves=[WaveResult(wave=wave) for wave in range(1, gm.total_waves + 1)],
+        )
+        self._hp_before = None
+        self._caster = ''
+        self._ending_wave = None
+        # Turn in progress, and whether any token has been played in it
+        self._turn = 1
+        self._turn_started = False
+
+    def before(self, action):
+        if action.kind == 'np':
+            gm = self.driver.game_manager
+            servant_idx = action.args[0]
+            # Read the caster now: a self-sacrificing NP removes it from the party
+            self._caster = gm.servants[servant_idx].name if servant_idx < len(gm.servants) else ''
+            self._hp_before = [enemy.get_hp() for enemy in gm.get_enemies()]
+        elif action.kind == 'end_turn':
+            gm = self.driver.game_manager
+            # end_turn only advances once every enemy is down; note the wave
+            # now, since a successful end_turn moves on to the next one
+            self._ending_wave = None
+            if all(enemy.get_hp() <= 0 for enemy in gm.get_enemies()) and gm.wave <= len(self.result.waves):
+                self._ending_wave = gm.wave
+
+    def after(self, action, outcome):
+        result = self.result
+        gm = self.driver.game_manager
+        if outcome is False:
+            result.failed_token = action.token
+            return
+        result.tokens_executed += 1
+        if action.kind == 'np' and self._hp_before is not None:
+            enemies = gm.get_enemies()
+            damage = [before - enemy.get_hp() for before, enemy in zip(self._hp_before, enemies)]
+            self._hp_before = None
+            if any(damage):
+                result.np_damage.append(NPDamage(
+                    token=action.token,
+                    servant=self._caster,
+                    wave=gm.wave,
+                    turn=self._turn,
+                    damage=damage,
+                    total=sum(damage),
+                ))
+        if action.kind == 'end_turn':
+            # Only an end_turn that went through clears the wave; one that
+            # fails (e.g. a self-kill with no backline) leaves it open
+            if self._ending_wave is not None:
+                wave = result.waves[self._ending_wave - 1]
+                wave.cleared = True
+                wave.turn = self._turn
+                self._ending_wave = None
+            self._turn += 1
+            self._turn_started = False
+        else:
+            self._turn_started = True
+
+    def finish(self):
+        result = self.result
+        gm = self.driver.game_manager
+        enemies = gm.get_enemies()
+        result.wave = gm.wave
+        result.turns = self._turn if self._turn_started else self._turn - 1
+        result.enemy_hp = [enemy.get_hp() for enemy in enemies]
+        result.np_gauges = [servant.get_npgauge() for servant in gm.servants]
+        result.cleared = gm.wave >= gm.total_waves and all(hp <= 0 for hp in result.enemy_hp)
+        if result.cleared and result.waves and not result.waves[-1].cleared:
+            # The final wave counts as cleared without a closing '#'
+            result.waves[-1].cleared = True
+            result.waves[-1].turn = self._turn
+        return result
@@ -1,36 +1,77 @@
 import argparse
 import os
 import json
-from dotenv import load_dotenv
-from pymongo import MongoClient
-from Driver import Driver
+import time
+from Driver import Driver, parse_commands
+from sim_entry_points.clear_probability import DamageTrace, estimate_clear_probability, validate_samples
+from sim_entry_points.simulation_result import ResultRecorder
+from utils.metrics import registry as metrics_registry, time_block, SETUP_SECONDS, SIMULATION_SECONDS, TOKEN_SECONDS
 import logging
 
-# Configure logging
-logging.basicConfig(filename='./outputs/traverse_api_input.log', level=logging.INFO,
-                    format='%(asctime)s:%(levelname)s:%(message)s')
+# Game data comes from scripts.connectDB (MongoDB or a local FGO_DATA_BUNDLE)
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Get MongoDB URI from environment variable
-mongo_uri = os.getenv('MONGO_URI_READ')
-if not mongo_uri:
-    raise ValueError("No MONGO_URI_READ environment variable set")
-
-# Connect to MongoDB
-client = MongoClient(mongo_uri)
-db = client['FGOCanItFarmDatabase']
-
-def traverse_api_input(servant_init_dicts, mc_id, quest_id, commands):
+def _new_driver(servant_init_dicts, mc_id, quest_id, trace=None):
     servant_init_dicts = [s for s in servant_init_dicts if s.get("collectionNo")]
-    driver = Driver(servant_init_dicts, quest_id, mc_id)
-    driver.reset_state()
+    with time_block(SETUP_SECONDS):
+        driver = Driver(servant_init_dicts, quest_id, mc_id, trace=trace)
+        driver.reset_state()
+    return driver
 
-    for command in commands:
-        result = driver.execute_token(command)
+
+def _run_commands(driver, commands, recorder=None):
+    timing = metrics_registry.enabled
+    for action in parse_commands(commands):
+        if recorder is not None:
+            recorder.before(action)
+        if timing:
+            start = time.perf_counter()
+            result = driver.execute_action(action)
+            TOKEN_SECONDS.labels(action.kind).observe(time.perf_counter() - start)
+        else:
+            result = driver.execute_action(action)
+        if recorder is not None:
+            recorder.after(action, result)
         if result is False:
-            logging.error(f"Failed to execute command: {command}")
+            logging.error(f"Failed to execute command: {action.token}")
             break 
     logging.info("Commands executed successfully.")
-    return driver  # Always return driver for logging and testing purposes
\ No newline at end of file
+
+
+def clear_probability(servant_init_dicts, mc_id, quest_id, commands, samples, seed=None):
+    """Chance the commands clear each wave under the 0.9-1.1 damage roll.
+
+    Costs one extra simulation plus the vectorized sampling, whatever
+    the number of samples.
+    """
+    validate_samples(samples)
+    driver = _new_driver(servant_init_dicts, mc_id, quest_id, trace='off')
+    trace = DamageTrace(driver)
+    _run_commands(driver, commands)
+    return estimate_clear_probability(trace, samples, seed)
+
+
+def traverse_api_input(servant_init_dicts, mc_id, quest_id, commands, samples=None, seed=None, trace=None):
+    driver = _new_driver(servant_init_dicts, mc_id, quest_id, trace)
+    _run_commands(driver, commands)
+    if samples:
+        driver.clear_probability = clear_probability(servant_init_dicts, mc_id, quest_id, commands, samples, seed)
+    return driver  # Always return driver for logging and testing purposes
+
+
+def simulate(servant_init_dicts, mc_id, quest_id, commands, samples=None, seed=None, trace='off'):
+    """Run the commands and return a SimulationResult instead of the Driver.
+
+    With samples, the result also carries the clear probability under the
+    random damage roll. Tracing is off unless a utils.trace level is given;
+    the rendered lines then come back in result.trace.
+    """
+    with time_block(SIMULATION_SECONDS):
+        driver = _new_driver(servant_init_dicts, mc_id, quest_id, trace)
+        recorder = ResultRecorder(driver, mc_id, quest_id)
+        _run_commands(driver, commands, recorder)
+        result = recorder.finish()
+        if driver.tracer.summary:
+            result.trace = driver.tracer.render()
+        if samples:
+            result.clear_probability = clear_probability(servant_init_dicts, mc_id, quest_id, commands, samples, seed)
+        return result
@@ -0,0 +1,5 @@
+import os
+
+# Drivers built by the tests would otherwise log every run to
+# ./outputs/output.log; set SIM_LOG_FILE to a path to keep a log
+os.environ.setdefault('SIM_LOG_FILE', '')
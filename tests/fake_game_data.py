@@ -0,0 +1,140 @@
+"""Small synthetic servant/quest/mystic code documents for engine tests.
+
+Shaped like the Atlas Academy documents stored in MongoDB, but trimmed to
+the fields the simulator reads so tests run without a database.
+"""
+import importlib
+import sys
+
+
+def _svals(value, **extra):
+    return [dict(Value=value, **extra)] * 10
+
+
+def make_servant_doc(collection_no, name=None, class_name='caster', card='arts'):
+    return {
+        'collectionNo': collection_no,
+        'name': name or f'Servant {collection_no}',
+        'className': class_name,
+        'classId': 4,
+        'rarity': 5,
+        'gender': 'female',
+        'attribute': 'earth',
+        'traits': [{'id': 2}, {'id': 1000}],
+        'cards': ['quick', 'arts', 'arts', 'arts', 'buster'],
+        'atkGrowth': [10000] * 120,
+        'sourceHash': f'servant-{collection_no}',
+        'skills': [
+            {'id': collection_no * 10 + 1, 'num': 1, 'name': 'Charge', 'coolDown': [8] * 10, 'functions': [
+                {'funcType': 'gainNp', 'funcTargetType': 'ptOne', 'functvals': [], 'svals': _svals(5000), 'buffs': []}]},
+            {'id': collection_no * 10 + 2, 'num': 2, 'name': 'Party Arts Up', 'coolDown': [7] * 10, 'functions': [
+                {'funcType': 'addStateShort', 'funcTargetType': 'ptAll', 'functvals': [], 'svals': _svals(300, Turn=3),
+                 'buffs': [{'name': 'Arts Up', 'tvals': [], 'svals': _svals(300, Turn=3)}]}]},
+            {'id': collection_no * 10 + 3, 'num': 3, 'name': 'Self ATK Up', 'coolDown': [6] * 10, 'functions': [
+                {'funcType': 'addStateShort', 'funcTargetType': 'self', 'functvals': [], 'svals': _svals(200, Turn=3),
+                 'buffs': [{'name': 'ATK Up', 'tvals': [], 'svals': _svals(200, Turn=3)}]}]},
+        ],
+        'noblePhantasms': [{
+            'id': collection_no * 100, 'name': 'Test Phantasm', 'card': card,
+            'npGain': {card: [100]}, 'npDistribution': [10, 20, 30, 40],
+            'functions': [{
+                'funcType': 'damageNp', 'funcTargetType': 'enemyAll', 'functvals': [],
+                'svals': [{'Value': 450000}] * 5, 'svals2': [{'Value': 600000}] * 5,
+                'svals3': [{'Value': 675000}] * 5, 'svals4': [{'Value': 712500}] * 5,
+                'svals5': [{'Value': 750000}] * 5, 'buffs': []}],
+        }],
+        'classPassive': [{'id': 1, 'name': 'Item Construction', 'functions': [
+            {'funcType': 'addState', 'funcTargetType': 'self', 'functvals': [], 'svals': [{'Value': 100}],
+             'buffs': [{'name': 'NP Gain Up'}]}]}],
+    }
+
+
+def make_quest_doc(quest_id=1, wave_hp=(20000, 30000, 40000), enemies_per_wave=2):
+    def enemy(hp, index):
+        return {
+            'name': f'Enemy {hp}-{index}', 'hp': hp, 'deathRate': 100,
+            'svt': {'className': 'saber', 'traits': [{'id': 1000}], 'attribute': 'human'},
+        }
+    return {
+        'id': quest_id, 'name': f'Quest {quest_id}', 'warLongName': 'Test War', 'recommendLv': '90',
+        'individuality': [{'id': 94000}],
+        'stages': [{'enemies': [enemy(hp, i) for i in range(enemies_per_wave)]} for hp in wave_hp],
+        'sourceHash': f'quest-{quest_id}',
+    }
+
+
+def make_mystic_code_doc(mc_id=20):
+    return {
+        'id': mc_id, 'name': 'Test Uniform', 'shortName': 'Uniform', 'detail': '', 'maxLv': 10,
+        'skills': [
+            {'id': 1, 'num': 1, 'name': 'Charge Ally', 'coolDown': [15] * 10, 'functions': [
+                {'funcType': 'gainNp', 'funcTargetType': 'ptOne', 'functvals': [], 'svals': [{'Value': 2000}] * 10, 'buffs': []}]},
+            {'id': 2, 'num': 2, 'name': 'Party ATK Up', 'coolDown': [15] * 10, 'functions': [
+                {'funcType': 'addStateShort', 'funcTargetType': 'ptAll', 'functvals': [], 'svals': [{'Value': 200, 'Turn': 1}] * 10,
+                 'buffs': [{'name': 'ATK Up', 'tvals': []}]}]},
+            {'id': 3, 'num': 3, 'name': 'Order Change', 'coolDown': [15] * 10, 'functions': [
+                {'funcType': 'replaceMember', 'funcTargetType': 'ptOne', 'functvals': [], 'svals': [{}] * 10, 'buffs': []}]},
+        ],
+    }
+
+
+class FakeCollection:
+    def __init__(self, docs, key):
+        self.key = key
+        self.docs = {doc[key]: doc for doc in docs}
+        self.find_one_calls = 0
+
+    def find_one(self, query, projection=None):
+        self.find_one_calls += 1
+        return self.docs.get(query.get(self.key))
+
+    def find(self, query=None, projection=None):
+        return list(self.docs.values())
+
+
+class FakeDB:
+    def __init__(self, servants=(), quests=(), mysticcodes=()):
+        self.servants = FakeCollection(servants, 'collectionNo')
+        self.quests = FakeCollection(quests, 'id')
+        self.mysticcodes = FakeCollection(mysticcodes, 'id')
+
+
+def default_fake_db():
+    return FakeDB(
+        servants=[make_servant_doc(no) for no in (1, 2, 3, 4)],
+        quests=[make_quest_doc()],
+        mysticcodes=[make_mystic_code_doc()],
+    )
+
+
+def install_fake_db(monkeypatch, fake_db=None):
+    """Point every module that reads game data at an in-memory FakeDB."""
+    fake_db = fake_db or default_fake_db()
+    servant_module = importlib.import_module('units.Servant')
+    servant_module.servant_cache.clear()
+    servant_module.servant_template_cache.clear()
+    monkeypatch.setattr(servant_module, 'db', fake_db)
+    quest_module = importlib.import_module('managers.Quest')
+    quest_module.quest_template_cache.clear()
+    monkeypatch.setattr(quest_module, 'db', fake_db)
+    mystic_code_module = importlib.import_module('managers.MysticCode')
+    mystic_code_module.mystic_code_catalog.clear()
+    monkeypatch.setattr(mystic_code_module, 'db', fake_db)
+    # Fake documents reuse sourceHashes, so cached /simulate results would match
+    result_cache_module = sys.modules.get('api.result_cache')
+    if result_cache_module is not None:
+        result_cache_module.reported_versions.clear()
+    api_module = sys.modules.get('api.main')
+    if api_module is not None:
+        api_module.result_cache.clear()
+        for static in api_module.static_responses.values():
+            static.clear()
+    return fake_db
+
+
+DEFAULT_TEAM = [
+    {'collectionNo': 1, 'initialCharge': 100},
+    {'collectionNo': 2},
+    {'collectionNo': 3},
+    {'collectionNo': 4},
+]
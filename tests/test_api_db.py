@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+from starlette.requests import Request
+
+from api import db
+
+
+class BarrierQuests:
+    """find_one blocks until `parties` calls are in flight at once, which
+    only happens if the event loop keeps serving requests meanwhile."""
+
+    def __init__(self, parties):
+        self.barrier = threading.Barrier(parties, timeout=5)
+        self.threads = set()
+
+    def find_one(self, query, projection=None):
+        self.threads.add(threading.current_thread().name)
+        self.barrier.wait()
+        return {'id': query['id'], 'stages': []}
+
+    def find(self, query=None, projection=None):
+        self.barrier.wait()
+        return []
+
+
+def test_pool_options_follow_the_environment(monkeypatch):
+    monkeypatch.setenv('MONGO_MAX_POOL_SIZE', '12')
+    monkeypatch.setenv('MONGO_MIN_POOL_SIZE', '0')
+    options = db.pool_options()
+    assert options['maxPoolSize'] == 12 and options['minPoolSize'] == 0
+    assert options['serverSelectionTimeoutMS'] == 5000 and db.io_threads() == 12
+
+
+def test_concurrent_catalog_requests_overlap(monkeypatch):
+    from api import main
+
+    quests = BarrierQuests(4)
+    # Stub the database behind db.quests_collection; nothing connects to MongoDB
+    monkeypatch.setattr(main.db, 'get_db', lambda: {'quests': quests})
+
+    async def burst():
+        return await asyncio.gather(*(main.get_quest_by_id(quest_id) for quest_id in range(4)))
+
+    assert [quest['id'] for quest in asyncio.run(burst())] == [0, 1, 2, 3]
+    assert all(name.startswith('mongo-io') for name in quests.threads)
+    assert db.in_flight == 0
+
+
+def test_listing_runs_off_the_event_loop(monkeypatch):
+    from api import main
+
+    quests = BarrierQuests(2)
+    monkeypatch.setattr(main.db, 'get_db', lambda: {'quests': quests})
+    request = Request({'type': 'http', 'headers': []})
+
+    async def both():
+        listing = main.get_quests(request, warLongNames=['War'], recommendLv='', cursor=None, limit=None,
+                                  format='json')
+        # The second query only starts if the listing left the loop free
+        other = main.get_quest_by_id(1)
+        return await asyncio.gather(listing, other, return_exceptions=True)
+
+    listing, quest = asyncio.run(both())
+    # An empty listing is still a 500, as before
+    assert getattr(listing, 'status_code', None) == 500 and quest['id'] == 1
@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+
+import pytest
+
+from sim_entry_points.batch_runner import run_batch, preload_keys
+from tests.fake_game_data import install_fake_db, default_fake_db, make_quest_doc, FakeCollection, DEFAULT_TEAM
+
+needs_fork = pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(),
+                                reason="copy-on-write preload relies on fork")
+
+
+class ParentOnlyCollection(FakeCollection):
+    """Fails loudly if a worker process refetches a preloaded document."""
+
+    def __init__(self, collection, parent_pid):
+        self.__dict__.update(collection.__dict__)
+        self.parent_pid = parent_pid
+
+    def find_one(self, query, projection=None):
+        doc = super().find_one(query, projection)
+        if doc is not None and os.getpid() != self.parent_pid:
+            raise RuntimeError("worker queried the database")
+        return doc
+
+
+@pytest.fixture
+def batch_db(monkeypatch):
+    fake_db = default_fake_db()
+    fake_db.quests.docs[2] = make_quest_doc(quest_id=2, wave_hp=(20000, 30000))
+    parent = os.getpid()
+    fake_db.servants = ParentOnlyCollection(fake_db.servants, parent)
+    fake_db.quests = ParentOnlyCollection(fake_db.quests, parent)
+    fake_db.mysticcodes = ParentOnlyCollection(fake_db.mysticcodes, parent)
+    return install_fake_db(monkeypatch, fake_db)
+
+
+JOBS = [
+    {'Team': DEFAULT_TEAM, 'Mystic_Code_ID': 20, 'Quest_ID': 2, 'Commands': ['4', '#', 'a1', 'd1', '4', '#']},
+    {'Team': DEFAULT_TEAM, 'Mystic_Code_ID': 20, 'Quest_ID': 2, 'Commands': ['4', '#']},
+    (DEFAULT_TEAM, 20, 1, ['4', '#']),
+    {'Team': [{'collectionNo': 99}], 'Mystic_Code_ID': 20, 'Quest_ID': 2, 'Commands': ['4']},
+]
+
+
+def check(results):
+    by_index = {result['index']: result for result in results}
+    assert sorted(by_index) == [0, 1, 2, 3]
+    assert by_index[0]['cleared'] is True
+    assert by_index[1]['cleared'] is False and by_index[1]['wave'] == 2
+    assert by_index[2]['quest_id'] == 1 and by_index[2]['total_waves'] == 3
+    assert 'not found' in by_index[3]['error']
+
+
+def test_in_process_batch(batch_db):
+    check(list(run_batch(JOBS, max_workers=1)))
+
+
+@needs_fork
+def test_workers_reuse_preloaded_data(batch_db):
+    check(list(run_batch(JOBS, max_workers=2)))
+
+
+@needs_fork
+def test_chunked_batch_streams_every_job(batch_db):
+    results = run_batch(JOBS, max_workers=2, chunksize=3)
+    # A generator: results arrive as chunks finish
+    assert not isinstance(results, list)
+    check(list(results))
+
+
+@pytest.mark.parametrize('workers', [1, pytest.param(2, marks=needs_fork)])
+def test_unloadable_data_fails_only_its_jobs(batch_db, monkeypatch, workers):
+    from sim_entry_points import batch_runner
+
+    closed = []
+    monkeypatch.setattr(batch_runner, 'close_client', lambda: closed.append(True))
+    # Not a quest document: compiling its template raises KeyError
+    batch_db.quests.docs[666] = {'id': 666}
+    broken = {'Team': DEFAULT_TEAM, 'Mystic_Code_ID': 20, 'Quest_ID': 666, 'Commands': ['4']}
+
+    results = list(run_batch(JOBS + [broken, broken], max_workers=workers))
+    failed = [result for result in results if result['index'] >= len(JOBS)]
+    check([result for result in results if result['index'] < len(JOBS)])
+    assert [result['error'] for result in failed] == ["KeyError: 'individuality'"] * 2
+    assert all(result['quest_id'] == 666 and result['cleared'] is False for result in failed)
+    # The parent's client is dropped before forking workers
+    assert closed == ([True] if workers > 1 else [])
+
+
+def test_preload_keys_cover_transforms():
+    servants, quests, mystic_codes = preload_keys([([{'collectionNo': 413, 'ascension': 2}], 20, 7, [])])
+    assert servants == [(413, 2, False), (4132, 1, False)]
+    assert quests == [7] and mystic_codes == [20]
@@ -0,0 +1,126 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from units.buffs import Buffs
+
+SERVANT_ATTRS = ('atk_mod', 'b_up', 'a_up', 'q_up', 'np_damage_mod', 'oc_level', 'np_gain_mod',
+                 'buster_card_damage_up', 'arts_card_damage_up', 'quick_card_damage_up', 'np_gauge')
+NAMES = ['ATK Up', 'Buster Up', 'Arts Up', 'Quick Up', 'NP Strength Up', 'upNpdamage', 'Boost NP Strength Up',
+         'Overcharge Lv. Up', 'Sword STR Up', 'Triggers Each Turn (Increase NP)', 'NP Gain Up',
+         'Buster Card Damage Up', 'Arts Card Damage Up', 'Quick Card Damage Up', 'Critical Up',
+         'DEF Down', 'Buster Card Resist Down', 'Arts Card Resist Down', 'Apply Trait (Rome)']
+
+
+def make_servant(fields=(100,)):
+    return SimpleNamespace(user_atk_mod=0, user_b_up=0, user_a_up=0, user_q_up=0, user_np_damage_mod=0,
+                           user_buster_damage_up=0, user_arts_damage_up=0, user_quick_damage_up=0,
+                           np_gauge=0, fields=list(fields))
+
+
+def reference_servant(buffs, servant):
+    """The per-buff rules process_servant_buffs implemented before aggregation."""
+    s = servant
+    s.atk_mod, s.b_up, s.a_up, s.q_up = s.user_atk_mod, s.user_b_up, s.user_a_up, s.user_q_up
+    s.power_mod, s.np_damage_mod, s.oc_level, s.np_gain_mod = {}, s.user_np_damage_mod, 1, 1
+    s.buster_card_damage_up, s.arts_card_damage_up, s.quick_card_damage_up = 0, 0, 0
+    applies = [b for b in buffs if b.get('script', {}).get('INDIVIDUALITIE', {}).get('id') in (None, *s.fields)]
+    boost = False
+    for b in applies:
+        if b['buff'] in ('NP Strength Up', 'upNpdamage'):
+            s.np_damage_mod += b['value'] / 1000
+        elif b['buff'] == 'Boost NP Strength Up':
+            boost = True
+    if boost:
+        s.np_damage_mod *= 2
+    simple = {'ATK Up': 'atk_mod', 'Buster Up': 'b_up', 'Arts Up': 'a_up', 'Quick Up': 'q_up', 'NP Gain Up': 'np_gain_mod',
+              'Buster Card Damage Up': 'buster_card_damage_up', 'Arts Card Damage Up': 'arts_card_damage_up',
+              'Quick Card Damage Up': 'quick_card_damage_up'}
+    for b in applies:
+        name = b['buff']
+        if name in ('ATK Up', 'Buster Up', 'Arts Up', 'Quick Up'):
+            setattr(s, simple[name], getattr(s, simple[name]) + b['value'] / 1000)
+        elif name == 'Overcharge Lv. Up':
+            s.oc_level = min(s.oc_level + b['value'], 5)
+        elif 'STR Up' in name or 'Strength Up' in name:
+            for tval in b['tvals']:
+                s.power_mod[tval] = s.power_mod.get(tval, 0) + b.get('value', 0)
+        elif 'Triggers Each Turn (Increase NP)' in name:
+            s.np_gauge += b['value']
+        elif name in simple:
+            setattr(s, simple[name], getattr(s, simple[name]) + b['value'] / 1000)
+
+
+def random_buff(rng):
+    buff = {'buff': rng.choice(NAMES), 'value': rng.choice([100, 200, 300, 1, 2]), 'turns': rng.choice([1, 2, 3, -1]),
+            'functvals': [], 'tvals': rng.sample([1, 2, 3], rng.randint(0, 2))}
+    if rng.random() < 0.2:
+        buff['script'] = {'INDIVIDUALITIE': {'id': rng.choice([100, 200])}}
+    return buff
+
+
+def snapshot(servant):
+    return {attr: getattr(servant, attr) for attr in SERVANT_ATTRS}, servant.power_mod
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_aggregates_match_per_buff_rules(seed):
+    rng = random.Random(seed)
+    servant, expected = make_servant(), make_servant()
+    buffs = Buffs(servant)
+    for step in range(40):
+        roll = rng.random()
+        if roll < 0.6:
+            buffs.add_buff(random_buff(rng))
+        elif roll < 0.75 and buffs.buffs:
+            buffs.remove(rng.choice(buffs.buffs))
+        elif roll < 0.9:
+            buffs.decrement_buffs()
+        else:
+            buffs.clear_buff(rng.choice(NAMES))
+        buffs.process_servant_buffs()
+        reference_servant(buffs.buffs, expected)
+        actual_attrs, actual_power = snapshot(servant)
+        expected_attrs, expected_power = snapshot(expected)
+        assert actual_attrs == pytest.approx(expected_attrs)
+        assert actual_power == pytest.approx(expected_power)
+
+
+def test_enemy_modifiers_and_rome_trait():
+    enemy = SimpleNamespace(traits=[2004])
+    buffs = Buffs(enemy=enemy)
+    buffs.add_buff({'buff': 'DEF Down', 'value': 200, 'turns': 1, 'tvals': []})
+    buffs.add_buff({'buff': 'DEF Down', 'value': 100, 'turns': 3, 'tvals': []})
+    buffs.add_buff({'buff': 'Apply Trait (Rome)', 'value': 0, 'turns': 3, 'tvals': []})
+    buffs.process_enemy_buffs()
+    assert enemy.defense == pytest.approx(-0.3)
+    assert enemy.roman == 1 and enemy.traits == [2004, 2004]
+    buffs.decrement_buffs()
+    buffs.process_enemy_buffs()
+    assert enemy.defense == pytest.approx(-0.1)
+
+
+def test_direct_list_edits_are_noticed():
+    servant = make_servant()
+    buffs = Buffs(servant)
+    buffs.add_buff({'buff': 'ATK Up', 'value': 200, 'turns': 3, 'tvals': []})
+    buffs.buffs.append({'buff': 'ATK Up', 'value': 300, 'turns': 3, 'tvals': []})
+    buffs.process_servant_buffs()
+    assert servant.atk_mod == pytest.approx(0.5)
+    buffs.buffs = []
+    buffs.process_servant_buffs()
+    assert servant.atk_mod == 0
+
+
+def test_clone_keeps_independent_totals():
+    servant = make_servant()
+    buffs = Buffs(servant)
+    buffs.add_buff({'buff': 'Arts Up', 'value': 300, 'turns': 1, 'tvals': []})
+    other = make_servant()
+    copy = buffs.clone(servant=other)
+    buffs.decrement_buffs()
+    buffs.process_servant_buffs()
+    copy.process_servant_buffs()
+    assert servant.a_up == 0
+    assert other.a_up == pytest.approx(0.3)
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from sim_entry_points.clear_probability import wilson_interval
+from sim_entry_points.traverse_api_input import simulate, traverse_api_input
+from tests.fake_game_data import install_fake_db, default_fake_db, make_quest_doc, DEFAULT_TEAM
+
+
+def _np_damage(monkeypatch):
+    # Damage servant 1's NP deals to one enemy at the engine's flat roll
+    fake_db = default_fake_db()
+    fake_db.quests.docs[9] = make_quest_doc(quest_id=9, wave_hp=(10 ** 9,))
+    install_fake_db(monkeypatch, fake_db)
+    return simulate(DEFAULT_TEAM, 20, 9, ['4']).np_damage[0].damage[0]
+
+
+@pytest.fixture
+def quest_db(monkeypatch):
+    damage = _np_damage(monkeypatch)
+    fake_db = default_fake_db()
+    # Wave 1 falls to any roll. In quest 2, wave 2 needs a roll of at least
+    # 1.0 on both enemies; in quest 3 it survives even the best roll
+    fake_db.quests.docs[2] = make_quest_doc(quest_id=2, wave_hp=(damage * 0.5, damage))
+    fake_db.quests.docs[3] = make_quest_doc(quest_id=3, wave_hp=(damage * 0.5, damage * 1.2))
+    return install_fake_db(monkeypatch, fake_db)
+
+
+def test_wilson_interval_bounds():
+    assert wilson_interval(0, 100)[0] == pytest.approx(0.0, abs=1e-12) and wilson_interval(0, 100)[1] < 0.05
+    assert wilson_interval(100, 100)[1] == pytest.approx(1.0) and wilson_interval(100, 100)[0] > 0.95
+    low, high = wilson_interval(250, 1000)
+    assert low < 0.25 < high and high - low < 0.06
+
+
+def test_per_wave_and_overall_clear_probability(quest_db):
+    result = simulate(DEFAULT_TEAM, 20, 2, ['4', '#', 'a1', 'd1', '4', '#'], samples=20000, seed=5)
+
+    # The deterministic run is unchanged: a roll of exactly 1.0 kills
+    assert result.cleared is True
+    probability = result.clear_probability
+    assert probability.samples == 20000 and probability.seed == 5
+    assert probability.damage_events == 4
+    first, second = probability.waves
+    assert first.probability == 1.0
+    assert second.probability == pytest.approx(0.25, abs=0.015)
+    assert second.ci_low < 0.25 < second.ci_high
+    assert probability.probability == second.probability
+
+    again = simulate(DEFAULT_TEAM, 20, 2, ['4', '#', 'a1', 'd1', '4', '#'], samples=20000, seed=5)
+    assert again.clear_probability == probability
+
+
+def test_unreachable_wave_never_clears(quest_db):
+    driver = traverse_api_input(DEFAULT_TEAM, 20, 3, ['4', '#', 'a1', 'd1', '4', '#'], samples=1000, seed=1)
+    probability = driver.clear_probability
+    assert [wave.probability for wave in probability.waves] == [1.0, 0.0]
+    assert probability.probability == 0.0
+    # Plain runs are unaffected by the trace run
+    assert driver.np_manager.damage_roll == 1.0
+
+
+def test_simulate_endpoint_reports_and_validates_samples(quest_db):
+    from fastapi import HTTPException, Response
+    from api import main
+
+    def post(**payload):
+        request = main.SimRequest(Team=DEFAULT_TEAM, Mystic_Code_ID=20, Quest_ID=2, Commands=['4', '#'], **payload)
+        return asyncio.run(main.simulate(request, Response()))
+
+    assert post()['result']['clear_probability'] is None
+    response = post(Samples=500, Seed=3)
+    assert response['result']['clear_probability']['waves'][0]['probability'] == 1.0
+    with pytest.raises(HTTPException) as error:
+        post(Samples=0)
+    assert error.value.status_code == 400
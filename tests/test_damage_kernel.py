@@ -0,0 +1,135 @@
+import random
+
+import pytest
+
+from managers.damage_kernel import NPAttacker, NPTargets, merge_batches, np_damage_kernel
+from sim_entry_points.traverse_api_input import traverse_api_input
+from tests.fake_game_data import install_fake_db, default_fake_db, make_quest_doc, DEFAULT_TEAM
+
+
+def _reference(a, t, distribution):
+    # The per-enemy, per-hit loop npManager ran before the kernel
+    hp_left, refund = [], 0
+    for e in range(len(t.hp)):
+        total = (a.atk * a.np_multiplier * (a.card_damage_value * (1 + a.card_damage_mod - t.resist[e])) *
+                 t.class_mod[e] * t.attribute_mod[e] * 0.23 * (1 + a.atk_mod - t.defense[e]) *
+                 (1 + 0 + a.np_damage_mod + t.power_mod[e]) * t.se_factor[e])
+        hp = t.hp[e]
+        cumulative = 0
+        for value in distribution:
+            hit = total * value / 100
+            cumulative += hit
+            overkill_bonus = 1.5 if cumulative > hp else 1
+            refund += a.np_gain * a.card_np_value * (1 + a.card_eff_mod) * t.np_mult[e] * overkill_bonus
+            hp -= hit
+        hp_left.append(hp)
+    return hp_left, refund
+
+
+def _random_case(rng, enemies, hits):
+    attacker = NPAttacker(
+        atk=rng.uniform(8000, 14000), np_multiplier=rng.choice([3.0, 4.5, 6.0, 9.0]),
+        card_damage_value=rng.choice([1.5, 0.8, 1]), card_damage_mod=rng.uniform(0, 1),
+        atk_mod=rng.uniform(0, 1), np_damage_mod=rng.uniform(0, 0.5),
+        np_gain=rng.uniform(0.3, 1.2), card_np_value=rng.choice([1, 3]), card_eff_mod=rng.uniform(0, 0.8),
+    )
+    targets = NPTargets(
+        class_mod=[rng.choice([0.5, 1.0, 2.0]) for _ in range(enemies)],
+        attribute_mod=[rng.choice([0.9, 1.0, 1.1]) for _ in range(enemies)],
+        defense=[rng.uniform(-0.3, 0.3) for _ in range(enemies)],
+        resist=[rng.uniform(-0.3, 0.3) for _ in range(enemies)],
+        power_mod=[rng.choice([0, 0.2, 0.5]) for _ in range(enemies)],
+        se_factor=[rng.choice([1, 1.5, 2.0]) for _ in range(enemies)],
+        hp=[rng.uniform(5000, 120000) for _ in range(enemies)],
+        np_mult=[rng.choice([0.9, 1.0, 1.2]) for _ in range(enemies)],
+    )
+    split = [rng.randint(1, 30) for _ in range(hits)]
+    distribution = [value * 100 // sum(split) for value in split]
+    return attacker, targets, distribution
+
+
+@pytest.mark.parametrize('enemies,hits', [(1, 1), (1, 5), (3, 5), (6, 10), (12, 4)])
+def test_numpy_and_python_kernels_agree_exactly(enemies, hits):
+    pytest.importorskip('numpy')
+    rng = random.Random(enemies * 100 + hits)
+    for _ in range(20):
+        attacker, targets, distribution = _random_case(rng, enemies, hits)
+        fast = np_damage_kernel(attacker, targets, distribution, use_numpy=True)
+        slow = np_damage_kernel(attacker, targets, distribution, use_numpy=False)
+        assert fast.total == slow.total
+        assert fast.hits == slow.hits
+        assert fast.hp_after == slow.hp_after
+        assert fast.overkill == slow.overkill
+        assert fast.killed_on_hit == slow.killed_on_hit
+        assert fast.refund_per_hit == slow.refund_per_hit
+        assert fast.refund == pytest.approx(slow.refund, rel=1e-12)
+
+
+def test_kernel_matches_the_per_hit_loop():
+    rng = random.Random(7)
+    kills = overkills = 0
+    for _ in range(200):
+        attacker, targets, distribution = _random_case(rng, rng.randint(1, 6), rng.randint(1, 8))
+        batch = np_damage_kernel(attacker, targets, distribution, use_numpy=False)
+        hp_left, refund = _reference(attacker, targets, distribution)
+        assert [hp[-1] for hp in batch.hp_after] == hp_left
+        assert batch.refund == refund
+        for hp_after, killed_on_hit in zip(batch.hp_after, batch.killed_on_hit):
+            expected = next((i for i, hp in enumerate(hp_after) if hp <= 0), -1)
+            assert killed_on_hit == expected
+            kills += expected >= 0
+        overkills += sum(any(row) for row in batch.overkill)
+    # The random cases must actually exercise both branches
+    assert kills and overkills
+
+
+def test_merge_batches_concatenates_in_order():
+    rng = random.Random(3)
+    attacker, targets, distribution = _random_case(rng, 3, 4)
+    whole = np_damage_kernel(attacker, targets, distribution, use_numpy=False)
+    parts = [np_damage_kernel(attacker, NPTargets(*([column[e]] for column in targets)), distribution, use_numpy=False)
+             for e in range(3)]
+    merged = merge_batches(parts)
+    assert merged[:-1] == whole[:-1]
+    assert merged.refund == pytest.approx(whole.refund)
+
+
+def test_aoe_np_hits_every_enemy_through_one_batch(monkeypatch):
+    fake_db = default_fake_db()
+    fake_db.quests.docs[3] = make_quest_doc(quest_id=3, wave_hp=(20000, 30000), enemies_per_wave=3)
+    install_fake_db(monkeypatch, fake_db)
+    driver = traverse_api_input(DEFAULT_TEAM, 20, 3, ['4'])
+
+    enemies = driver.game_manager.get_enemies()
+    assert len(enemies) == 3
+    assert all(enemy.get_hp() <= 0 for enemy in enemies)
+    assert all(len(enemy.fsm_damage_log) == 1 for enemy in enemies)
+    assert driver.np_manager.last_np_refund > 0
+    assert driver.game_manager.servants[0].get_npgauge() == 0
+
+
+def test_on_hit_triggers_reach_later_enemies(monkeypatch):
+    fake_db = default_fake_db()
+    fake_db.quests.docs[3] = make_quest_doc(quest_id=3, wave_hp=(10 ** 7, 10 ** 7), enemies_per_wave=3)
+    install_fake_db(monkeypatch, fake_db)
+    driver = traverse_api_input(DEFAULT_TEAM, 20, 3, [])
+    np_manager, servant = driver.np_manager, driver.game_manager.servants[0]
+    enemies = driver.game_manager.get_enemies()
+
+    def debuff_everyone(buff, source_servant, target, card_type):
+        if not buff['fired']:
+            buff['fired'] = True
+            for enemy in enemies:
+                enemy.buffs.add_buff({'buff': 'DEF Down', 'value': 200, 'turns': 3, 'functvals': [], 'tvals': []})
+        return False
+
+    defense = []
+    monkeypatch.setattr(np_manager.sm, 'run_triggered_buff', debuff_everyone)
+    np_manager.damage_listener = lambda target, damage: defense.append(target.defense)
+    servant.buffs.add_buff({'buff': 'Debuff on hit', 'trigger_type': 'on-hit', 'fired': False, 'turns': 3,
+                            'functvals': [], 'tvals': []})
+    np_manager.use_np(servant)
+
+    # As in the enemy-by-enemy loop: the first enemy's buffs were processed
+    # before its first hit fired the trigger, the later enemies' after
+    assert defense == [0, -0.2, -0.2]
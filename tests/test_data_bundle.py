@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from sim_entry_points.traverse_api_input import traverse_api_input
+from tests.fake_game_data import install_fake_db, default_fake_db, DEFAULT_TEAM
+from utils.bundle import BundleDB, write_bundle
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def bundle_path(tmp_path):
+    fake_db = default_fake_db()
+    path = str(tmp_path / 'game.bundle')
+    write_bundle(path, {
+        'servants': fake_db.servants.find(),
+        'quests': fake_db.quests.find(),
+        'mysticcodes': fake_db.mysticcodes.find(),
+    })
+    return path
+
+
+def test_bundle_lookups(bundle_path):
+    bundle = BundleDB(bundle_path)
+    assert bundle.stats() == {'servants': 4, 'quests': 1, 'mysticcodes': 1}
+    assert bundle.servants.find_one({'collectionNo': 2}) == default_fake_db().servants.docs[2]
+    assert bundle.quests.find_one({'id': 999}) is None
+    rows = bundle.servants.find({'collectionNo': {'$in': [3, 1, 42]}}, {'_id': 0, 'collectionNo': 1, 'sourceHash': 1})
+    assert [sorted(row) for row in rows] == [['collectionNo', 'sourceHash']] * 2
+    with pytest.raises(ValueError):
+        bundle.servants.find_one({'name': 'Test Servant 1'})
+
+
+def test_simulation_matches_mongo_shaped_db(monkeypatch, bundle_path):
+    commands = ['a2', '4', '#']
+    install_fake_db(monkeypatch)
+    expected = traverse_api_input(DEFAULT_TEAM, 20, 1, commands).game_manager.state_key()
+    install_fake_db(monkeypatch, BundleDB(bundle_path))
+    assert traverse_api_input(DEFAULT_TEAM, 20, 1, commands).game_manager.state_key() == expected
+
+
+def test_bundle_env_runs_without_mongo(bundle_path):
+    env = {k: v for k, v in os.environ.items() if not k.startswith('MONGO_URI')}
+    env['FGO_DATA_BUNDLE'] = bundle_path
+    script = (
+        "import sys\n"
+        "from sim_entry_points.traverse_api_input import traverse_api_input\n"
+        "driver = traverse_api_input([{'collectionNo': 1, 'initialCharge': 100}], 20, 1, ['4'])\n"
+        "assert all(enemy.get_hp() <= 0 for enemy in driver.game_manager.get_enemies())\n"
+        "assert 'pymongo' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, '-c', script], cwd=REPO_ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, timeout=60)
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scripts.downloader import TokenBucket, fetch_json, make_session, run_concurrently
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Atlas-like stub: /item/N answers after a delay; /busy answers 429
+    once, /flaky 500 once, /missing 404."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] += 1
+            hits = server.hits[self.path]
+            server.started.append(time.monotonic())
+        if self.path == '/busy' and hits == 1:
+            return self.reply(429, {'detail': 'slow down'}, {'Retry-After': '0.2'})
+        if self.path == '/flaky' and hits == 1:
+            return self.reply(500, {'detail': 'oops'})
+        if self.path == '/missing':
+            return self.reply(404, {'detail': 'not found'})
+        if self.path == '/garbage':
+            return self.reply(200, None, raw=b'not json')
+        time.sleep(server.latency)
+        self.reply(200, {'path': self.path})
+
+    def reply(self, status, body, headers=None, raw=None):
+        payload = raw if raw is not None else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.hits = Counter()
+    server.started = []
+    server.latency = 0.0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(round(seconds, 6))
+        self.now += seconds
+
+
+def test_token_bucket_spaces_out_requests():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, burst=2, clock=clock, sleep=clock.sleep)
+    waits = [round(bucket.acquire(), 6) for _ in range(4)]
+    assert waits == [0.0, 0.0, 0.1, 0.1]
+    clock.now += 1.0  # refills up to the burst only
+    assert [round(bucket.acquire(), 6) for _ in range(3)] == [0.0, 0.0, 0.1]
+
+    bucket.pause(0.5)
+    assert round(bucket.acquire(), 6) == 0.6
+    assert TokenBucket.from_interval(0).acquire() == 0.0
+
+
+def test_fetch_json_retries_and_gives_up(stub):
+    session = make_session(1)
+    sleeps = []
+    fetch = lambda path: fetch_json(stub.url + path, session, max_retries=3, backoff_base=0.01, sleep=sleeps.append)
+
+    assert fetch('/busy') == {'path': '/busy'} and stub.hits['/busy'] == 2
+    assert 0.1 <= sleeps[-1] <= 0.3  # Retry-After, with jitter
+    assert fetch('/flaky') == {'path': '/flaky'} and stub.hits['/flaky'] == 2
+    # Bad bodies are not retried
+    assert fetch('/garbage') is None and stub.hits['/garbage'] == 1
+    assert fetch_json('http://127.0.0.1:1/closed', session, max_retries=2, sleep=sleeps.append) is None
+
+
+def test_a_429_pauses_every_thread(stub):
+    bucket = TokenBucket(rate=1000)
+    session = make_session(2)
+    # fetch_json's own sleep is skipped, so only the bucket's pause holds requests back
+    fetch = lambda path: fetch_json(stub.url + path, session, bucket, sleep=lambda seconds: None)
+    assert run_concurrently(['/busy', '/item/1'], fetch, 1) == [{'path': '/busy'}, {'path': '/item/1'}]
+    assert stub.started[1] - stub.started[0] >= 0.15
+
+
+def test_a_429_waits_for_retry_after_once(stub):
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1000, clock=clock, sleep=clock.sleep)
+    session = make_session(1)
+    assert fetch_json(stub.url + '/busy', session, bucket, sleep=clock.sleep) == {'path': '/busy'}
+    # Only the bucket waits, for Retry-After (0.2 +/- 10%) plus one token
+    assert len(clock.slept) == 1 and 0.17 <= clock.now <= 0.23
+
+
+def test_a_404_is_a_final_miss(stub):
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1000, clock=clock, sleep=clock.sleep)
+    session = make_session(1)
+    # Missing ids are expected while probing, so they are neither retried nor waited on
+    assert fetch_json(stub.url + '/missing', session, bucket, sleep=clock.sleep) is None
+    assert fetch_json(stub.url + '/missing', session, sleep=clock.sleep) is None
+    assert stub.hits['/missing'] == 2 and clock.slept == []
+
+
+def test_concurrent_downloads_run_at_the_rate_limit(stub):
+    stub.latency = 0.1
+    interval = 0.02
+    paths = [f'/item/{n}' for n in range(12)]
+    session = make_session(6)
+    bucket = TokenBucket.from_interval(interval)
+
+    started = time.monotonic()
+    results = run_concurrently(paths, lambda path: fetch_json(stub.url + path, session, bucket), workers=6)
+    elapsed = time.monotonic() - started
+
+    assert results == [{'path': path} for path in paths]
+    # One at a time with a sleep after each took len * (latency + interval) = 1.44s
+    assert elapsed < 0.8
+    # Single arrivals jitter with thread scheduling; the typical gap and the span do not
+    gaps = sorted(b - a for a, b in zip(stub.started, stub.started[1:]))
+    assert gaps[len(gaps) // 2] >= interval * 0.8 and stub.started[-1] - stub.started[0] >= interval * (len(paths) - 1) * 0.9
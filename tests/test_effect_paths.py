@@ -0,0 +1,63 @@
+"""Skills and NPs run through the flat engine form of each function.
+
+Skills.parse_skills and NP.get_np_values return normalized effects, with
+the flat form SkillManager.apply_effect and npManager.use_np understand
+kept under '_legacy'. Stripping '_legacy' replays what the engine was
+handed before it used that form.
+"""
+import pytest
+
+from sim_entry_points.traverse_api_input import traverse_api_input
+from tests.fake_game_data import install_fake_db, DEFAULT_TEAM
+
+
+def without_legacy(effects):
+    return [{key: value for key, value in effect.items() if key != '_legacy'} for effect in effects]
+
+
+@pytest.fixture
+def driver(monkeypatch):
+    install_fake_db(monkeypatch)
+    return traverse_api_input(DEFAULT_TEAM, 20, 1, [])
+
+
+@pytest.fixture
+def old_path(monkeypatch):
+    def strip(servant):
+        get_skill, get_np_values = servant.skills.get_skill_by_num, servant.nps.get_np_values
+        monkeypatch.setattr(servant.skills, 'get_skill_by_num',
+                            lambda num: dict(get_skill(num), functions=without_legacy(get_skill(num)['functions'])))
+        monkeypatch.setattr(servant.nps, 'get_np_values', lambda *args, **kwargs: without_legacy(get_np_values(*args, **kwargs)))
+    return strip
+
+
+def added_buffs(servant, before):
+    return [(buff['buff'], buff['value'], buff['turns']) for buff in servant.buffs.buffs[before:]]
+
+
+def test_skill_document_applies_its_buff(driver, old_path):
+    # Servant 1's third skill: addStateShort on self, ATK Up 200 for 3 turns
+    servant = driver.game_manager.servants[0]
+    before = len(servant.buffs.buffs)
+    driver.skill_manager.use_skill(servant, 2)
+    assert added_buffs(servant, before) == [('ATK Up', 200, 3)]
+
+    # The normalized effect has no funcTargetType, so it reached no target
+    other = driver.game_manager.servants[1]
+    old_path(other)
+    before = len(other.buffs.buffs)
+    driver.skill_manager.use_skill(other, 2)
+    assert added_buffs(other, before) == []
+
+
+def test_np_document_deals_damage(driver, old_path):
+    servant, enemies = driver.game_manager.servants[0], driver.game_manager.get_enemies()
+    driver.np_manager.use_np(servant)
+    assert all(enemy.get_hp() < 20000 for enemy in enemies)
+    assert servant.get_npgauge() == 0
+
+    fresh = traverse_api_input(DEFAULT_TEAM, 20, 1, [])
+    servant = fresh.game_manager.servants[0]
+    old_path(servant)
+    with pytest.raises(KeyError, match='funcTargetType'):
+        fresh.np_manager.use_np(servant)
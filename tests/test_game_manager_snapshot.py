@@ -0,0 +1,90 @@
+import pytest
+
+from Driver import Driver
+from tests.fake_game_data import install_fake_db, DEFAULT_TEAM
+
+
+@pytest.fixture
+def driver(monkeypatch):
+    install_fake_db(monkeypatch)
+    driver = Driver(DEFAULT_TEAM, quest_id=1, mc_id=20)
+    driver.reset_state()
+    return driver
+
+
+def test_restore_reverts_battle_state(driver):
+    gm = driver.game_manager
+    snap = gm.snapshot()
+
+    driver.execute_token('j2')  # mystic code NP charge on servant 2
+    gm.servants[0].skills.set_skill_cooldown(1)
+    gm.enemies[0].set_hp(5000)
+    gm.enemies[0].buffs.add_buff({'buff': 'DEF Down', 'value': 200, 'turns': 3, 'functvals': [], 'tvals': []})
+    gm.fields.append(['Burning', 2])
+    gm.swap_servants(0, 3)
+
+    gm.restore(snap)
+
+    assert [s.id for s in gm.servants] == [1, 2, 3, 4]
+    assert gm.servants[1].np_gauge == 0
+    assert gm.servants[0].skills.cooldowns[1] == 0
+    assert gm.enemies[0].get_hp() == 20000
+    assert gm.enemies[0].buffs.buffs == []
+    assert gm.fields == []
+    assert gm.mc.cooldowns[0] == 0
+    # Managers bound by the driver keep working against the restored state
+    assert driver.execute_token('j2') is gm
+    assert gm.servants[1].np_gauge == 20
+
+
+def test_snapshot_can_be_restored_repeatedly(driver):
+    gm = driver.game_manager
+    snap = gm.snapshot()
+    for _ in range(3):
+        gm.enemies[1].set_hp(1000)
+        gm.servants[0].buffs.add_buff({'buff': 'Arts Up', 'value': 300, 'turns': 3, 'functvals': [], 'tvals': []})
+        gm.restore(snap)
+        assert gm.enemies[1].get_hp() == 20000
+        assert all(b['buff'] != 'Arts Up' for b in gm.servants[0].buffs.buffs)
+
+
+def test_fork_is_independent_and_shares_static_data(driver):
+    gm = driver.game_manager
+    branch = driver.fork()
+    bgm = branch.game_manager
+
+    branch.execute_token('j1')
+    bgm.enemies[0].set_hp(20000)
+    bgm.servants[0].buffs.buffs[0]['turns'] = 99
+
+    assert gm.servants[0].np_gauge == 100
+    assert bgm.servants[0].np_gauge == 120
+    assert gm.enemies[0].get_hp() == 20000
+    assert bgm.enemies[0].get_hp() == 0
+    assert gm.servants[0].buffs.buffs[0]['turns'] != 99
+    assert gm.mc.cooldowns[0] == 0
+
+    # Parsed data is shared, not copied
+    assert bgm.servants[0].template is gm.servants[0].template
+    assert bgm.servants[0].skills.skills is gm.servants[0].skills.skills
+    assert bgm.mc.skills is gm.mc.skills
+    assert bgm.quest.fields is gm.quest.fields
+    # Cloned buff containers point at their own owner
+    assert bgm.servants[0].buffs.servant is bgm.servants[0]
+    assert bgm.servants[0].stats.servant is bgm.servants[0]
+    assert branch.turn_manager.gm is bgm
+
+
+def test_future_waves_are_not_shared_with_snapshot(driver):
+    gm = driver.game_manager
+    snap = gm.snapshot()
+    # Simulate reaching wave 2 and damaging it in the live game
+    for enemy in gm.enemies:
+        enemy.set_hp(enemy.get_hp())
+    gm.get_next_wave()
+    gm.enemies[0].set_hp(100)
+
+    gm.restore(snap)
+    assert gm.wave == 1
+    gm.get_next_wave()
+    assert gm.enemies[0].get_hp() == 30000
@@ -0,0 +1,29 @@
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous bound: a warm import is well under 0.2s; this only trips if
+# something heavy (a DB client, numpy, a network call) creeps back in
+IMPORT_BUDGET_SECONDS = 1.5
+
+
+def test_import_driver_is_cheap():
+    env = {k: v for k, v in os.environ.items() if k not in ('MONGO_URI', 'MONGO_URI_READ', 'FGO_DATA_BUNDLE')}
+    script = (
+        "import json, logging, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import Driver\n"
+        "import sim_entry_points.traverse_api_input\n"
+        "elapsed = time.perf_counter() - start\n"
+        "heavy = sorted(m for m in ('pymongo', 'numpy', 'dotenv') if m in sys.modules)\n"
+        "print(json.dumps([elapsed, heavy, len(logging.getLogger().handlers)]))\n"
+    )
+    out = subprocess.run([sys.executable, '-c', script], cwd=REPO_ROOT, env=env, check=True,
+                         capture_output=True, text=True, timeout=60).stdout
+    elapsed, heavy, handlers = json.loads(out)
+    assert heavy == []
+    assert handlers == 0
+    assert elapsed < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+
+import pytest
+
+from sim_entry_points.traverse_api_input import simulate
+from utils import metrics
+from utils.metrics import MetricsRegistry, registry
+from tests.fake_game_data import install_fake_db, DEFAULT_TEAM
+
+COMMANDS = ['4', '#', 'a1', 'd1', '4', '#']
+
+
+@pytest.fixture
+def recording(monkeypatch):
+    install_fake_db(monkeypatch)
+    registry.clear()
+    monkeypatch.setattr(registry, 'enabled', True)
+    yield registry
+    registry.clear()
+
+
+def sample(text, line_start):
+    for line in text.splitlines():
+        if line.startswith(line_start + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    raise AssertionError(f"{line_start} not in metrics")
+
+
+def test_histogram_exposition():
+    local = MetricsRegistry('on')
+    histogram = local.histogram('demo_seconds', 'Demo.', ['path'], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.labels('a"b').observe(value)
+    text = local.render()
+
+    assert '# TYPE demo_seconds histogram' in text
+    assert sample(text, 'demo_seconds_bucket{path="a\\"b",le="0.1"}') == 2
+    assert sample(text, 'demo_seconds_bucket{path="a\\"b",le="1"}') == 3
+    assert sample(text, 'demo_seconds_bucket{path="a\\"b",le="+Inf"}') == 4
+    assert sample(text, 'demo_seconds_count{path="a\\"b"}') == 4
+    assert sample(text, 'demo_seconds_sum{path="a\\"b"}') == pytest.approx(3.65)
+    with pytest.raises(ValueError):
+        histogram.labels()
+    with pytest.raises(ValueError):
+        MetricsRegistry('sometimes')
+
+
+def test_auto_mode_records_only_after_the_first_scrape(monkeypatch):
+    install_fake_db(monkeypatch)
+    local = MetricsRegistry('auto')
+    monkeypatch.setattr(metrics, 'registry', local)
+    counted = metrics.timed(local.histogram('calls_seconds', 'Calls.'))(lambda: None)
+
+    counted()
+    assert not local.enabled and 'calls_seconds_count' not in local.render()
+    assert local.enabled
+    counted()
+    assert sample(local.render(), 'calls_seconds_count') == 1
+    off = MetricsRegistry('off')
+    off.render()
+    assert not off.enabled
+
+
+def test_simulation_phases_and_caches(recording):
+    misses = sample(registry.render(), 'fgo_cache_misses_total{cache="servant_documents"}')
+    simulate(DEFAULT_TEAM, 20, 1, COMMANDS)
+    simulate(DEFAULT_TEAM, 20, 1, COMMANDS)
+    text = registry.render()
+
+    assert sample(text, 'fgo_sim_simulation_seconds_count') == 2
+    assert sample(text, 'fgo_sim_setup_seconds_count') == 2
+    assert sample(text, 'fgo_sim_token_seconds_count{kind="np"}') == 4
+    assert sample(text, 'fgo_sim_token_seconds_count{kind="end_turn"}') == 4
+    assert sample(text, 'fgo_sim_token_seconds_count{kind="skill"}') == 4
+    for source in ('servant', 'quest', 'mystic_code'):
+        assert sample(text, f'fgo_sim_data_load_seconds_count{{source="{source}"}}') > 0
+    # Four servants are loaded once and then served from the cache
+    assert sample(text, 'fgo_cache_misses_total{cache="servant_documents"}') == misses + 4
+    assert 'fgo_cache_hit_ratio{cache="servant_templates"}' in text
+
+
+def test_nothing_is_recorded_while_disabled(monkeypatch):
+    install_fake_db(monkeypatch)
+    registry.clear()
+    monkeypatch.setattr(registry, 'enabled', False)
+    simulate(DEFAULT_TEAM, 20, 1, COMMANDS)
+    assert 'fgo_sim_token_seconds_count' not in registry.render()
+
+
+def test_mongo_listener(recording):
+    listener = metrics.mongo_listener()
+    events = [
+        ({'find': 'servants', 'filter': {}}, 'find', 1, 1500),
+        ({'getMore': 42, 'collection': 'servants'}, 'getMore', 2, 500),
+    ]
+    for command, name, request_id, micros in events:
+        listener.started(SimpleNamespace(command=command, command_name=name, request_id=request_id))
+        listener.succeeded(SimpleNamespace(command_name=name, request_id=request_id, duration_micros=micros))
+    listener.started(SimpleNamespace(command={'find': 'quests'}, command_name='find', request_id=3))
+    listener.failed(SimpleNamespace(command_name='find', request_id=3, duration_micros=200))
+    text = registry.render()
+
+    assert sample(text, 'fgo_mongo_command_seconds_sum{command="find",collection="servants",status="ok"}') == 0.0015
+    assert sample(text, 'fgo_mongo_command_seconds_count{command="getMore",collection="servants",status="ok"}') == 1
+    assert sample(text, 'fgo_mongo_command_seconds_count{command="find",collection="quests",status="failed"}') == 1
+
+
+def test_metrics_endpoint(recording):
+    from api import main
+
+    response = main.metrics()
+    assert response.media_type == metrics.CONTENT_TYPE
+    assert 'fgo_sim_pool_requests_total{outcome="rejected"} 0' in response.body.decode()
@@ -0,0 +1,73 @@
+import copy
+import pickle
+
+import pytest
+
+from managers.MysticCode import MysticCode, mystic_code_catalog
+from sim_entry_points.traverse_api_input import traverse_api_input
+from utils.frozen import FrozenDict
+from tests.fake_game_data import install_fake_db, default_fake_db, make_mystic_code_doc, DEFAULT_TEAM
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = default_fake_db()
+    db.mysticcodes.docs[30] = make_mystic_code_doc(mc_id=30)
+    return install_fake_db(monkeypatch, db)
+
+
+def test_catalog_is_loaded_once_and_shared(fake_db):
+    first, second = MysticCode(20), MysticCode(30)
+    again = MysticCode(20)
+
+    assert len(mystic_code_catalog) == 2
+    assert fake_db.mysticcodes.find_one_calls == 0
+    assert again.template is first.template and again.skills is first.skills
+    assert second.template is not first.template
+    again.set_cooldown(0)
+    assert (again.cooldowns[0], first.cooldowns[0]) == (15, 0)
+
+
+def test_skills_are_precompiled_and_read_only(fake_db):
+    skill = MysticCode(20).get_skill_by_num(0)
+    func = skill['functions'][0]
+
+    assert func['svals'] == {'Value': 2000}
+    assert isinstance(func['svals'], dict)
+    with pytest.raises(TypeError):
+        func['svals'] = [{'Value': 1}]
+    with pytest.raises(TypeError):
+        func['svals']['Value'] = 1
+    with pytest.raises(AttributeError):
+        skill['functions'].append({})
+    # Copies are ordinary dicts again
+    assert type(func.copy()) is dict
+    frozen = pickle.loads(pickle.dumps(func))
+    assert type(frozen) is FrozenDict and frozen == func
+    assert copy.deepcopy(func) == func
+
+
+def test_runs_share_the_catalog_without_changing_it(fake_db):
+    template = MysticCode(20).template
+    before = copy.deepcopy(template.skills)
+
+    results = []
+    for _ in range(2):
+        driver = traverse_api_input(DEFAULT_TEAM, 20, 1, ['j2', 'k', '4'])
+        gm = driver.game_manager
+        results.append(([servant.np_gauge for servant in gm.servants], [enemy.hp for enemy in gm.get_enemies()]))
+        assert gm.mc.template is template
+        assert gm.mc.cooldowns[0] == 15 and gm.mc.cooldowns[1] == 15
+
+    assert results[0] == results[1]
+    assert results[0][0][1] == 20
+    assert template.skills == before
+
+
+def test_unknown_and_late_added_codes(fake_db):
+    MysticCode(20)
+    with pytest.raises(ValueError):
+        MysticCode(99)
+    fake_db.mysticcodes.docs[40] = make_mystic_code_doc(mc_id=40)
+    assert MysticCode(40).mc_id == 40
+    assert fake_db.mysticcodes.find_one_calls == 2
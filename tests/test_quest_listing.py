@@ -0,0 +1,164 @@
+import asyncio
+import json
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from api import quest_listing
+from api.quest_listing import InvalidListing, NoQuestsFound, quest_filter, quest_listing as listing, quest_page
+
+
+def make_quest(no):
+    return {
+        '_id': ObjectId(f'{no:024x}'), 'id': 9000 + no, 'name': f'Quest {no}', 'warLongName': f'War {no % 3}',
+        'recommendLv': '90' if no % 2 else '80', 'individuality': [{'id': 94000}], 'sourceHash': f'q{no}',
+        'stages': [
+            {'enemies': [{'name': f'Enemy {no}-{wave}', 'hp': 1000 * wave, 'deathRate': 100, 'atk': 5000,
+                          'svt': {'className': 'saber', 'attribute': 'human',
+                                  'traits': [{'id': 1000, 'name': 'humanoid'}, {'id': 2000}]}}]}
+            for wave in (1, 2, 3)
+        ] + [{'stageNo': 4}],
+    }
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.batch = None
+
+    def sort(self, key, direction=1):
+        self.docs = sorted(self.docs, key=lambda doc: doc[key], reverse=direction < 0)
+        return self
+
+    def batch_size(self, size):
+        self.batch = size
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    def __iter__(self):
+        return iter([dict(doc) for doc in self.docs])
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == '$and':
+            if not all(matches(doc, part) for part in condition):
+                return False
+        elif isinstance(condition, dict):
+            if '$in' in condition and doc.get(key) not in condition['$in']:
+                return False
+            if '$gt' in condition and not doc.get(key) > condition['$gt']:
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class FakeQuests:
+    def __init__(self, docs):
+        self.docs = docs
+        self.cursors = []
+
+    def find(self, query=None, projection=None):
+        cursor = FakeCursor([doc for doc in self.docs if matches(doc, query or {})])
+        self.cursors.append(cursor)
+        return cursor
+
+    def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if matches(doc, query):
+                return {k: v for k, v in doc.items() if projection.get(k)}
+        return None
+
+
+def read_body(response):
+    if hasattr(response, 'body_iterator'):
+        async def collect():
+            return b''.join([chunk async for chunk in response.body_iterator])
+        return asyncio.run(collect())
+    return response.body
+
+
+@pytest.fixture
+def quests():
+    # Stored out of _id order, as a collection's natural order can be
+    return FakeQuests([make_quest(no) for no in (5, 3, 1, 2, 4, 7, 6)])
+
+
+def test_slim_enemies():
+    slim = quest_listing.slim_quest(make_quest(1))
+    assert set(slim) == {'id', 'name', 'warLongName', 'recommendLv', 'stages'}
+    assert slim['stages'][0]['enemies'] == [
+        {'name': 'Enemy 1-1', 'hp': 1000, 'svt': {'className': 'saber', 'traits': [{'id': 1000}, {'id': 2000}]}}]
+    # Stages without enemies still get a list
+    assert slim['stages'][3] == {'enemies': []}
+
+
+def test_pages_cover_every_quest_once(quests):
+    seen, cursor, pages = [], None, 0
+    while True:
+        page, cursor = quest_page(quests, {}, cursor, limit=3)
+        seen.extend(quest['id'] for quest in page)
+        pages += 1
+        if cursor is None:
+            break
+    assert seen == [9001, 9002, 9003, 9004, 9005, 9006, 9007] and pages == 3
+    # Each page reads at most one quest past its limit
+    assert all(len(cursor.docs) <= 4 for cursor in quests.cursors)
+
+    filtered, cursor = quest_page(quests, quest_filter(['War 1'], '90'), limit=1)
+    assert [quest['id'] for quest in filtered] == [9001] and cursor is not None
+    last, cursor = quest_page(quests, quest_filter(['War 1'], '90'), cursor, limit=1)
+    assert [quest['id'] for quest in last] == [9007] and cursor is None
+    with pytest.raises(InvalidListing):
+        quest_page(quests, {}, 'not-a-cursor')
+
+
+def test_streamed_formats(quests):
+    array = listing(quests, quest_filter(recommendLv='90'))
+    body = json.loads(read_body(array))
+    assert [quest['id'] for quest in body] == [9001, 9003, 9005, 9007]
+    assert quests.cursors[-1].batch == quest_listing.QUEST_BATCH_SIZE
+
+    ndjson = listing(quests, {}, format='ndjson')
+    assert ndjson.media_type == 'application/x-ndjson'
+    lines = read_body(ndjson).decode().splitlines()
+    assert [json.loads(line)['id'] for line in lines] == list(range(9001, 9008))
+
+    page = listing(quests, {}, limit=4, format='ndjson')
+    assert len(read_body(page).decode().splitlines()) == 4 and page.headers['x-next-cursor']
+    with pytest.raises(NoQuestsFound):
+        listing(quests, quest_filter(['Nowhere']))
+    with pytest.raises(InvalidListing):
+        listing(quests, {}, format='xml')
+
+
+def test_quest_endpoints(monkeypatch, quests):
+    from api import main
+
+    # Stub the database behind db.quests_collection; nothing connects to MongoDB
+    monkeypatch.setattr(main.db, 'get_db', lambda: {'quests': quests})
+    request = Request({'type': 'http', 'headers': []})
+
+    def get(endpoint, **params):
+        params = dict(dict(warLongNames=None, recommendLv='', cursor=None, limit=None, format='json'), **params)
+        return asyncio.run(endpoint(request, **params))
+
+    first = get(main.get_quests, limit=5)
+    assert len(json.loads(first.body)) == 5
+    rest = get(main.get_filtered_quests, limit=5, cursor=first.headers['x-next-cursor'])
+    assert [quest['id'] for quest in json.loads(rest.body)] == [9006, 9007] and 'x-next-cursor' not in rest.headers
+    with pytest.raises(HTTPException) as error:
+        get(main.get_quests, cursor='bad')
+    assert error.value.status_code == 400
+
+    detail = asyncio.run(main.get_quest_by_id(9002))
+    assert detail['stages'][0]['enemies'][0]['atk'] == 5000 and '_id' not in detail
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.get_quest_by_id(1))
+    assert error.value.status_code == 404
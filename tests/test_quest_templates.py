@@ -0,0 +1,75 @@
+import pytest
+
+from managers import Quest as quest_module
+from managers.Quest import Quest, get_quest_template
+from units.Enemy import Enemy
+from utils.lru import LRUCache
+from tests.fake_game_data import install_fake_db, default_fake_db, make_quest_doc
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = default_fake_db()
+    doc = make_quest_doc(quest_id=5, wave_hp=(1000, 2000))
+    doc['stages'][1]['enemies'][1]['svt'] = {'className': 'caster', 'traits': [{'id': 1002}, {'id': 1002}], 'attribute': 'earth'}
+    db.quests.docs[5] = doc
+    return install_fake_db(monkeypatch, db)
+
+
+def test_quests_share_one_compiled_template(fake_db):
+    first, second = Quest(5), Quest(5)
+
+    assert fake_db.quests.find_one_calls == 1
+    assert first.template is second.template is get_quest_template(5)
+    assert first.total_waves == 2 and first.fields == [94000]
+    # Only the template is cached; the raw document is read through
+    assert quest_module.select_quest(5)['id'] == 5 and fake_db.quests.find_one_calls == 2
+
+
+def test_enemies_are_fresh_per_quest(fake_db):
+    first, second = Quest(5), Quest(5)
+    enemy = first.get_wave(2)[1]
+    enemy.set_hp(500)
+    enemy.traits.append(2000)
+    enemy.buffs.add_buff({'buff': 'DEF Down', 'value': 200, 'turns': 3, 'functvals': [], 'tvals': []})
+
+    twin = second.get_wave(2)[1]
+    assert twin is not enemy
+    assert (twin.hp, twin.traits, twin.buffs.buffs) == (2000, [1002, 1002], [])
+    assert first.template.wave(2).enemies[1].traits == (1002, 1002)
+
+
+def test_from_template_matches_the_enemy_constructor(fake_db):
+    template = get_quest_template(5).wave(2).enemies[1]
+    built = Enemy.from_template(template)
+    legacy = Enemy([template.name, template.max_hp, template.death_rate, template.class_name,
+                    list(template.traits), template.attribute, template.state])
+
+    assert vars(built).keys() == vars(legacy).keys()
+    for name in ('name', 'max_hp', 'hp', 'death_rate', 'class_name', 'traits', 'attribute', 'state',
+                 'defense', 'np_per_hit_mult'):
+        assert getattr(built, name) == getattr(legacy, name)
+    assert built.np_per_hit_mult == pytest.approx(1.2 * 1.2)
+
+
+def test_wave_totals_for_prechecks(fake_db):
+    template = get_quest_template(5)
+    first, second = template.waves
+
+    assert (first.total_hp, first.max_hp, dict(first.class_makeup)) == (2000, 1000, {'saber': 2})
+    assert (second.total_hp, dict(second.class_makeup)) == (4000, {'saber': 1, 'caster': 1})
+    assert template.total_hp == 6000
+    assert second.enemies[1].class_index is not None
+    with pytest.raises(TypeError):
+        second.class_makeup['saber'] = 3
+
+
+def test_template_cache_evicts_least_recent(fake_db, monkeypatch):
+    fake_db.quests.docs[6] = make_quest_doc(quest_id=6)
+    monkeypatch.setattr(quest_module, 'quest_template_cache', LRUCache(max_size=1))
+
+    five = get_quest_template(5)
+    get_quest_template(6)
+    assert quest_module.quest_template_cache.evictions == 1
+    assert get_quest_template(5) is not five
+    assert get_quest_template(99) is None
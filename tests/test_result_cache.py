@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from api import result_cache as rc
+from api.result_cache import ResultCache, request_fingerprint
+from sim_entry_points.traverse_api_input import simulate
+from tests.fake_game_data import install_fake_db, DEFAULT_TEAM
+
+COMMANDS = ['4', '#', 'a1', 'd1', '4', '#']
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = install_fake_db(monkeypatch)
+    simulate(DEFAULT_TEAM, 20, 1, COMMANDS)  # loads the game data
+    return db
+
+
+def test_fingerprint_normalizes_requests(fake_db):
+    key = request_fingerprint(DEFAULT_TEAM, 20, 1, COMMANDS)
+    reordered = [dict(reversed(list(servant.items()))) for servant in DEFAULT_TEAM] + [{'collectionNo': 0}]
+
+    assert key == request_fingerprint(reordered, 20, 1, "4 # a1 d1 4 #")
+    assert key != request_fingerprint(DEFAULT_TEAM, 20, 1, COMMANDS[:-1])
+    assert key != request_fingerprint(DEFAULT_TEAM, 20, 1, COMMANDS, trace='summary')
+    assert request_fingerprint(DEFAULT_TEAM, 20, 1, COMMANDS, samples=100, seed=1) != \
+        request_fingerprint(DEFAULT_TEAM, 20, 1, COMMANDS, samples=100, seed=2)
+    # Random rolls without a seed, and data not loaded yet, are not cacheable
+    assert request_fingerprint(DEFAULT_TEAM, 20, 1, COMMANDS, samples=100) is None
+    assert request_fingerprint(DEFAULT_TEAM, 20, 2, COMMANDS) is None
+
+
+def test_fingerprint_follows_the_game_data(monkeypatch, fake_db):
+    key = request_fingerprint(DEFAULT_TEAM, 20, 1, COMMANDS)
+    fake_db.servants.docs[2]['sourceHash'] = 'servant-2-updated'
+    install_fake_db(monkeypatch, fake_db)
+    simulate(DEFAULT_TEAM, 20, 1, COMMANDS)
+    assert request_fingerprint(DEFAULT_TEAM, 20, 1, COMMANDS) not in (None, key)
+
+    del fake_db.quests.docs[1]['sourceHash']
+    install_fake_db(monkeypatch, fake_db)
+    simulate(DEFAULT_TEAM, 20, 1, COMMANDS)
+    assert request_fingerprint(DEFAULT_TEAM, 20, 1, COMMANDS) is None
+
+
+def test_ttl_and_lru_eviction():
+    clock = FakeClock()
+    cache = ResultCache(max_size=2, ttl=60, clock=clock)
+    stored = cache.put('a', {'cleared': True, 'waves': [{'wave': 1}]})
+    cache.put('b', {'cleared': False})
+
+    assert cache.get('a') is stored and stored['waves'][0]['wave'] == 1
+    with pytest.raises(TypeError):
+        stored['cleared'] = False
+    cache.put('c', {'cleared': True})  # 'b' is least recently used
+    assert cache.get('b') is None and cache.get('c') == {'cleared': True}
+    clock.now += 61
+    assert cache.get('a') is None
+    assert cache.stats()['hits'] == 2 and cache.stats()['expired'] == 1 and cache.stats()['evictions'] == 1
+
+    disabled = ResultCache(max_size=0)
+    assert not disabled.enabled and disabled.put('a', {'x': 1}) == {'x': 1} and disabled.get('a') is None
+
+
+def test_results_persist_across_restarts(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    clock = FakeClock()
+    first = ResultCache(max_size=4, ttl=60, path=path, clock=clock)
+    first.put('a', {'cleared': True, 'enemy_hp': [[0, 0]]})
+    first.put('b', {'cleared': False})
+    first.close()
+
+    clock.now += 30
+    second = ResultCache(max_size=4, ttl=60, path=path, clock=clock)
+    assert second.get('a') == {'cleared': True, 'enemy_hp': ((0, 0),)}
+    assert second.stats()['disk_hits'] == 1
+    second.close()
+
+    clock.now += 31
+    third = ResultCache(max_size=4, ttl=60, path=path, clock=clock)
+    assert third.get('b') is None and third.stats()['disk_hits'] == 0
+    third.close()
+
+
+def test_simulate_endpoint_serves_repeats_from_the_cache(monkeypatch):
+    from fastapi import Response
+    from api import main
+
+    install_fake_db(monkeypatch)
+    monkeypatch.setattr(main, 'result_cache', ResultCache(max_size=8))
+    runs = []
+    monkeypatch.setattr(rc, 'simulate', lambda *args: runs.append(args) or simulate(*args))
+
+    def post(**payload):
+        response = Response()
+        request = main.SimRequest(Team=DEFAULT_TEAM, Mystic_Code_ID=20, Quest_ID=1, Commands=COMMANDS, **payload)
+        body = asyncio.run(main.simulate(request, response))
+        return body['result'], response.headers['X-Result-Cache']
+
+    first, status = post()
+    assert status == 'miss' and len(first['waves']) == 3
+    second, status = post()
+    assert status == 'hit' and second == first and len(runs) == 1
+    assert post(Trace='summary')[1] == 'miss'
+
+    # With a process pool the API process holds no templates; the version
+    # the worker reported keeps the key stable
+    install_fake_db(monkeypatch)
+    post()
+    rc.servant_template_cache.clear()
+    assert post()[1] == 'hit'
+    assert asyncio.run(main.simulate_stats())['result_cache']['hits'] == 2
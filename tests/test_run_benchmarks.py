@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from Driver import Driver
+from managers.np_manager import npManager
+from tools import run_benchmarks as bench
+from tests.fake_game_data import install_fake_db, DEFAULT_TEAM
+
+SCENARIO = {'name': 'fake_two_waves', 'Team': DEFAULT_TEAM, 'Mystic_Code_ID': 20, 'Quest_ID': 1,
+            'Commands': ['4', '#', 'a1', 'd1', '4', '#']}
+
+
+@pytest.fixture
+def corpus(monkeypatch, tmp_path):
+    install_fake_db(monkeypatch)
+    path = tmp_path / 'corpus.json'
+    path.write_text(json.dumps([SCENARIO, dict(SCENARIO, name='unknown_mystic_code', Mystic_Code_ID=99)]))
+    return str(path)
+
+
+def test_phases_and_allocations(corpus):
+    report = bench.run_benchmarks(bench.load_corpus(corpus), repeat=3)
+    result = report['scenarios']['fake_two_waves']
+
+    assert report['version'] == bench.RESULT_VERSION and report['meta']['repeat'] == 3
+    assert result['tokens'] == result['tokens_run'] == 6
+    assert 0 < result['np_ms'] < result['tokens_ms'] and 0 < result['end_turn_ms'] < result['tokens_ms']
+    assert result['setup_ms'] + result['tokens_ms'] <= result['total_ms'] * 1.01
+    assert result['alloc_blocks'] > 0 and result['peak_kb'] > 0
+    assert 'error' in report['scenarios']['unknown_mystic_code']
+    # The timing wrappers are removed again
+    assert Driver.execute_action.__name__ == 'execute_action' and not hasattr(npManager.use_np, '__wrapped__')
+
+
+def test_compare_flags_slower_phases():
+    baseline = {'scenarios': {'a': {'total_ms': 1.0, 'np_ms': 0.01, 'alloc_blocks': 100}}}
+    current = {'scenarios': {'a': {'total_ms': 1.5, 'np_ms': 0.03, 'alloc_blocks': 105},
+                             'new': {'total_ms': 9.0}}}
+
+    regressions = bench.compare(current, baseline, threshold=0.10)
+    # np_ms tripled but stays under the noise floor; 5% more blocks is allowed
+    assert [(r['scenario'], r['metric'], r['change']) for r in regressions] == [('a', 'total_ms', 0.5)]
+
+
+def test_main_writes_results_and_fails_on_regression(corpus, tmp_path, capsys):
+    out = tmp_path / 'bench.json'
+    args = ['--corpus', corpus, '--scenario', 'fake_two_waves', '--repeat', '2', '--no-allocations']
+    assert bench.main(args + ['--output', str(out)]) == 0
+    saved = json.loads(out.read_text())
+    assert list(saved['scenarios']) == ['fake_two_waves'] and 'alloc_blocks' not in saved['scenarios']['fake_two_waves']
+
+    saved['scenarios']['fake_two_waves']['total_ms'] /= 100
+    out.write_text(json.dumps(saved))
+    assert bench.main(args + ['--compare', str(out), '--output', str(tmp_path / 'again.json')]) == 1
+    assert "REGRESSION fake_two_waves total_ms" in capsys.readouterr().err
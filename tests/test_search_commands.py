@@ -0,0 +1,113 @@
+import pytest
+
+from Driver import Driver
+from sim_entry_points.search_commands import search_commands
+from tests.fake_game_data import install_fake_db, default_fake_db, make_quest_doc, DEFAULT_TEAM
+
+
+@pytest.fixture
+def two_wave_db(monkeypatch):
+    fake_db = default_fake_db()
+    fake_db.quests.docs[2] = make_quest_doc(quest_id=2, wave_hp=(20000, 30000))
+    return install_fake_db(monkeypatch, fake_db)
+
+
+def replay(commands, quest_id=2):
+    driver = Driver(DEFAULT_TEAM, quest_id, 20)
+    driver.reset_state()
+    for token in commands[:-1]:
+        assert driver.execute_token(token) is not False
+    return driver.turn_manager.end_turn()
+
+
+def test_skills_and_nps_take_effect(two_wave_db):
+    driver = Driver(DEFAULT_TEAM, 2, 20)
+    driver.reset_state()
+    gm = driver.game_manager
+    driver.execute_token('a2')
+    assert gm.servants[1].np_gauge == 50
+    driver.execute_token('4')
+    assert all(enemy.get_hp() <= 0 for enemy in gm.get_enemies())
+
+
+def test_shortest_solution_clears_quest(two_wave_db):
+    result = search_commands(DEFAULT_TEAM, 20, 2, objective='shortest')
+
+    assert result['complete'] is True
+    best = result['solutions'][0]
+    # Wave 1 is cleared by the precharged NP; wave 2 needs two charges
+    assert len(best['commands']) == 6
+    assert best['commands'][:2] == ['4', '#']
+    assert best['turns'] == 2
+    assert replay(best['commands']) is True
+
+
+def test_shortest_returns_several_distinct_solutions(two_wave_db):
+    result = search_commands(DEFAULT_TEAM, 20, 2, objective='shortest', max_solutions=3)
+
+    commands = [tuple(solution['commands']) for solution in result['solutions']]
+    assert len(commands) == 3
+    assert len(set(commands)) == 3
+    assert all(len(c) == 6 for c in commands)
+
+
+def test_cheapest_prefers_short_cooldowns(two_wave_db):
+    result = search_commands(DEFAULT_TEAM, 20, 2, objective='cheapest')
+
+    assert result['complete'] is True
+    best = result['solutions'][0]
+    # Two 8-turn servant charges beat anything using the 15-turn mystic code
+    assert best['cost'] == 16
+    assert not any(token[0] in 'jkl' for token in best['commands'])
+    assert replay(best['commands']) is True
+
+
+def test_node_budget_returns_partial_result(two_wave_db):
+    result = search_commands(DEFAULT_TEAM, 20, 2, max_nodes=3)
+    assert result['complete'] is False
+    assert result['nodes'] <= 4
+
+
+def test_turn_limit_below_wave_count_has_no_solution(two_wave_db):
+    result = search_commands(DEFAULT_TEAM, 20, 2, max_turns=1)
+    assert result['solutions'] == []
+    assert result['complete'] is True
+
+
+def test_unknown_objective_rejected(two_wave_db):
+    with pytest.raises(ValueError):
+        search_commands(DEFAULT_TEAM, 20, 2, objective='fastest')
+
+
+def test_search_endpoint_runs_on_the_simulation_pool(two_wave_db, monkeypatch):
+    import asyncio
+    import logging
+    import sys
+
+    from fastapi import HTTPException
+
+    from api import main
+    from api.sim_pool import SimulationPool
+
+    pool = SimulationPool(max_workers=2, max_queue=0)
+    monkeypatch.setattr(main, 'sim_pool', pool)
+    req = main.SearchRequest(Team=DEFAULT_TEAM, Mystic_Code_ID=20, Quest_ID=2)
+    stdout, disabled = sys.stdout, logging.root.manager.disable
+
+    async def overlapping():
+        return await asyncio.gather(main.search(req), main.search(req))
+
+    try:
+        first, second = asyncio.run(overlapping())
+        assert first['solutions'] == second['solutions'] and first['complete'] is True
+        assert pool.stats()['completed'] == 2
+        # Searches leave the process-wide output and logging state alone
+        assert sys.stdout is stdout and logging.root.manager.disable == disabled
+
+        pool.in_flight = pool.capacity
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(main.search(req))
+        assert exc.value.status_code == 503
+    finally:
+        pool.in_flight = 0
+        pool.shutdown()
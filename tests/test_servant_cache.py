@@ -0,0 +1,94 @@
+import importlib
+
+import pytest
+
+from units.Servant import select_character, invalidate_servant, sync_servant_cache, servant_cache, servant_template_cache
+from utils.lru import LRUCache
+
+# units/__init__ re-exports the Servant class under the same name as the
+# module, so fetch the module object explicitly for monkeypatching.
+servant_module = importlib.import_module('units.Servant')
+
+
+class FakeServantCollection:
+    """Counts round-trips so tests can assert the cache avoids them."""
+
+    def __init__(self, docs):
+        self.docs = {doc['collectionNo']: doc for doc in docs}
+        self.find_one_calls = 0
+        self.find_calls = 0
+
+    def find_one(self, query, projection=None):
+        self.find_one_calls += 1
+        return self.docs.get(query.get('collectionNo'))
+
+    def find(self, query, projection=None):
+        self.find_calls += 1
+        wanted = query['collectionNo']['$in']
+        return [{'collectionNo': k, 'sourceHash': d.get('sourceHash')} for k, d in self.docs.items() if k in wanted]
+
+
+class FakeDB:
+    def __init__(self, servants):
+        self.servants = servants
+
+
+@pytest.fixture
+def fake_servants(monkeypatch):
+    collection = FakeServantCollection([
+        {'collectionNo': 1, 'name': 'Mash', 'sourceHash': 'a'},
+        {'collectionNo': 2, 'name': 'Artoria', 'sourceHash': 'b'},
+    ])
+    monkeypatch.setattr(servant_module, 'db', FakeDB(collection))
+    servant_cache.clear()
+    servant_template_cache.clear()
+    servant_cache.reset_stats()
+    yield collection
+    servant_cache.clear()
+    servant_template_cache.clear()
+
+
+def test_repeated_lookups_hit_cache(fake_servants):
+    assert select_character(1)['name'] == 'Mash'
+    assert select_character(1)['name'] == 'Mash'
+    assert select_character(2)['name'] == 'Artoria'
+    assert fake_servants.find_one_calls == 2
+    stats = servant_cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+
+
+def test_missing_servant_is_not_cached(fake_servants):
+    assert select_character(999) is None
+    assert select_character(999) is None
+    assert fake_servants.find_one_calls == 2
+
+
+def test_invalidate_respects_source_hash(fake_servants):
+    select_character(1)
+    # Same hash as cached -> nothing to do
+    assert invalidate_servant(1, source_hash='a') is False
+    assert 1 in servant_cache
+    assert invalidate_servant(1, source_hash='changed') is True
+    assert 1 not in servant_cache
+
+
+def test_sync_evicts_only_stale_documents(fake_servants):
+    select_character(1)
+    select_character(2)
+    fake_servants.docs[2] = {'collectionNo': 2, 'name': 'Artoria (Lancer)', 'sourceHash': 'c'}
+    assert sync_servant_cache() == 1
+    assert fake_servants.find_calls == 1
+    assert 1 in servant_cache
+    assert select_character(2)['name'] == 'Artoria (Lancer)'
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert 'a' in cache and 'c' in cache
+    assert 'b' not in cache
+    assert cache.stats()['evictions'] == 1
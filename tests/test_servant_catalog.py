@@ -0,0 +1,165 @@
+import asyncio
+import itertools
+import json
+import random
+import re
+
+import pytest
+
+from api.servant_catalog import CatalogSnapshot, ServantCatalog
+
+NAMES = ['Altria Pendragon', 'Altria Pendragon (Lancer)', 'Artoria Caster', 'Koyanskaya of Light',
+         'Scathach', 'Scathach-Skadi', 'Zhuge Liang (Lord El-Melloi II)', 'Oberon', 'Castoria',
+         'Tamamo no Mae', 'Ibuki-Douji', 'Aoko Aozaki', 'Arash', 'Merlin', 'Gilgamesh']
+CLASSES = ['saber', 'lancer', 'caster', 'assassin', 'pretender']
+CARDS = ['buster', 'arts', 'quick']
+FLAGS = ['attackEnemyAll', 'attackEnemyOne', 'support']
+
+
+def make_docs(count=60, seed=7):
+    rng = random.Random(seed)
+    docs = []
+    for no in range(1, count + 1):
+        doc = {'id': 100000 + no, 'collectionNo': no, 'name': f"{rng.choice(NAMES)} {no}",
+               'className': rng.choice(CLASSES), 'rarity': rng.randint(1, 5), 'sourceHash': f'h{no}'}
+        if no % 7:
+            doc['noblePhantasms'] = [{'card': rng.choice(CARDS), 'effectFlags': rng.sample(FLAGS, rng.randint(0, 2))}
+                                     for _ in range(rng.randint(1, 2))]
+        docs.append(doc)
+    return docs
+
+
+def reference_query(docs, rarity=None, class_names=None, cards=None, effect_flags=None, search='', exclude=None):
+    """What the MongoDB query in /api/servants matched."""
+    def matches(doc):
+        nps = doc.get('noblePhantasms') or []
+        return ((not rarity or doc.get('rarity') in rarity)
+                and (not class_names or doc.get('className') in class_names)
+                and (not cards or any(np.get('card') in cards for np in nps))
+                and (not effect_flags or any(flag in effect_flags for np in nps for flag in np.get('effectFlags', [])))
+                and (not search or re.search(search, doc.get('name', ''), re.IGNORECASE))
+                and (not exclude or doc['collectionNo'] not in exclude))
+    return [{k: v for k, v in doc.items() if k != 'sourceHash'} for doc in docs if matches(doc)]
+
+
+def as_json(rows):
+    # Frozen rows hold tuples where MongoDB returns lists; the JSON is the same
+    return json.loads(json.dumps(rows))
+
+
+class FakeServants:
+    def __init__(self, docs):
+        self.docs = docs
+        self.finds = 0
+
+    def find(self, query=None, projection=None):
+        self.finds += 1
+        return [dict(doc) for doc in self.docs]
+
+
+def test_queries_match_the_mongo_semantics():
+    docs = make_docs()
+    snapshot = CatalogSnapshot(docs)
+    searches = ['', 'a', 'AL', 'tri', 'altria', 'ALTRIA PEN', 'scathach-', 'lord el', '(lancer)',
+                'zz', 'Altria|Oberon', '^Scath', 'e 1']
+    filters = itertools.product([None, [5], [3, 4]], [None, ['caster'], ['saber', 'lancer']],
+                                [None, ['arts']], [None, ['attackEnemyAll']], searches, [None, [1, 2, 3]])
+    for rarity, classes, cards, flags, search, exclude in filters:
+        kwargs = dict(rarity=rarity, class_names=classes, cards=cards, effect_flags=flags, search=search, exclude=exclude)
+        assert as_json(snapshot.query(**kwargs)) == reference_query(docs, **kwargs), kwargs
+
+
+def test_rows_are_read_only_and_looked_up_by_collection_no():
+    snapshot = CatalogSnapshot(make_docs(5))
+    row = snapshot.get(3)
+    assert row['collectionNo'] == 3 and 'sourceHash' not in row and snapshot.get(99) is None
+    with pytest.raises(TypeError):
+        row['name'] = 'x'
+    # An unbalanced pattern is searched for literally instead of failing
+    matches = snapshot.query(search='(')
+    assert matches and all('(' in row['name'] for row in matches)
+
+
+def test_reloads_only_when_the_data_changed():
+    collection = FakeServants(make_docs(10))
+    clock = [0.0]
+    catalog = ServantCatalog(lambda: collection, ttl=60, clock=lambda: clock[0])
+
+    first = catalog.current()
+    assert catalog.loads == 1 and len(first) == 10
+    clock[0] = 59
+    assert catalog.current() is first and collection.finds == 1
+    clock[0] = 61
+    assert catalog.current() is first and catalog.loads == 1 and collection.finds == 2
+
+    collection.docs[0] = dict(collection.docs[0], name='Renamed', sourceHash='changed')
+    assert catalog.refresh() is True
+    second = catalog.current()
+    assert second is not first and second.get(1)['name'] == 'Renamed'
+    # Readers holding the old snapshot still see a consistent old version
+    assert first.get(1)['name'] != 'Renamed'
+    assert catalog.refresh() is False and catalog.refresh(force=True) is True
+
+
+def test_servants_endpoint(monkeypatch):
+    from starlette.requests import Request
+    from api import main
+
+    docs = make_docs(20)
+    monkeypatch.setattr(main, 'servant_catalog', ServantCatalog(lambda: FakeServants(docs)))
+
+    def get(rarity=None, className='', npType='', attackType='', search='', team=None):
+        request = Request({'type': 'http', 'headers': []})
+        result = asyncio.run(main.get_servants(request, rarity=rarity, className=className, npType=npType,
+                                               attackType=attackType, search=search, team=team, warm=False))
+        # The unfiltered list comes pre-serialized (api/static_responses.py)
+        return json.loads(result.body) if hasattr(result, 'body') else as_json(result)
+
+    assert get() == reference_query(docs)
+    assert get(rarity=[5, 4], className='caster,saber', search='a', team=[1, 2]) == \
+        reference_query(docs, rarity=[5, 4], class_names=['caster', 'saber'], search='a', exclude=[1, 2])
+    assert get(npType='quick', attackType='support') == reference_query(docs, cards=['quick'], effect_flags=['support'])
+    assert asyncio.run(main.get_servant_by_collectionNo(4))['collectionNo'] == 4
+
+
+def test_warmup_respects_the_catalog_ttl(monkeypatch):
+    from types import SimpleNamespace
+
+    from api import main
+
+    pings = []
+    client = SimpleNamespace(admin=SimpleNamespace(command=pings.append))
+    monkeypatch.setattr(main.db, 'get_client', lambda: client)
+    monkeypatch.setattr(main, 'sync_servant_cache', lambda: 0)
+    servants = FakeServants(make_docs(10))
+    clock = [0.0]
+    monkeypatch.setattr(main, 'servant_catalog', ServantCatalog(lambda: servants, ttl=60, clock=lambda: clock[0]))
+
+    # The first warmup builds the catalog; later ones within the TTL query nothing
+    for _ in range(3):
+        assert asyncio.run(main.api_warmup())['status'] == 'ok'
+    assert pings == ['ping'] * 3 and servants.finds == 1 and main.servant_catalog.loads == 1
+    clock[0] = 61
+    asyncio.run(main.api_warmup())
+    assert servants.finds == 2 and main.servant_catalog.loads == 1
+
+
+def test_warmup_leaves_static_responses_to_their_ttl(monkeypatch):
+    from types import SimpleNamespace
+
+    from api import main
+    from api.static_responses import StaticResponse
+
+    client = SimpleNamespace(admin=SimpleNamespace(command=lambda name: None))
+    monkeypatch.setattr(main.db, 'get_client', lambda: client)
+    monkeypatch.setattr(main, 'sync_servant_cache', lambda: 0)
+    monkeypatch.setattr(main, 'servant_catalog', ServantCatalog(lambda: FakeServants(make_docs(3))))
+    versions = []
+    static = StaticResponse(lambda: [{'id': 1}], lambda: versions.append(1) or 'v1', ttl=60, clock=lambda: 0.0)
+    monkeypatch.setattr(main, 'static_responses', {'mysticcodes': static})
+
+    static.current()
+    checked_at = static.checked_at
+    asyncio.run(main.api_warmup())
+    static.current()
+    assert static.checked_at == checked_at and len(versions) == 1
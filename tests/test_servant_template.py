@@ -0,0 +1,138 @@
+import importlib
+
+import pytest
+
+from units.Servant import Servant, ServantTemplate, get_servant_template, servant_cache, servant_template_cache, invalidate_servant
+from units.skills import Skills
+
+servant_module = importlib.import_module('units.Servant')
+
+
+def make_servant_doc(collection_no=1):
+    return {
+        'collectionNo': collection_no,
+        'name': 'Test Servant',
+        'className': 'saber',
+        'classId': 1,
+        'rarity': 5,
+        'gender': 'female',
+        'attribute': 'earth',
+        'traits': [{'id': 1}, {'id': 2}],
+        'cards': ['quick', 'arts', 'arts', 'buster', 'buster'],
+        'atkGrowth': [1000] * 120,
+        'sourceHash': 'abc',
+        'skills': [{
+            'id': 12345,
+            'name': 'Test Skill',
+            'num': 1,
+            'coolDown': [7] * 10,
+            'functions': [{
+                'funcType': 'addStateShort',
+                'funcTargetType': 'self',
+                'functvals': [],
+                'svals': [{'Value': 1000, 'Turn': 3}] * 10,
+                'buffs': [{'name': 'ATK Up', 'tvals': [], 'svals': [{'Value': 1000, 'Turn': 3}] * 10}]
+            }]
+        }],
+        'noblePhantasms': [{
+            'id': 67890,
+            'name': 'Test NP',
+            'card': 'buster',
+            'functions': [{
+                'funcType': 'damageNp',
+                'funcTargetType': 'enemyAll',
+                'functvals': [],
+                'svals': [{'Value': 500000}] * 5,
+                'buffs': []
+            }]
+        }],
+        'classPassive': [{
+            'id': 1,
+            'name': 'Magic Resistance',
+            'functions': [{
+                'funcType': 'addState',
+                'funcTargetType': 'self',
+                'functvals': [],
+                'svals': [{'Value': 200}],
+                'buffs': [{'name': 'Debuff Resist Up'}]
+            }]
+        }]
+    }
+
+
+class CountingCollection:
+    def __init__(self, doc):
+        self.doc = doc
+        self.calls = 0
+
+    def find_one(self, query, projection=None):
+        self.calls += 1
+        return self.doc if query.get('collectionNo') == self.doc['collectionNo'] else None
+
+
+class FakeDB:
+    def __init__(self, servants):
+        self.servants = servants
+
+
+@pytest.fixture
+def servants_db(monkeypatch):
+    collection = CountingCollection(make_servant_doc())
+    monkeypatch.setattr(servant_module, 'db', FakeDB(collection))
+    servant_cache.clear()
+    servant_template_cache.clear()
+    yield collection
+    servant_cache.clear()
+    servant_template_cache.clear()
+
+
+def test_instances_share_one_compiled_template(servants_db):
+    first = Servant(1, append_5=True)
+    second = Servant(1, append_5=True, initialCharge=50)
+
+    assert servants_db.calls == 1
+    assert first.template is second.template
+    assert first.skills.skills is second.skills.skills
+    assert first.nps.nps is second.nps.nps
+    assert first.passives is second.passives
+    assert second.np_gauge == 50
+
+
+def test_per_run_state_is_independent(servants_db):
+    first = Servant(1)
+    second = Servant(1)
+
+    first.skills.set_skill_cooldown(1)
+    first.buffs.add_buff({'buff': 'Arts Up', 'value': 300, 'turns': 3, 'functvals': [], 'tvals': []})
+    first.traits.append(2004)
+
+    assert second.skills.cooldowns[1] == 0
+    assert all(buff['buff'] != 'Arts Up' for buff in second.buffs.buffs)
+    assert 2004 not in second.traits
+    assert 2004 not in first.template.traits
+
+
+def test_template_matches_direct_parse(servants_db):
+    doc = make_servant_doc()
+    template = ServantTemplate(doc)
+    direct = Skills(doc['skills'], append_5=False).skills
+    assert {num: list(variants) for num, variants in template.skills.items()} == direct
+    assert template.nps[-1]['card'] == 'buster'
+    assert template.passives[0]['functions'][0]['svals']['Value'] == 200
+
+
+def test_templates_keyed_by_ascension_and_append(servants_db):
+    base = get_servant_template(1)
+    assert get_servant_template(1) is base
+    assert get_servant_template(1, ascension=3) is not base
+    assert get_servant_template(1, append_5=True) is not base
+    # The underlying document is fetched once for all three templates
+    assert servants_db.calls == 1
+
+
+def test_invalidation_drops_templates(servants_db):
+    get_servant_template(1)
+    assert invalidate_servant(1) is True
+    assert len(servant_template_cache) == 0
+    get_servant_template(1)
+    assert servants_db.calls == 2
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from api.sim_pool import SimulationPool, PoolFull, QueueTimeout
+from tests.fake_game_data import install_fake_db, DEFAULT_TEAM
+
+
+def blocking(started, release, value):
+    started.set()
+    release.wait(5)
+    return value
+
+
+def test_full_queue_rejects_immediately():
+    pool = SimulationPool(max_workers=1, max_queue=1)
+    started, release = threading.Event(), threading.Event()
+
+    async def scenario():
+        first = asyncio.ensure_future(pool.run(blocking, started, release, 1))
+        second = asyncio.ensure_future(pool.run(blocking, threading.Event(), release, 2))
+        # Both tasks are admitted before their first await; the first job is then running
+        await asyncio.sleep(0)
+        assert await asyncio.to_thread(started.wait, 5)
+        stats = pool.stats()
+        assert stats['in_flight'] == 2 and stats['queue_depth'] == 1 and stats['submitted'] == 2
+        # Rejected on the loop thread, without ever reaching the executor
+        with pytest.raises(PoolFull):
+            await pool.run(blocking, threading.Event(), release, 3)
+        stats = pool.stats()
+        assert stats['rejected'] == 1 and stats['submitted'] == 2 and stats['completed'] == 0
+        release.set()
+        return await first, await second
+
+    try:
+        assert asyncio.run(scenario()) == (1, 2)
+    finally:
+        release.set()
+        pool.shutdown()
+    stats = pool.stats()
+    assert stats['rejected'] == 1 and stats['completed'] == 2 and stats['in_flight'] == 0
+    assert stats['submitted'] == 2 and stats['failed'] == 0 and stats['timed_out'] == 0
+
+
+def test_stale_queued_work_is_dropped():
+    pool = SimulationPool(max_workers=1, max_queue=4, queue_timeout=0.05)
+
+    async def scenario():
+        first = asyncio.ensure_future(pool.run(time.sleep, 0.2))
+        await asyncio.sleep(0.01)
+        with pytest.raises(QueueTimeout):
+            await pool.run(lambda: 'never runs')
+        await first
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert pool.stats()['timed_out'] == 1
+
+
+def test_simulate_endpoint_uses_pool(monkeypatch):
+    main = pytest.importorskip('api.main')
+    from fastapi import HTTPException, Response
+
+    install_fake_db(monkeypatch)
+    pool = SimulationPool(max_workers=1, max_queue=0)
+    monkeypatch.setattr(main, 'sim_pool', pool)
+    # A repeated request would be answered from the result cache
+    monkeypatch.setattr(main, 'result_cache', main.ResultCache(max_size=0))
+    req = main.SimRequest(Team=DEFAULT_TEAM, Mystic_Code_ID=20, Quest_ID=1, Commands=['4'])
+    try:
+        response = asyncio.run(main.simulate(req, Response()))
+        assert response['result']['np_damage'][0]['token'] == '4'
+
+        pool.in_flight = pool.capacity
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(main.simulate(req, Response()))
+        assert exc.value.status_code == 503
+    finally:
+        pool.in_flight = 0
+        pool.shutdown()
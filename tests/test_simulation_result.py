@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from sim_entry_points.traverse_api_input import simulate
+from tests.fake_game_data import install_fake_db, default_fake_db, make_quest_doc, DEFAULT_TEAM
+
+
+@pytest.fixture
+def two_wave_db(monkeypatch):
+    fake_db = default_fake_db()
+    fake_db.quests.docs[2] = make_quest_doc(quest_id=2, wave_hp=(20000, 30000))
+    return install_fake_db(monkeypatch, fake_db)
+
+
+def test_clear_is_summarised_per_wave_and_np(two_wave_db):
+    result = simulate(DEFAULT_TEAM, 20, 2, ['4', '#', 'a1', 'd1', '4', '#'])
+
+    assert result.cleared is True
+    assert result.failed_token is None
+    assert result.turns == 2 and result.tokens_executed == 6
+    assert [(wave.wave, wave.cleared, wave.turn) for wave in result.waves] == [(1, True, 1), (2, True, 2)]
+    assert [(np.token, np.wave, np.turn) for np in result.np_damage] == [('4', 1, 1), ('4', 2, 2)]
+    assert all(len(np.damage) == 2 and np.total == sum(np.damage) > 50000 for np in result.np_damage)
+    assert result.np_gauges[0] == 0
+
+
+def test_failing_token_is_reported(two_wave_db):
+    result = simulate(DEFAULT_TEAM, 20, 2, ['b', '#', '4'])
+
+    assert result.cleared is False
+    assert result.failed_token == '#'
+    assert result.tokens_executed == 1
+    assert result.np_damage == []
+    assert [wave.cleared for wave in result.waves] == [False, False]
+    assert result.enemy_hp == [20000, 20000]
+
+
+def test_failed_end_turn_leaves_the_wave_open(two_wave_db, monkeypatch):
+    from managers.turn_manager import TurnManager
+
+    # The NP clears wave 1, but ending the turn fails (as a self-kill with
+    # no backline does)
+    monkeypatch.setattr(TurnManager, 'end_turn', lambda self: False)
+    result = simulate(DEFAULT_TEAM, 20, 2, ['4', '#'])
+
+    assert result.failed_token == '#' and result.tokens_executed == 1
+    assert [(wave.cleared, wave.turn) for wave in result.waves] == [(False, None), (False, None)]
+
+
+def test_to_dict_is_plain_json(two_wave_db):
+    payload = simulate(DEFAULT_TEAM, 20, 2, ['4', '#']).to_dict()
+    encoded = json.dumps(payload)
+    assert json.loads(encoded) == payload
+    assert payload['team'] == [1, 2, 3, 4]
+    assert payload['wave'] == 2 and payload['cleared'] is False
+
+
+def test_simulate_endpoint_returns_the_result(two_wave_db):
+    import asyncio
+
+    from fastapi import Response
+
+    from api import main
+
+    request = main.SimRequest(Team=DEFAULT_TEAM, Mystic_Code_ID=20, Quest_ID=2, Commands=['4', '#', 'a1', 'd1', '4', '#'])
+    payload = json.loads(json.dumps(asyncio.run(main.simulate(request, Response()))['result']))
+    assert payload == simulate(DEFAULT_TEAM, 20, 2, ['4', '#', 'a1', 'd1', '4', '#']).to_dict()
+    assert payload['cleared'] is True
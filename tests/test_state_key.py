@@ -0,0 +1,83 @@
+import pytest
+
+from Driver import Driver
+from tests.fake_game_data import install_fake_db, DEFAULT_TEAM
+from utils.transposition import TranspositionTable
+
+
+@pytest.fixture
+def driver(monkeypatch):
+    install_fake_db(monkeypatch)
+    driver = Driver(DEFAULT_TEAM, quest_id=1, mc_id=20)
+    driver.reset_state()
+    return driver
+
+
+def play(driver, tokens):
+    snap = driver.snapshot()
+    for token in tokens:
+        driver.execute_token(token)
+    key = driver.game_manager.state_key()
+    driver.restore(snap)
+    return key
+
+
+def test_skill_order_does_not_change_key(driver):
+    assert play(driver, ['b', 'e', 'c']) == play(driver, ['c', 'b', 'e'])
+    assert hash(play(driver, ['b', 'e'])) == hash(play(driver, ['e', 'b']))
+
+
+def test_key_tracks_state_that_matters(driver):
+    base = driver.game_manager.state_key()
+    assert play(driver, []) == base
+    assert play(driver, ['b']) != base          # buffs and cooldown
+    assert play(driver, ['a1']) != play(driver, ['a2'])  # NP gauge target
+    assert play(driver, ['4']) != base          # enemy HP
+    assert play(driver, ['j1']) != play(driver, ['a1'])  # mystic code cooldown
+
+
+def test_buff_multiset_counts_duplicates(driver):
+    gm = driver.game_manager
+    buff = {'buff': 'Arts Up', 'value': 300, 'turns': 3, 'functvals': [], 'tvals': []}
+    gm.servants[0].buffs.add_buff(dict(buff))
+    once = gm.state_key()
+    gm.servants[0].buffs.add_buff(dict(buff))
+    assert gm.state_key() != once
+
+
+def test_table_prunes_dominated_entries_only():
+    table = TranspositionTable(max_size=8)
+    assert table.check_and_store(('s',), (5, 3)) is False
+    assert table.check_and_store(('s',), (5, 3)) is True
+    assert table.check_and_store(('s',), (6, 4)) is True
+    # Cheaper on one axis is not dominated, and replaces the entry
+    assert table.check_and_store(('s',), (4, 9)) is False
+    assert table.check_and_store(('s',), (4, 9)) is True
+    assert table.stats()['cutoffs'] == 3
+
+
+def test_table_is_bounded():
+    table = TranspositionTable(max_size=4)
+    for i in range(10):
+        table.check_and_store(('state', i), (0,))
+    assert len(table) == 4
+    assert table.stats()['evictions'] == 6
+    # Evicted states are simply searched again
+    assert table.check_and_store(('state', 0), (0,)) is False
+
+
+def test_hash_collisions_do_not_share_entries(driver):
+    # CPython gives -1 and -2 the same hash, and tuples inherit that
+    assert hash((-1,)) == hash((-2,)) and hash((1, -1)) == hash((1, -2))
+    table = TranspositionTable(max_size=8)
+    assert table.check_and_store((1, -1), (0,)) is False
+    assert table.check_and_store((1, -2), (5,)) is False
+
+    gm = driver.game_manager
+    debuff = {'buff': 'DEF Down', 'value': -1, 'turns': 3, 'functvals': [], 'tvals': []}
+    gm.enemies[0].buffs.add_buff(debuff)
+    first = gm.state_key()
+    debuff['value'] = -2
+    assert gm.state_key() != first
+    assert table.check_and_store(first, (0,)) is False
+    assert table.check_and_store(gm.state_key(), (5,)) is False
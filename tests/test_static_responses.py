@@ -0,0 +1,143 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+from starlette.requests import Request
+
+from api.quest_listing import slim_quest
+from api.static_responses import MaterializedBody, StaticResponse, negotiate_encoding, serialize, source_signature
+
+ROWS = [{'id': no, 'name': f'Mystic Code {no}', 'extraAssets': {'item': {'male': f'https://example/{no}.png'}}}
+        for no in range(1, 40)]
+
+
+def request(**headers):
+    return Request({'type': 'http', 'headers': [(k.replace('_', '-').encode(), v.encode()) for k, v in headers.items()]})
+
+
+def headers(**values):
+    return request(**values).headers
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCursor(list):
+    def sort(self, key, direction=1):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.finds = 0
+
+    def find(self, query=None, projection=None):
+        self.finds += 1
+        return FakeCursor(dict(doc) for doc in self.docs)
+
+    def distinct(self, field):
+        return sorted({doc[field] for doc in self.docs})
+
+
+def test_negotiation_and_conditional_requests():
+    body = MaterializedBody(serialize(ROWS))
+    assert negotiate_encoding('gzip, deflate', body.encoded) == 'gzip'
+    assert negotiate_encoding('gzip;q=0, identity', body.encoded) is None
+    assert negotiate_encoding('*', body.encoded) is not None
+
+    plain = body.respond(headers())
+    assert plain.status_code == 200 and json.loads(plain.body) == ROWS and 'content-encoding' not in plain.headers
+    zipped = body.respond(headers(accept_encoding='gzip'))
+    assert zipped.headers['content-encoding'] == 'gzip' and gzip.decompress(zipped.body) == plain.body
+    assert len(zipped.body) < len(plain.body) and zipped.headers['vary'] == 'Accept-Encoding'
+    # Strong ETags differ per encoding; any of them validates the version
+    assert zipped.headers['etag'] != plain.headers['etag']
+    for validator in (plain.headers['etag'], zipped.headers['etag'], 'W/' + plain.headers['etag'],
+                      '"other", ' + zipped.headers['etag'], '*'):
+        not_modified = body.respond(headers(accept_encoding='gzip', if_none_match=validator))
+        assert not_modified.status_code == 304 and not_modified.body == b''
+        assert not_modified.headers['etag'] == zipped.headers['etag']
+    assert body.respond(headers(if_none_match='"other"')).status_code == 200
+    # Tiny bodies are only served as is
+    assert MaterializedBody(serialize([1])).encoded == {}
+
+
+def test_rebuilds_once_per_data_version():
+    clock = FakeClock()
+    data = {'rows': ROWS, 'version': 'v1', 'version_calls': 0}
+
+    def version():
+        data['version_calls'] += 1
+        return data['version']
+
+    static = StaticResponse(lambda: data['rows'], version, ttl=60, clock=clock)
+    first = static.current()
+    assert static.builds == 1 and static.current() is first and data['version_calls'] == 1
+    clock.now = 61
+    assert static.current() is first and static.builds == 1 and data['version_calls'] == 2
+
+    data['rows'] = ROWS[:-1]
+    data['version'] = 'v2'
+    static.invalidate()
+    second = static.current()
+    assert second is not first and second.tag != first.tag and json.loads(second.body) == ROWS[:-1]
+
+
+def test_unknown_versions_compare_the_body():
+    clock = FakeClock()
+    rows = list(ROWS)
+    static = StaticResponse(lambda: rows, ttl=60, clock=clock)
+    first = static.current()
+    clock.now = 61
+    # Rebuilt and compared, but the compressed encodings are reused
+    assert static.current() is first and static.builds == 2
+    rows.append({'id': 99})
+    clock.now = 122
+    assert static.current() is not first and static.builds == 3
+
+
+def test_source_signature():
+    docs = [{'id': 1, 'sourceHash': 'a'}, {'id': 2, 'sourceHash': 'b'}]
+    assert source_signature(docs, 'id') == source_signature(docs[::-1], 'id')
+    assert source_signature(docs, 'id') != source_signature([docs[0], dict(docs[1], sourceHash='c')], 'id')
+    assert source_signature(docs + [{'id': 3}], 'id') is None
+
+
+@pytest.fixture
+def api(monkeypatch):
+    from api import main
+
+    quests = [{'id': no, 'name': f'Quest {no}', 'warLongName': f'War {no % 3}', 'recommendLv': '90',
+               'stages': [{'enemies': [{'hp': 10000 * no}]}], 'sourceHash': f'q{no}'} for no in range(1, 30)]
+    # Stub the database the lazy collection attributes resolve through, so
+    # nothing connects to MongoDB
+    fake_db = {'mysticcodes': FakeCollection(ROWS), 'quests': FakeCollection(quests)}
+    monkeypatch.setattr(main.db, 'get_db', lambda: fake_db)
+    for static in main.static_responses.values():
+        static.clear()
+    yield main, quests
+    for static in main.static_responses.values():
+        static.clear()
+
+
+def test_catalog_endpoints(api):
+    main, quests = api
+    response = asyncio.run(main.get_mysticcodes(request(accept_encoding='gzip')))
+    assert json.loads(gzip.decompress(response.body)) == ROWS
+    repeat = asyncio.run(main.get_mysticcodes(request(accept_encoding='gzip', if_none_match=response.headers['etag'])))
+    assert repeat.status_code == 304 and main.db.mysticcode_collection.finds == 1
+
+    listing = asyncio.run(main.get_quests(request(), warLongNames=None, recommendLv='', cursor=None, limit=None,
+                                          format='json'))
+    assert json.loads(listing.body) == [slim_quest(quest) for quest in quests] and 'etag' in listing.headers
+    assert json.loads(asyncio.run(main.get_quests_warLongNames(request())).body) == ['War 0', 'War 1', 'War 2']
@@ -0,0 +1,50 @@
+import pytest
+
+from Driver import Driver, TOKEN_TABLE, parse_commands, parse_token, tokenize
+from tests.fake_game_data import install_fake_db, DEFAULT_TEAM
+
+
+@pytest.fixture
+def driver(monkeypatch):
+    install_fake_db(monkeypatch)
+    driver = Driver(DEFAULT_TEAM, quest_id=1, mc_id=20)
+    driver.reset_state()
+    return driver
+
+
+def test_table_covers_the_token_language():
+    # 9 skills and 3 mystic code skills x (untargeted + 3 targets),
+    # 9 swaps plus bare x, 3 NPs and end of turn
+    assert len(TOKEN_TABLE) == 12 * 4 + 10 + 3 + 1
+    assert parse_token('e2').args == (1, 1, 1)
+    assert parse_token('x23').args == (2, 3)
+
+
+def test_choice_tokens():
+    action = parse_token('d[Ch2B]')
+    assert action.choice and action.args == (1, 0, (2, 1))
+    action = parse_token('i([Ch1C]2)')
+    assert action.choice and action.args == (2, 2, 1, (1, 2))
+
+
+def test_command_strings_tokenize_like_lists():
+    assert tokenize('a b1 j2 x13 4 #') == ['a', 'b1', 'j2', 'x13', '4', '#']
+    assert tokenize('ab1e[Ch2A]f([Ch1B]3)56#') == ['a', 'b1', 'e[Ch2A]', 'f([Ch1B]3)', '5', '6', '#']
+    assert parse_commands('a2 4') == [parse_token('a2'), parse_token('4')]
+    assert parse_token('?').run is None
+
+
+def test_run_commands_matches_token_by_token(driver):
+    snap = driver.snapshot()
+    for token in ['a2', 'b', 'j3', '4']:
+        driver.execute_token(token)
+    expected = driver.game_manager.state_key()
+    driver.restore(snap)
+    assert driver.run_commands('a2 b j3 4') is driver.game_manager
+    assert driver.game_manager.state_key() == expected
+
+
+def test_invalid_token_is_skipped(driver):
+    before = driver.game_manager.state_key()
+    assert driver.execute_token('zz') is driver.game_manager
+    assert driver.game_manager.state_key() == before
@@ -0,0 +1,106 @@
+import logging
+
+import pytest
+
+from sim_entry_points.traverse_api_input import simulate, traverse_api_input
+from utils.trace import Tracer, make_tracer
+from tests.fake_game_data import install_fake_db, DEFAULT_TEAM
+
+COMMANDS = ['4', '#', 'a1', 'd1', '4', '#']
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(level=logging.DEBUG)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def engine_logs():
+    handler = RecordingHandler()
+    root = logging.getLogger()
+    previous = root.level
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    try:
+        yield handler.records
+    finally:
+        root.removeHandler(handler)
+        root.setLevel(previous)
+
+
+def test_ring_buffer_keeps_the_newest_events():
+    tracer = Tracer('summary', capacity=3)
+    for wave in range(1, 6):
+        tracer.emit('wave_cleared', wave=wave)
+
+    assert len(tracer) == 3 and tracer.dropped == 2
+    assert tracer.render() == ["Wave 3 completed.", "Wave 4 completed.", "Wave 5 completed."]
+    tracer.clear()
+    assert tracer.events() == [] and tracer.dropped == 0
+
+
+def test_levels():
+    off, summary, full = Tracer('off'), Tracer('summary'), Tracer('full')
+    assert (off.summary, off.full) == (False, False)
+    assert (summary.summary, summary.full) == (True, False)
+    assert (full.summary, full.full, full.echo) == (True, True, False)
+    assert make_tracer('echo').echo and make_tracer(full) is full
+    with pytest.raises(ValueError):
+        Tracer('verbose')
+
+
+def test_untraced_run_prints_and_logs_nothing(monkeypatch, capsys, engine_logs):
+    install_fake_db(monkeypatch)
+    result = simulate(DEFAULT_TEAM, 20, 1, COMMANDS)
+
+    assert result.trace is None
+    assert capsys.readouterr().out == ''
+    engine = [record for record in engine_logs if record.pathname.split('/')[-2] in ('managers', 'package')]
+    assert engine == []
+
+
+def test_summary_and_full_traces_render_on_demand(monkeypatch, capsys):
+    install_fake_db(monkeypatch)
+    summary = simulate(DEFAULT_TEAM, 20, 1, COMMANDS, trace='summary').trace
+    full = simulate(DEFAULT_TEAM, 20, 1, COMMANDS, trace='full').trace
+
+    assert capsys.readouterr().out == ''
+    assert summary[0] == "Executing TOKEN: 4"
+    assert "Wave 1 completed." in summary and "Advancing to wave 2" in summary
+    assert sum(line.startswith("Servant 1 deals") and "| HP:" in line for line in summary) == 4
+    assert not any("hp left and gains" in line and "| HP:" not in line for line in summary)
+    # Full adds the per-hit lines and damage terms on top of the summary
+    assert set(summary) <= set(full)
+    assert any(line.startswith("Servant 1 vs Enemy") for line in full)
+    assert sum("hp left and gains" in line and "| HP:" not in line for line in full) > 4
+
+
+def test_echo_keeps_the_console_output(monkeypatch, capsys):
+    install_fake_db(monkeypatch)
+    driver = traverse_api_input(DEFAULT_TEAM, 20, 1, ['4', '#'], trace='echo')
+
+    out = capsys.readouterr().out
+    assert "Executing TOKEN: 4" in out and "Wave 1 completed." in out
+    assert driver.tracer.render()[0] == "Executing TOKEN: 4"
+
+
+def test_simulate_endpoint_trace(monkeypatch):
+    import asyncio
+    from fastapi import HTTPException, Response
+    from api import main
+
+    install_fake_db(monkeypatch)
+
+    def post(**payload):
+        request = main.SimRequest(Team=DEFAULT_TEAM, Mystic_Code_ID=20, Quest_ID=1, Commands=['4'], **payload)
+        return asyncio.run(main.simulate(request, Response()))
+
+    assert post()['result']['trace'] is None
+    assert post(Trace='summary')['result']['trace'][0] == "Executing TOKEN: 4"
+    with pytest.raises(HTTPException) as error:
+        post(Trace='echo')
+    assert error.value.status_code == 400
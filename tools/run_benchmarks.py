@@ -0,0 +1,269 @@
+"""Time the simulator on a fixed corpus of /simulate payloads.
+
+Each scenario in the corpus (tools/benchmark_corpus.json by default) is
+replayed the way traverse_api_input runs it, against whatever game data
+scripts.connectDB points at, so use a local bundle for stable numbers:
+
+    FGO_DATA_BUNDLE=fgo_data.bundle python -m tools.run_benchmarks --output bench.json
+    python -m tools.run_benchmarks --bundle fgo_data.bundle --compare bench.json
+
+Per scenario the results hold the median and fastest time of each phase
+over --repeat runs: setup (building the Driver and its units), tokens
+(executing the command list), np and end_turn (the parts of tokens spent
+firing NPs and ending turns), total, and the time per executed token.
+A separate run under tracemalloc records the memory blocks and bytes
+the run leaves allocated and its peak. The JSON written with --output
+can be passed back with --compare; the exit status is 1 if any phase
+got slower (or allocates more) than --threshold allows.
+"""
+import argparse
+import contextlib
+import datetime
+import functools
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+RESULT_VERSION = 1
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_corpus.json')
+PHASES = ('setup', 'tokens', 'np', 'end_turn', 'total')
+# Engine methods whose time is attributed to a phase
+TIMED_METHODS = {
+    'tokens': ('Driver', 'Driver', 'execute_action'),
+    'np': ('managers.np_manager', 'npManager', 'use_np'),
+    'end_turn': ('managers.turn_manager', 'TurnManager', 'end_turn'),
+}
+# Differences below this many milliseconds are timer noise, not regressions
+NOISE_FLOOR_MS = 0.05
+
+
+class PhaseClock:
+    """Accumulates the time spent inside the TIMED_METHODS."""
+
+    def __init__(self):
+        self.totals = dict.fromkeys(TIMED_METHODS, 0.0)
+        self.calls = dict.fromkeys(TIMED_METHODS, 0)
+
+    def reset(self):
+        for phase in TIMED_METHODS:
+            self.totals[phase] = 0.0
+            self.calls[phase] = 0
+
+    def _wrap(self, phase, func):
+        totals, calls = self.totals, self.calls
+        perf_counter = time.perf_counter
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                totals[phase] += perf_counter() - start
+                calls[phase] += 1
+        return timed
+
+    @contextlib.contextmanager
+    def installed(self):
+        import importlib
+
+        originals = []
+        try:
+            for phase, (module_name, class_name, method) in TIMED_METHODS.items():
+                cls = getattr(importlib.import_module(module_name), class_name)
+                original = cls.__dict__[method]
+                originals.append((cls, method, original))
+                setattr(cls, method, self._wrap(phase, original))
+            yield self
+        finally:
+            for cls, method, original in originals:
+                setattr(cls, method, original)
+
+
+def load_corpus(path=DEFAULT_CORPUS):
+    with open(path) as f:
+        scenarios = json.load(f)
+    names = [scenario['name'] for scenario in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate scenario names in {path}")
+    return scenarios
+
+
+def _run_once(scenario):
+    from sim_entry_points.batch_runner import normalize_job
+    from sim_entry_points.traverse_api_input import _new_driver, _run_commands
+
+    team, mc_id, quest_id, commands = normalize_job(scenario)
+    start = time.perf_counter()
+    driver = _new_driver(team, mc_id, quest_id, trace='off')
+    built = time.perf_counter()
+    _run_commands(driver, commands)
+    return driver, built - start, time.perf_counter() - start
+
+
+def measure_allocations(scenario):
+    """Blocks and bytes one run leaves allocated, and its peak bytes."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        before = tracemalloc.take_snapshot().filter_traces(ignore)
+        tracemalloc.reset_peak()
+        driver = _run_once(scenario)[0]
+        peak = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot().filter_traces(ignore)
+    finally:
+        tracemalloc.stop()
+    del driver
+    growth = [stat for stat in after.compare_to(before, 'filename') if stat.size_diff > 0]
+    return {
+        'alloc_blocks': sum(max(stat.count_diff, 0) for stat in growth),
+        'alloc_kb': round(sum(stat.size_diff for stat in growth) / 1024, 1),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_scenario(scenario, repeat=20, warmup=1, allocations=True):
+    """Median/min milliseconds per phase for one scenario, plus allocations."""
+    from utils.quiet import quiet_engine
+
+    clock = PhaseClock()
+    samples = {phase: [] for phase in PHASES}
+    with quiet_engine(), clock.installed():
+        # The first runs load servant/quest/mystic code data into the caches
+        for _ in range(warmup):
+            _run_once(scenario)
+        for _ in range(repeat):
+            clock.reset()
+            _, setup, total = _run_once(scenario)
+            samples['setup'].append(setup)
+            samples['total'].append(total)
+            for phase in TIMED_METHODS:
+                samples[phase].append(clock.totals[phase])
+        tokens_run = clock.calls['tokens']
+
+    result = {'tokens': len(scenario['Commands']), 'tokens_run': tokens_run, 'repeat': repeat}
+    for phase in PHASES:
+        result[f'{phase}_ms'] = round(statistics.median(samples[phase]) * 1000, 4)
+        result[f'{phase}_min_ms'] = round(min(samples[phase]) * 1000, 4)
+    result['per_token_us'] = round(result['tokens_ms'] * 1000 / max(tokens_run, 1), 2)
+    if allocations:
+        with quiet_engine():
+            result.update(measure_allocations(scenario))
+    return result
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=10,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_benchmarks(scenarios, repeat=20, warmup=1, allocations=True, only=None):
+    """Benchmark every scenario; one that fails is reported with its error."""
+    results = {}
+    for scenario in scenarios:
+        name = scenario['name']
+        if only and name not in only:
+            continue
+        try:
+            results[name] = run_scenario(scenario, repeat, warmup, allocations)
+        except Exception as e:
+            results[name] = {'error': f"{type(e).__name__}: {e}"}
+    return {
+        'version': RESULT_VERSION,
+        'meta': {
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'data': f"bundle:{os.getenv('FGO_DATA_BUNDLE')}" if os.getenv('FGO_DATA_BUNDLE') else 'mongo',
+            'repeat': repeat,
+        },
+        'scenarios': results,
+    }
+
+
+def compare(current, baseline, threshold=0.10):
+    """Phases (and allocation counts) that grew by more than threshold.
+
+    Timings compare medians and ignore differences under NOISE_FLOOR_MS.
+    """
+    regressions = []
+    for name, now in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before or 'error' in now or 'error' in before:
+            continue
+        for metric in [f'{phase}_ms' for phase in PHASES] + ['alloc_blocks']:
+            if metric not in now or metric not in before:
+                continue
+            old, new = before[metric], now[metric]
+            if new <= old * (1 + threshold):
+                continue
+            if metric.endswith('_ms') and new - old < NOISE_FLOOR_MS:
+                continue
+            regressions.append({'scenario': name, 'metric': metric, 'baseline': old, 'current': new,
+                                'change': round(new / old - 1, 4) if old else None})
+    return regressions
+
+
+def format_table(report):
+    columns = ('setup_ms', 'tokens_ms', 'np_ms', 'end_turn_ms', 'total_ms', 'per_token_us', 'alloc_blocks', 'peak_kb')
+    width = max([len(name) for name in report['scenarios']] + [8])
+    lines = [f"{'scenario':<{width}}  " + "  ".join(f"{column:>12}" for column in columns)]
+    for name, result in report['scenarios'].items():
+        if 'error' in result:
+            lines.append(f"{name:<{width}}  error: {result['error']}")
+            continue
+        lines.append(f"{name:<{width}}  " + "  ".join(f"{result.get(column, ''):>12}" for column in columns))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulator on a fixed corpus of /simulate payloads.")
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help="JSON list of scenarios (default: %(default)s)")
+    parser.add_argument('--bundle', help="game data bundle to read instead of MongoDB (sets FGO_DATA_BUNDLE)")
+    parser.add_argument('--repeat', type=int, default=20, help="timed runs per scenario (default: %(default)s)")
+    parser.add_argument('--warmup', type=int, default=1, help="untimed runs per scenario first (default: %(default)s)")
+    parser.add_argument('--scenario', action='append', help="only run the named scenario (repeatable)")
+    parser.add_argument('--no-allocations', action='store_true', help="skip the tracemalloc run")
+    parser.add_argument('--output', help="write the JSON results here (default: stdout)")
+    parser.add_argument('--compare', help="earlier results to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="allowed slowdown before a phase counts as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.bundle:
+        os.environ['FGO_DATA_BUNDLE'] = args.bundle
+    report = run_benchmarks(load_corpus(args.corpus), repeat=args.repeat, warmup=args.warmup,
+                            allocations=not args.no_allocations, only=args.scenario)
+    if args.compare:
+        with open(args.compare) as f:
+            report['regressions'] = compare(report, json.load(f), args.threshold)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    print(format_table(report), file=sys.stderr)
+    for regression in report.get('regressions', []):
+        print(f"REGRESSION {regression['scenario']} {regression['metric']}: "
+              f"{regression['baseline']} -> {regression['current']}", file=sys.stderr)
+    failed = [name for name, result in report['scenarios'].items() if 'error' in result]
+    return 1 if report.get('regressions') or failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
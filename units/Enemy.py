@@ -1,5 +1,23 @@
 from .buffs import Buffs
 
+
+def np_gain_per_hit(class_name, traits):
+    """NP gain multiplier per hit against an enemy of this class and traits."""
+    initial = 1
+    if class_name == 'rider': 
+        initial *= 1.1
+    if class_name == 'caster': 
+        initial *= 1.2
+    if class_name == 'assassin': 
+        initial *= 0.9
+    if class_name == 'berserker': 
+        initial *= 0.8
+    if 1002 in traits or 1100 in traits: # undead/soldier/pirate mult
+        initial *= 1.2
+    # print(f"INITIAL NP MULT={initial}")
+    return initial
+
+
 class Enemy:
     def __init__(self, enemydata):
         self.name = enemydata[0]
@@ -17,6 +35,39 @@ class Enemy:
         self.buffs = Buffs(servant=None, enemy=self)
         self.np_per_hit_mult = self.np_gain_per_hit()
 
+    @classmethod
+    def from_template(cls, template):
+        """Fresh battle-ready enemy from a managers.Quest.EnemyTemplate."""
+        enemy = object.__new__(cls)
+        enemy.name = template.name
+        enemy.max_hp = template.max_hp
+        enemy.hp = template.max_hp
+        enemy.death_rate = template.death_rate
+        enemy.class_name = template.class_name
+        enemy.traits = list(template.traits)
+        enemy.attribute = template.attribute
+        enemy.state = template.state
+        enemy.defense = 0
+        enemy.b_resdown = 0
+        enemy.a_resdown = 0
+        enemy.q_resdown = 0
+        enemy.buffs = Buffs(servant=None, enemy=enemy)
+        enemy.np_per_hit_mult = template.np_per_hit_mult
+        return enemy
+
+    def clone(self):
+        """Copy the mutable battle state (HP, buffs, traits); the rest is shared."""
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        clone.traits = list(self.traits)
+        clone.buffs = self.buffs.clone(enemy=clone)
+        if hasattr(self, 'fsm_damage_log'):
+            clone.fsm_damage_log = list(self.fsm_damage_log)
+        return clone
+
+    def state_key(self):
+        return (self.hp, tuple(sorted(self.traits)), self.buffs.state_key())
+
     def get_def(self):
         return self.defense
     def get_b_resdown(self):
@@ -46,19 +97,7 @@ class Enemy:
         self.buffs.process_enemy_buffs()
     
     def np_gain_per_hit(self):
-        initial = 1
-        if self.class_name == 'rider': 
-            initial *= 1.1
-        if self.class_name == 'caster': 
-            initial *= 1.2
-        if self.class_name == 'assassin': 
-            initial *= 0.9
-        if self.class_name == 'berserker': 
-            initial *= 0.8
-        if 1002 in self.traits or 1100 in self.traits: # undead/soldier/pirate mult
-            initial *= 1.2
-        # print(f"INITIAL NP MULT={initial}")
-        return initial
+        return np_gain_per_hit(self.class_name, self.traits)
 
     def decrement_buffs(self):
         # Create a copy of the list to iterate over
@@ -1,4 +1,7 @@
+import os
 from data import base_multipliers
+from utils.lru import LRUCache
+from utils.metrics import registry as metrics_registry, timed, DATA_LOAD_SECONDS
 from .stats import Stats
 from .skills import Skills
 from .buffs import Buffs
@@ -11,8 +14,11 @@ except ImportError:
     # Create a mock DB for testing
     class MockDB:
         class MockCollection:
-            def find_one(self, query):
+            def find_one(self, query, projection=None):
                 return None
+
+            def find(self, query, projection=None):
+                return []
         
         @property
         def servants(self):
@@ -22,10 +28,6 @@ except ImportError:
 
 import logging
 
-# Configure logging
-logging.basicConfig(filename='./outputs/output.log', level=logging.INFO,
-                    format='%(asctime)s:%(levelname)s:%(message)s')
-
 def select_ascension_data(servant_json: dict, ascension: int) -> dict:
     """
     Select ascension-specific data from servant JSON.
@@ -127,6 +129,44 @@ def select_ascension_data(servant_json: dict, ascension: int) -> dict:
     
     return result
 
+class ServantTemplate:
+    """Parsed, read-only servant data shared by every Servant built from the
+    same (collectionNo, ascension, append_5).
+
+    Skills, NPs and passives are parsed here once instead of on every
+    Servant() call. Nothing on a template may be mutated at runtime; per-run
+    state (NP gauge, buffs, cooldowns) lives on the Servant.
+    """
+
+    def __init__(self, data, ascension=1, append_5=False):
+        self.data = data
+        self.collection_no = data.get('collectionNo')
+        self.ascension = ascension
+        self.append_5 = append_5
+        self.source_hash = data.get('sourceHash')
+        self.name = data.get('name')
+        self.class_name = data.get('className')
+        self.class_id = data.get('classId')
+        self.gender = data.get('gender')
+        self.attribute = data.get('attribute')
+        self.traits = tuple(trait['id'] for trait in data.get('traits', []))
+        self.cards = data.get('cards', [])
+        self.rarity = data.get('rarity')
+        self.atk_growth = data.get('atkGrowth', [])
+
+        # Use ascension-aware data selection so Servant picks ascension-specific
+        # skills and noblePhantasms when present in the JSON. Falls back to
+        # legacy fields if ascension-specific data is not available.
+        ascension_data = select_ascension_data(data, ascension)
+        self.skills = Skills.compile(ascension_data.get('skills', data.get('skills', [])))
+        self.nps = NP.compile(ascension_data.get('noblePhantasms', data.get('noblePhantasms', [])))
+        self.passives = tuple(Buffs().parse_passive(data.get('classPassive', [])))
+        self.class_base_multiplier = 1 if self.collection_no == 426 else base_multipliers[self.class_name]
+
+    def __repr__(self):
+        return f"ServantTemplate(collectionNo={self.collection_no}, name={self.name}, ascension={self.ascension}, append_5={self.append_5})"
+
+
 class Servant:
     special_servants = [
         #transforms completly new character on np to 4132
@@ -141,30 +181,30 @@ class Servant:
         350, 306, 305]
 
     def __init__(self, collectionNo, np=1, ascension=1, lvl=0, initialCharge=0, attack=0, atkUp=0, artsUp=0, quickUp=0, busterUp=0, npUp=0, damageUp=0, busterDamageUp=0, quickDamageUp=0, artsDamageUp=0, append_5=False):
-        self.id = collectionNo
-        self.data = select_character(collectionNo)
-        if self.data is None:
+        # Everything parsed from the servant document comes from a shared
+        # ServantTemplate; this instance only carries per-run battle state.
+        template = get_servant_template(collectionNo, ascension, append_5)
+        if template is None:
             raise ValueError(f"Servant data for collectionNo {collectionNo} not found.")
-        self.name = self.data.get('name')
-        self.class_name = self.data.get('className')
-        self.class_id = self.data.get('classId')
-        self.gender = self.data.get('gender')
-        self.attribute = self.data.get('attribute')
-        self.traits = [trait['id'] for trait in self.data.get('traits', [])]
-        self.cards = self.data.get('cards', [])
+        self.template = template
+        self.id = collectionNo
+        self.data = template.data
+        self.name = template.name
+        self.class_name = template.class_name
+        self.class_id = template.class_id
+        self.gender = template.gender
+        self.attribute = template.attribute
+        self.traits = list(template.traits)
+        self.cards = template.cards
         self.lvl = lvl # currently working on High Prio TODOs
         self.ascension = ascension; # currently working on High Prio TODOs
-        self.atk_growth = self.data.get('atkGrowth', [])
-        
-        # Use ascension-aware data selection so Servant picks ascension-specific
-        # skills and noblePhantasms when present in the JSON. Falls back to
-        # legacy fields if ascension-specific data is not available.
-        ascension_data = select_ascension_data(self.data, ascension)
-        self.skills = Skills(ascension_data.get('skills', self.data.get('skills', [])), append_5=append_5)
+        self.atk_growth = template.atk_growth
+
+        self.skills = Skills(None, append_5=append_5, compiled=template.skills)
         self.np_level = np
         self.oc_level = 1
-        self.nps = NP(ascension_data.get('noblePhantasms', self.data.get('noblePhantasms', [])))
-        self.rarity = self.data.get('rarity')
+        self.nps = NP(None, compiled=template.nps)
+        self.rarity = template.rarity
         self.np_gauge = initialCharge
         self.np_gain_mod = 1
         self.buffs = Buffs(self)
@@ -180,9 +220,9 @@ class Servant:
         # appropriate NP version's card. Previously this used the first NP
         # entry which caused mismatches for upgraded NPs.
         self.card_type = getattr(self.nps, 'card', None)
-        self.class_base_multiplier = 1 if self.id == 426 else base_multipliers[self.class_name]
+        self.class_base_multiplier = template.class_base_multiplier
 
-        self.passives = self.buffs.parse_passive(self.data.get('classPassive', []))
+        self.passives = template.passives
         self.apply_passive_buffs()
         self.kill = False
 
@@ -203,13 +243,38 @@ class Servant:
         )
     
 
+    def clone(self):
+        """Copy this servant's per-run state, sharing the template tables."""
+        # Bypass __init__ and copy.copy(); this runs once per snapshot/restore
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        clone.traits = list(self.traits)
+        clone.power_mod = self.power_mod.copy()
+        clone.skills = self.skills.clone()
+        clone.buffs = self.buffs.clone(servant=clone)
+        clone.stats = Stats(clone)
+        return clone
+
+    def state_key(self):
+        """Hashable summary of everything a turn can change on this servant."""
+        return (
+            self.id,
+            round(self.np_gauge, 4),
+            tuple(self.skills.cooldowns.values()),
+            tuple(self.skills.cooldown_reduction_applied.values()),
+            self.skills.melusine_skill,
+            self.kill,
+            tuple(sorted(self.traits)),
+            self.buffs.state_key(),
+        )
+
     def set_npgauge(self, value):
         
         if value == 0:
-            logging.info(f"Setting NP GAUGE to 0 for {self.name}")
+            logging.debug("Setting NP gauge to 0 for %s", self.name)
             self.np_gauge = 0
         else:
-            logging.info(f"INCREASING NP GAUGE OF {self.name} TO {self.np_gauge + value}")
+            logging.debug("Increasing NP gauge of %s to %s", self.name, self.np_gauge + value)
             self.np_gauge += value
 
     def get_npgauge(self):
@@ -364,6 +429,85 @@ class Servant:
         return self.stats.resolve_generic_effect(effect, target)
 
 
+# Process-wide cache of raw servant documents keyed by collectionNo. Servant
+# documents only change when scripts/GetUpdatesAndUpsert.py runs, so repeated
+# simulations can reuse them; sync_servant_cache() drops entries whose
+# sourceHash no longer matches the database.
+SERVANT_CACHE_SIZE = int(os.getenv('SERVANT_CACHE_SIZE', '512'))
+servant_cache = LRUCache(max_size=SERVANT_CACHE_SIZE)
+metrics_registry.register_cache('servant_documents', servant_cache)
+
+
 def select_character(character_id):
+    servant = servant_cache.get(character_id)
+    if servant is not None:
+        return servant
     servant = db.servants.find_one({'collectionNo': character_id})
-    return servant  # Ensure character_id is an integer
+    if servant is not None:
+        servant_cache.put(character_id, servant)
+    return servant
+
+
+# Compiled templates keyed by (collectionNo, ascension, append_5). Dropped
+# together with the servant document when its sourceHash changes.
+servant_template_cache = LRUCache(max_size=SERVANT_CACHE_SIZE)
+metrics_registry.register_cache('servant_templates', servant_template_cache)
+
+
+@timed(DATA_LOAD_SECONDS, 'servant')
+def get_servant_template(character_id, ascension=1, append_5=False):
+    key = (character_id, ascension, bool(append_5))
+    template = servant_template_cache.get(key)
+    if template is None:
+        data = select_character(character_id)
+        if data is None:
+            return None
+        template = ServantTemplate(data, ascension, append_5)
+        servant_template_cache.put(key, template)
+    return template
+
+
+def invalidate_servant(character_id, source_hash=None):
+    """Drop a cached servant document.
+
+    If source_hash is given the entry is only dropped when its stored
+    sourceHash differs, so callers can pass the hash they just wrote.
+    Returns True if an entry was removed.
+    """
+    removed = servant_cache.discard_where(
+        lambda key, doc: key == character_id and (source_hash is None or doc.get('sourceHash') != source_hash)
+    )
+    removed += servant_template_cache.discard_where(
+        lambda key, template: key[0] == character_id and (source_hash is None or template.source_hash != source_hash)
+    )
+    if removed:
+        logging.info(f"Invalidated cached servant {character_id}")
+    return bool(removed)
+
+
+def sync_servant_cache():
+    """Evict cached servants whose sourceHash changed in the database.
+
+    Uses one projection query covering every cached collectionNo rather than
+    refetching documents. Returns the number of evicted entries.
+    """
+    cached_ids = {key for key, _ in servant_cache.items()}
+    cached_ids.update(key[0] for key, _ in servant_template_cache.items())
+    if not cached_ids:
+        return 0
+    current = {
+        doc.get('collectionNo'): doc.get('sourceHash')
+        for doc in db.servants.find(
+            {'collectionNo': {'$in': list(cached_ids)}},
+            {'_id': 0, 'collectionNo': 1, 'sourceHash': 1}
+        )
+    }
+    evicted = servant_cache.discard_where(
+        lambda key, doc: key in cached_ids and current.get(key) != doc.get('sourceHash')
+    )
+    servant_template_cache.discard_where(
+        lambda key, template: key[0] in cached_ids and current.get(key[0]) != template.source_hash
+    )
+    if evicted:
+        logging.info(f"Evicted {evicted} stale servant documents from cache")
+    return evicted
@@ -1,4 +1,4 @@
-from .Servant import Servant
+from .Servant import Servant, ServantTemplate
 from .Enemy import Enemy
 
-__all__ = ['Servant', 'Enemy']
+__all__ = ['Servant', 'ServantTemplate', 'Enemy']
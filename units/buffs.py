@@ -1,26 +1,201 @@
 import logging
 
-# Configure logging
-logging.basicConfig(filename='./outputs/output.log', level=logging.INFO,
-                    format='%(asctime)s:%(levelname)s:%(message)s')
-
 magic_bullet_buff = {'buff': 'Magic Bullet', 'functvals': [], 'value': 9999, 'tvals': [], 'turns': -1}
 
+
+def _freeze(value):
+    # Hashable, order-stable form of the nested dict/list values buffs carry
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+# Buff kinds, classified once when a buff is added. Each kind is a slot in
+# the aggregate vectors Buffs keeps up to date on add/remove/expiry, so
+# processing modifiers costs the same however many buffs are stacked.
+(NP_STRENGTH, BOOST_NP_STRENGTH, ATK_UP, BUSTER_UP, ARTS_UP, QUICK_UP, OVERCHARGE_UP,
+ NP_PER_PROCESS, NP_GAIN_UP, BUSTER_DAMAGE_UP, ARTS_DAMAGE_UP, QUICK_DAMAGE_UP) = range(12)
+SERVANT_KINDS = 12
+# Power by trait ("STR Up") is aggregated per trait rather than in the vector
+STR_UP = 'str'
+# Classified, but processed per buff by the original rules (see _process_servant_fallback)
+FALLBACK = 'fallback'
+
+(DEF_DOWN, BUSTER_RESIST_DOWN, ARTS_RESIST_DOWN, QUICK_RESIST_DOWN, APPLY_ROME) = range(5)
+ENEMY_KINDS = 5
+
+_NP_STRENGTH_KINDS = {'NP Strength Up': NP_STRENGTH, 'upNpdamage': NP_STRENGTH, 'Boost NP Strength Up': BOOST_NP_STRENGTH}
+_SERVANT_KINDS = {
+    'ATK Up': ATK_UP,
+    'Buster Up': BUSTER_UP,
+    'Arts Up': ARTS_UP,
+    'Quick Up': QUICK_UP,
+    # Adds a number to the power_mod dict and raises; left to the fallback
+    'Power Up': FALLBACK,
+    'NP Overcharge Level Up': OVERCHARGE_UP,
+    'Overcharge Lv. Up': OVERCHARGE_UP,
+}
+_SERVANT_KINDS_AFTER_STR = {
+    'NP Gain Up': NP_GAIN_UP,
+    'Buster Card Damage Up': BUSTER_DAMAGE_UP,
+    'Arts Card Damage Up': ARTS_DAMAGE_UP,
+    'Quick Card Damage Up': QUICK_DAMAGE_UP,
+}
+_ENEMY_KINDS = {
+    'DEF Down': DEF_DOWN,
+    'Buster Card Resist Down': BUSTER_RESIST_DOWN,
+    'Arts Card Resist Down': ARTS_RESIST_DOWN,
+    'Quick Card Resist Down': QUICK_RESIST_DOWN,
+    'Apply Trait (Rome)': APPLY_ROME,
+}
+
+
+def classify_servant_buff(buff):
+    """Return (required_field, first_pass_kind, second_pass_kind) for a buff.
+
+    Mirrors the two passes of the original servant processing: the first
+    pass only looks at NP strength, the second walks an if/elif chain in
+    which "NP Strength Up" also matches the "Strength Up" (power by trait)
+    branch. Kinds are None when the buff does not contribute.
+    """
+    try:
+        required_field = buff.get('script', {}).get('INDIVIDUALITIE', {}).get('id')
+        if required_field is None:
+            required_field = buff.get('originalScript', {}).get('INDIVIDUALITIE')
+    except AttributeError:
+        return None, FALLBACK, FALLBACK
+    name = buff.get('buff')
+    if name is None:
+        return None, FALLBACK, FALLBACK
+    first = _NP_STRENGTH_KINDS.get(name)
+    second = _SERVANT_KINDS.get(name)
+    if second is None:
+        if "STR Up" in name or "Strength Up" in name:
+            second = STR_UP
+        elif 'Triggers Each Turn (Increase NP)' in name or 'Triggers Each Turn (NP Absorb)' in name:
+            second = NP_PER_PROCESS
+        else:
+            second = _SERVANT_KINDS_AFTER_STR.get(name)
+    # Malformed buffs that the per-buff rules would fail on while processing
+    if 'value' not in buff:
+        if first == NP_STRENGTH:
+            first = FALLBACK
+        if second is not None and second != STR_UP:
+            second = FALLBACK
+    if second == STR_UP and 'tvals' not in buff:
+        second = FALLBACK
+    return required_field, first, second
+
+
+def classify_enemy_buff(buff):
+    if 'buff' not in buff:
+        return FALLBACK
+    kind = _ENEMY_KINDS.get(buff['buff'])
+    if kind is not None and kind != APPLY_ROME and 'value' not in buff:
+        return FALLBACK
+    return kind
+
+
+class _Totals:
+    """Running sums for the buffs that share one required field."""
+    __slots__ = ('vector', 'power', 'count')
+
+    def __init__(self):
+        self.vector = [0] * SERVANT_KINDS
+        self.power = {}
+        self.count = 0
+
+    def copy(self):
+        totals = _Totals()
+        totals.vector = list(self.vector)
+        totals.power = {tval: list(entry) for tval, entry in self.power.items()}
+        totals.count = self.count
+        return totals
+
+
 class Buffs:
     def __init__(self, servant=None, enemy=None):
         # Initialize basic buffs list and stateful effect tracking for all cases
         self.buffs = []
         self.stateful_effects = []
         self.counters = {}
+        self._reset_aggregates()
         
         if servant:
             self.servant = servant
         if enemy:
             self.enemy = enemy
 
+    def _reset_aggregates(self):
+        # Servant totals keyed by required field (None: always applies)
+        self._servant_totals = {}
+        self._servant_fallback = []
+        self._enemy_vector = [0] * ENEMY_KINDS
+        self._enemy_fallback = []
+        # The list the aggregates were built from, to notice direct edits
+        self._tracked = self.buffs
+        self._tracked_len = len(self.buffs)
+
+    def _rebuild_aggregates(self):
+        self._reset_aggregates()
+        for buff in self.buffs:
+            self._account(buff, 1)
+
+    def _sync_aggregates(self):
+        # Cheap guard for code that edits self.buffs directly instead of
+        # going through add_buff/remove/decrement_buffs
+        if self._tracked is not self.buffs or self._tracked_len != len(self.buffs):
+            self._rebuild_aggregates()
+
+    def _account(self, buff, sign):
+        """Add (sign=1) or subtract (sign=-1) one buff from the aggregates."""
+        required_field, first, second = classify_servant_buff(buff)
+        if first == FALLBACK or second == FALLBACK:
+            self._track_fallback(self._servant_fallback, buff, sign)
+        elif first is not None or second is not None:
+            totals = self._servant_totals.get(required_field)
+            if totals is None:
+                totals = self._servant_totals[required_field] = _Totals()
+            if first is not None:
+                totals.vector[first] += sign * (buff['value'] if first == NP_STRENGTH else 1)
+            if second == STR_UP:
+                value = buff.get("value", 0)
+                for tval in buff['tvals']:
+                    # [sum, buffs contributing]: a trait stays listed while any buff names it
+                    entry = totals.power.setdefault(tval, [0, 0])
+                    entry[0] += sign * value
+                    entry[1] += sign
+                    if entry[1] == 0:
+                        del totals.power[tval]
+            elif second is not None:
+                totals.vector[second] += sign * buff['value']
+            totals.count += sign
+            if totals.count == 0:
+                del self._servant_totals[required_field]
+
+        kind = classify_enemy_buff(buff)
+        if kind == FALLBACK:
+            self._track_fallback(self._enemy_fallback, buff, sign)
+        elif kind is not None:
+            self._enemy_vector[kind] += sign * (1 if kind == APPLY_ROME else buff['value'])
+        self._tracked_len = len(self.buffs)
+
+    @staticmethod
+    def _track_fallback(fallback, buff, sign):
+        if sign > 0:
+            fallback.append(buff)
+            return
+        for i, entry in enumerate(fallback):
+            if entry is buff:
+                del fallback[i]
+                return
+        fallback.remove(buff)
+
     def process_end_turn_skills(self):
         add_magic_bullets = False
-        logging.info(f"PROCESSING END TURN SKILLS")
+        logging.debug("Processing end turn skills for %s", self.servant.name)
         for i, buff in enumerate(self.buffs):
             # logging.info(f"step 2.{i}")
             if buff['buff'] == 'NP Gain Each Turn':
@@ -38,93 +213,143 @@ class Buffs:
             self.add_buff(magic_bullet_buff)
 
     def process_enemy_buffs(self):
+        self._sync_aggregates()
+        enemy = self.enemy
+        vector = self._enemy_vector
         # Reset modifiers
-        self.enemy.defense = 0
-        self.enemy.b_resdown = 0
-        self.enemy.a_resdown = 0
-        self.enemy.q_resdown = 0
-        self.enemy.roman = self.enemy.traits.count(2004)
-        # Process buffs and update modifiers
-        # print(f"{self.name} has the following effects applied: {self.buffs}")
-        for buff in self.buffs:
-            if buff['buff'] == 'DEF Down':
-                self.enemy.defense -= buff['value'] / 1000
-            elif buff['buff'] == 'Buster Card Resist Down':
-                self.enemy.b_resdown -= buff['value'] / 1000
-            elif buff['buff'] == 'Arts Card Resist Down':
-                self.enemy.a_resdown -= buff['value'] / 1000
-            elif buff['buff'] == 'Quick Card Resist Down':
-                self.enemy.q_resdown -= buff['value'] / 1000
-            elif buff['buff'] == 'Apply Trait (Rome)':
-                self.enemy.traits.append(2004)
-            # Add more buff processing as needed
-        # print(buff)
+        enemy.defense = 0
+        enemy.b_resdown = 0
+        enemy.a_resdown = 0
+        enemy.q_resdown = 0
+        enemy.roman = enemy.traits.count(2004)
+        if vector[DEF_DOWN]:
+            enemy.defense -= vector[DEF_DOWN] / 1000
+        if vector[BUSTER_RESIST_DOWN]:
+            enemy.b_resdown -= vector[BUSTER_RESIST_DOWN] / 1000
+        if vector[ARTS_RESIST_DOWN]:
+            enemy.a_resdown -= vector[ARTS_RESIST_DOWN] / 1000
+        if vector[QUICK_RESIST_DOWN]:
+            enemy.q_resdown -= vector[QUICK_RESIST_DOWN] / 1000
+        if vector[APPLY_ROME]:
+            # Appended on every pass, as the per-buff rules did
+            enemy.traits.extend([2004] * vector[APPLY_ROME])
+        for buff in self._enemy_fallback:
+            self._process_enemy_buff(buff)
+
+    def _process_enemy_buff(self, buff):
+        if buff['buff'] == 'DEF Down':
+            self.enemy.defense -= buff['value'] / 1000
+        elif buff['buff'] == 'Buster Card Resist Down':
+            self.enemy.b_resdown -= buff['value'] / 1000
+        elif buff['buff'] == 'Arts Card Resist Down':
+            self.enemy.a_resdown -= buff['value'] / 1000
+        elif buff['buff'] == 'Quick Card Resist Down':
+            self.enemy.q_resdown -= buff['value'] / 1000
+        elif buff['buff'] == 'Apply Trait (Rome)':
+            self.enemy.traits.append(2004)
+
+    def modifier_totals(self):
+        """Sum the aggregates that apply to the servant's current fields.
+
+        Returns (vector, power_by_trait). Buffs with a required field are
+        grouped by that field, so this costs one step per distinct field,
+        not per buff.
+        """
+        self._sync_aggregates()
+        totals = self._servant_totals
+        base = totals.get(None)
+        vector = list(base.vector) if base is not None else [0] * SERVANT_KINDS
+        power = {tval: entry[0] for tval, entry in base.power.items()} if base is not None else {}
+        for required_field, conditional in totals.items():
+            if required_field is None or required_field not in self.servant.fields:
+                continue
+            for kind, value in enumerate(conditional.vector):
+                vector[kind] += value
+            for tval, entry in conditional.power.items():
+                power[tval] = power.get(tval, 0) + entry[0]
+        return vector, power
 
     def process_servant_buffs(self):
+        servant = self.servant
+        vector, power = self.modifier_totals()
         # Reset modifiers
-        self.servant.atk_mod = self.servant.user_atk_mod
-        self.servant.b_up = self.servant.user_b_up
-        self.servant.a_up = self.servant.user_a_up
-        self.servant.q_up = self.servant.user_q_up
-        self.servant.power_mod = {}
-        self.servant.np_damage_mod = self.servant.user_np_damage_mod
-        self.servant.oc_level = 1
-        self.servant.np_gain_mod = 1
-        self.servant.buster_card_damage_up = self.servant.user_buster_damage_up
-        self.servant.arts_card_damage_up = self.servant.user_arts_damage_up
-        self.servant.quick_card_damage_up = self.servant.user_quick_damage_up
-
-        # Store a flag for Boost NP Strength Up
-        boost_np_strength_up_active = False
+        servant.atk_mod = servant.user_atk_mod + vector[ATK_UP] / 1000 if vector[ATK_UP] else servant.user_atk_mod
+        servant.b_up = servant.user_b_up + vector[BUSTER_UP] / 1000 if vector[BUSTER_UP] else servant.user_b_up
+        servant.a_up = servant.user_a_up + vector[ARTS_UP] / 1000 if vector[ARTS_UP] else servant.user_a_up
+        servant.q_up = servant.user_q_up + vector[QUICK_UP] / 1000 if vector[QUICK_UP] else servant.user_q_up
+        servant.power_mod = power
+        servant.np_damage_mod = servant.user_np_damage_mod
+        if vector[NP_STRENGTH]:
+            servant.np_damage_mod += vector[NP_STRENGTH] / 1000
+        servant.oc_level = min(1 + vector[OVERCHARGE_UP], 5) if vector[OVERCHARGE_UP] else 1
+        servant.np_gain_mod = 1 + vector[NP_GAIN_UP] / 1000 if vector[NP_GAIN_UP] else 1
+        servant.buster_card_damage_up = servant.user_buster_damage_up
+        servant.arts_card_damage_up = servant.user_arts_damage_up
+        servant.quick_card_damage_up = servant.user_quick_damage_up
+        if vector[BUSTER_DAMAGE_UP]:
+            servant.buster_card_damage_up += vector[BUSTER_DAMAGE_UP] / 1000
+        if vector[ARTS_DAMAGE_UP]:
+            servant.arts_card_damage_up += vector[ARTS_DAMAGE_UP] / 1000
+        if vector[QUICK_DAMAGE_UP]:
+            servant.quick_card_damage_up += vector[QUICK_DAMAGE_UP] / 1000
+        if vector[NP_PER_PROCESS]:
+            # TODO assumes all Triggers Each Turn buffs are for NP gain;
+            # applied every time modifiers are processed, as before
+            servant.np_gauge += vector[NP_PER_PROCESS]
 
-        # Initial pass to calculate np_damage_mod
-        for buff in self.buffs:
+        fallback = self._servant_fallback
+        boost = vector[BOOST_NP_STRENGTH] > 0
+        if fallback:
+            boost = self._process_servant_fallback(fallback, first_pass=True) or boost
+        # Apply the Boost NP Strength Up multiplier
+        if boost:
+            servant.np_damage_mod *= 2
+        if fallback:
+            self._process_servant_fallback(fallback, first_pass=False)
+
+    def _process_servant_fallback(self, buffs, first_pass):
+        """Original per-buff rules, for buffs that could not be classified."""
+        boost_np_strength_up_active = False
+        for buff in buffs:
             required_field = buff.get('script', {}).get('INDIVIDUALITIE', {}).get('id')
             if required_field is None:
                 required_field = buff.get('originalScript', {}).get('INDIVIDUALITIE')
-            if required_field is None or (required_field in self.servant.fields):
+            if required_field is not None and required_field not in self.servant.fields:
+                continue
+            if first_pass:
                 if buff['buff'] == 'NP Strength Up' or buff['buff'] == 'upNpdamage':
                     self.servant.np_damage_mod += buff['value'] / 1000
                 elif buff['buff'] == 'Boost NP Strength Up':
                     boost_np_strength_up_active = True
-
-        # Apply the Boost NP Strength Up multiplier
-        if boost_np_strength_up_active:
-            self.servant.np_damage_mod *= 2
-
-        # Second pass for other buffs
-        for buff in self.buffs:
-            required_field = buff.get('script', {}).get('INDIVIDUALITIE', {}).get('id')
-            if required_field is None:
-                required_field = buff.get('originalScript', {}).get('INDIVIDUALITIE')
-            if required_field is None or (required_field in self.servant.fields):
-                if buff['buff'] == 'ATK Up':
-                    self.servant.atk_mod += buff['value'] / 1000
-                elif buff['buff'] == 'Buster Up':
-                    self.servant.b_up += buff['value'] / 1000
-                elif buff['buff'] == 'Arts Up':
-                    self.servant.a_up += buff['value'] / 1000
-                elif buff['buff'] == 'Quick Up':
-                    self.servant.q_up += buff['value'] / 1000
-                elif buff['buff'] == 'Power Up':
-                    self.servant.power_mod += buff['value'] / 1000
-                elif buff['buff'] in ['NP Overcharge Level Up', 'Overcharge Lv. Up']:
-                    self.servant.oc_level = min(self.servant.oc_level + buff['value'], 5)
-                elif "STR Up" in buff["buff"] or "Strength Up" in buff["buff"]:
-                    for tval in buff['tvals']:
-                        if tval not in self.servant.power_mod:
-                            self.servant.power_mod[tval] = 0
-                        self.servant.power_mod[tval] += buff.get("value", 0)
-                elif 'Triggers Each Turn (Increase NP)' in buff['buff'] or 'Triggers Each Turn (NP Absorb)' in buff['buff']: # TODO assumes all Triggers Each Turn buffs are for NP gain
-                    self.servant.np_gauge += buff['value']
-                elif buff['buff'] == 'NP Gain Up':
-                    self.servant.np_gain_mod += buff['value'] / 1000
-                elif buff['buff'] == 'Buster Card Damage Up':
-                    self.servant.buster_card_damage_up += buff['value'] / 1000
-                elif buff['buff'] == 'Arts Card Damage Up':
-                    self.servant.arts_card_damage_up += buff['value'] / 1000
-                elif buff['buff'] == 'Quick Card Damage Up':
-                    self.servant.quick_card_damage_up += buff['value'] / 1000
+                continue
+            if buff['buff'] == 'ATK Up':
+                self.servant.atk_mod += buff['value'] / 1000
+            elif buff['buff'] == 'Buster Up':
+                self.servant.b_up += buff['value'] / 1000
+            elif buff['buff'] == 'Arts Up':
+                self.servant.a_up += buff['value'] / 1000
+            elif buff['buff'] == 'Quick Up':
+                self.servant.q_up += buff['value'] / 1000
+            elif buff['buff'] == 'Power Up':
+                self.servant.power_mod += buff['value'] / 1000
+            elif buff['buff'] in ['NP Overcharge Level Up', 'Overcharge Lv. Up']:
+                self.servant.oc_level = min(self.servant.oc_level + buff['value'], 5)
+            elif "STR Up" in buff["buff"] or "Strength Up" in buff["buff"]:
+                for tval in buff['tvals']:
+                    if tval not in self.servant.power_mod:
+                        self.servant.power_mod[tval] = 0
+                    self.servant.power_mod[tval] += buff.get("value", 0)
+            elif 'Triggers Each Turn (Increase NP)' in buff['buff'] or 'Triggers Each Turn (NP Absorb)' in buff['buff']:
+                self.servant.np_gauge += buff['value']
+            elif buff['buff'] == 'NP Gain Up':
+                self.servant.np_gain_mod += buff['value'] / 1000
+            elif buff['buff'] == 'Buster Card Damage Up':
+                self.servant.buster_card_damage_up += buff['value'] / 1000
+            elif buff['buff'] == 'Arts Card Damage Up':
+                self.servant.arts_card_damage_up += buff['value'] / 1000
+            elif buff['buff'] == 'Quick Card Damage Up':
+                self.servant.quick_card_damage_up += buff['value'] / 1000
+        return boost_np_strength_up_active
 
     def parse_passive(self, passives_data):
         passives = []
@@ -157,23 +382,84 @@ class Buffs:
             functions.append(parsed_function)
         return functions
 
+    def clone(self, servant=None, enemy=None):
+        """Copy buff state for a cloned owner.
+
+        Buff entries are copied one level deep because turns/count are
+        decremented in place; their svals/tvals are shared.
+        """
+        clone = Buffs.__new__(Buffs)
+        clone.buffs = [buff.copy() for buff in self.buffs]
+        clone.stateful_effects = [effect.copy() for effect in self.stateful_effects] if self.stateful_effects else []
+        clone.counters = {key: counter.copy() for key, counter in self.counters.items()} if self.counters else {}
+        self._sync_aggregates()
+        if self._servant_fallback or self._enemy_fallback:
+            # Fallback lists hold the buff dicts themselves; point them at the copies
+            clone._rebuild_aggregates()
+        else:
+            clone._servant_totals = {field: totals.copy() for field, totals in self._servant_totals.items()}
+            clone._servant_fallback = []
+            clone._enemy_vector = list(self._enemy_vector)
+            clone._enemy_fallback = []
+            clone._tracked = clone.buffs
+            clone._tracked_len = len(clone.buffs)
+        if servant:
+            clone.servant = servant
+        if enemy:
+            clone.enemy = enemy
+        return clone
+
+    def state_key(self):
+        """Order-independent key of the active buffs and counters.
+
+        Buffs are reduced to the fields the engine reads and kept as a
+        sorted multiset of those tuples, so the same buffs applied in a
+        different order give the same key. The tuples are sorted by repr
+        since their values mix None, numbers and strings.
+        """
+        buffs = tuple(sorted(
+            ((buff.get('buff'), buff.get('value'), buff.get('turns'), buff.get('count'),
+              buff.get('trigger_type'), _freeze(buff.get('tvals')), _freeze(buff.get('svals')))
+             for buff in self.buffs),
+            key=repr,
+        ))
+        if not self.counters:
+            return buffs
+        return buffs, _freeze(self.counters)
+
     def add_buff(self, buff: dict):
+        self._sync_aggregates()
         self.buffs.append(buff)
+        self._account(buff, 1)
 
     def remove_buff(self, buff: dict):
+        self._sync_aggregates()
         for i, b in enumerate(self.buffs):
             if buff == b:
-                self.buffs.pop(i)
+                self._account(self.buffs.pop(i), -1)
+
+    def remove(self, buff: dict):
+        """Remove the first matching buff, like list.remove (raises ValueError)."""
+        self._sync_aggregates()
+        self.buffs.remove(buff)
+        self._account(buff, -1)
+
+    def replace_buffs(self, buffs):
+        self.buffs = list(buffs)
+        self._rebuild_aggregates()
 
     def decrement_buffs(self):
+        self._sync_aggregates()
         for buff in self.buffs[:]:
             if buff['turns'] > 0:
                 buff['turns'] -= 1
             if buff['turns'] == 0:
                 self.buffs.remove(buff)
+                self._account(buff, -1)
 
     def clear_buff(self, str):
         self.buffs = [i for i in self.buffs if i['buff'] != str]
+        self._rebuild_aggregates()
 
     def grouped_str(self):
         from collections import defaultdict
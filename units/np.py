@@ -8,8 +8,9 @@
 # - Special NP damage calculation functions
 
 class NP:
-    def __init__(self, nps_data):
-        self.nps = self.parse_noble_phantasms(nps_data)
+    def __init__(self, nps_data, compiled=None):
+        # A table from NP.compile() is shared read-only between instances
+        self.nps = compiled if compiled is not None else self.parse_noble_phantasms(nps_data)
         self.card = self.nps[-1]['card'] if self.nps else None  # Default to the highest ID NP
 
     def parse_noble_phantasms(self, nps_data):
@@ -25,6 +26,11 @@ class NP:
 
         return sorted_nps
 
+    @classmethod
+    def compile(cls, nps_data):
+        """Sort and number NP versions once so NP instances can share them."""
+        return tuple(cls.__new__(cls).parse_noble_phantasms(nps_data))
+
     def get_np_by_id(self, new_id=None):
         if new_id is None:
             return self.nps[-1]  # Default to the highest ID NP
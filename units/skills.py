@@ -19,8 +19,10 @@
 # }
 
 class Skills:
-    def __init__(self, skills_data, append_5, mystic_code=None):
-        self.skills = self.parse_skills(skills_data)
+    def __init__(self, skills_data, append_5, mystic_code=None, compiled=None):
+        # A table from Skills.compile() is shared read-only between instances;
+        # only the cooldown bookkeeping below is per instance.
+        self.skills = compiled if compiled is not None else self.parse_skills(skills_data)
         self.cooldowns = {1: 0, 2: 0, 3: 0}
         self.max_cooldowns = self.initialize_max_cooldowns()
         self.cooldown_reduction_applied = {1: False, 2: False, 3: False}
@@ -76,6 +78,15 @@ class Skills:
             skills[int(skill['num'])].append(parsed_skill)
         return skills
 
+    @classmethod
+    def compile(cls, skills_data):
+        """Parse skills_data once into a table that Skills instances can share.
+
+        Variant lists become tuples so accidental in-place edits fail loudly.
+        """
+        parsed = cls.__new__(cls).parse_skills(skills_data)
+        return {num: tuple(variants) for num, variants in parsed.items()}
+
     def initialize_max_cooldowns(self):
         max_cooldowns = {}
         for i in range(1, len(self.skills) + 1):
@@ -85,6 +96,14 @@ class Skills:
                 max_cooldowns[i] = 0
         return max_cooldowns
 
+    def clone(self):
+        """Copy cooldown state; the parsed skill table is shared."""
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        clone.cooldowns = dict(self.cooldowns)
+        clone.cooldown_reduction_applied = dict(self.cooldown_reduction_applied)
+        return clone
+
     def get_skill_by_num(self, num):
         if 1 <= num < len(self.skills) + 1:
             if not self.skills[num]:  # Handle empty skill list
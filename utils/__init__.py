@@ -0,0 +1,4 @@
+from .lru import LRUCache
+from .transposition import TranspositionTable
+
+__all__ = ['LRUCache', 'TranspositionTable']
@@ -0,0 +1,142 @@
+"""Read-only game data bundle: servants, quests and mystic codes in one file.
+
+A bundle is a sqlite database with one ``docs`` table keyed by
+(collection, key), holding each document as zlib-compressed JSON. It is
+opened immutable and memory-mapped, so a simulator process can serve
+lookups without MongoDB, a network connection or credentials.
+
+BundleDB exposes the small slice of the pymongo collection API the
+simulator uses (``find_one`` on the key field, ``find`` with ``$in`` on the
+key field and top-level projections), which lets it stand in for the
+Mongo ``db`` object in scripts/connectDB.py.
+"""
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+# Collection name -> key field, mirroring the Mongo collections
+COLLECTION_KEYS = {
+    'servants': 'collectionNo',
+    'quests': 'id',
+    'mysticcodes': 'id',
+}
+
+BUNDLE_MMAP_SIZE = 256 * 1024 * 1024
+
+
+def encode_doc(doc):
+    doc = {k: v for k, v in doc.items() if k != '_id'}
+    return zlib.compress(json.dumps(doc, separators=(',', ':'), default=str).encode('utf-8'))
+
+
+def decode_doc(body):
+    return json.loads(zlib.decompress(body))
+
+
+def write_bundle(path, collections):
+    """Write collections ({name: iterable of docs}) to a new bundle at path.
+
+    The bundle is written next to path and renamed into place, so readers
+    never see a half-written file. Returns {name: document count}.
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    counts = {}
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute(
+            "CREATE TABLE docs (collection TEXT NOT NULL, key INTEGER NOT NULL, source_hash TEXT, "
+            "body BLOB NOT NULL, PRIMARY KEY (collection, key)) WITHOUT ROWID"
+        )
+        for name, docs in collections.items():
+            key_field = COLLECTION_KEYS[name]
+            rows = [(name, doc[key_field], doc.get('sourceHash'), encode_doc(doc)) for doc in docs if doc.get(key_field) is not None]
+            conn.executemany("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?)", rows)
+            counts[name] = len(rows)
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return counts
+
+
+def _project(doc, projection):
+    if not projection:
+        return doc
+    included = {field for field, flag in projection.items() if flag and '.' not in field}
+    if not included:
+        return doc
+    return {field: doc[field] for field in included if field in doc}
+
+
+class BundleCollection:
+    def __init__(self, bundle, name):
+        self.bundle = bundle
+        self.name = name
+        self.key = COLLECTION_KEYS[name]
+
+    def find_one(self, query, projection=None):
+        key = (query or {}).get(self.key)
+        if key is None or isinstance(key, dict):
+            raise ValueError(f"bundle {self.name}.find_one only supports lookups by {self.key}")
+        row = self.bundle.execute(
+            "SELECT body FROM docs WHERE collection = ? AND key = ?", (self.name, key)
+        ).fetchone()
+        return _project(decode_doc(row[0]), projection) if row else None
+
+    def find(self, query=None, projection=None):
+        query = query or {}
+        condition = query.get(self.key)
+        if set(query) - {self.key}:
+            raise ValueError(f"bundle {self.name}.find only supports queries on {self.key}")
+        if condition is None:
+            rows = self.bundle.execute("SELECT body FROM docs WHERE collection = ? ORDER BY key", (self.name,))
+        elif isinstance(condition, dict) and set(condition) == {'$in'}:
+            keys = list(condition['$in'])
+            placeholders = ','.join('?' * len(keys))
+            rows = self.bundle.execute(
+                f"SELECT body FROM docs WHERE collection = ? AND key IN ({placeholders}) ORDER BY key", (self.name, *keys)
+            ) if keys else []
+        else:
+            rows = self.bundle.execute(
+                "SELECT body FROM docs WHERE collection = ? AND key = ?", (self.name, condition)
+            )
+        return [_project(decode_doc(row[0]), projection) for row in rows]
+
+
+class BundleDB:
+    """Stand-in for the Mongo database handle, backed by a bundle file."""
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Game data bundle not found: {path}")
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        self.servants = BundleCollection(self, 'servants')
+        self.quests = BundleCollection(self, 'quests')
+        self.mysticcodes = BundleCollection(self, 'mysticcodes')
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def _connect(self):
+        # sqlite connections must not cross threads or a fork, so each
+        # thread of each process opens its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size = {BUNDLE_MMAP_SIZE}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def execute(self, sql, params=()):
+        return self._connect().execute(sql, params)
+
+    def stats(self):
+        rows = self.execute("SELECT collection, COUNT(*) FROM docs GROUP BY collection").fetchall()
+        return dict(rows)
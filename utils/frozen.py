@@ -0,0 +1,31 @@
+"""Read-only views of parsed game data shared between runs and threads."""
+
+
+class FrozenDict(dict):
+    """dict that refuses mutation; still a dict for isinstance, .get and JSON.
+
+    Copies (dict(d), d.copy()) are plain, mutable dicts.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(f"{type(self).__name__} is read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        # pickle/deepcopy would otherwise refill the dict through __setitem__
+        return (type(self), (dict(self),))
+
+
+def freeze(value):
+    """Recursively turn dicts into FrozenDicts and lists into tuples."""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
@@ -0,0 +1,42 @@
+import logging
+import os
+import sys
+import threading
+
+LOG_FORMAT = '%(asctime)s:%(levelname)s:%(message)s'
+DEFAULT_LOG_FILE = './outputs/output.log'
+
+_lock = threading.Lock()
+_initialized = False
+
+
+def init_logging(filename=None, level=logging.INFO, force=False):
+    """Route simulator logging to a file, once per process.
+
+    Driver calls this on construction, so importing the engine configures
+    nothing. filename defaults to SIM_LOG_FILE or ./outputs/output.log; an
+    empty SIM_LOG_FILE leaves logging unconfigured. As with basicConfig, an
+    application that configured the root logger first keeps its handlers.
+    """
+    global _initialized
+    if _initialized and not force:
+        return
+    with _lock:
+        if _initialized and not force:
+            return
+        _initialized = True
+        # Servant and skill names are printed verbatim
+        reconfigure = getattr(sys.stdout, 'reconfigure', None)
+        if reconfigure is not None:
+            try:
+                reconfigure(encoding='utf-8')
+            except (ValueError, OSError):
+                pass
+        if filename is None:
+            filename = os.getenv('SIM_LOG_FILE', DEFAULT_LOG_FILE)
+        if not filename:
+            return
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        logging.basicConfig(filename=filename, level=level, format=LOG_FORMAT, force=force)
@@ -0,0 +1,256 @@
+"""Process-wide timing histograms served in Prometheus text format.
+
+The simulator records how long data loads, tokens, setup and whole
+simulations take, and the MongoDB clients report every command's
+latency. Cache and pool counters are not recorded at all: collectors
+registered here read them when /metrics is scraped.
+
+Recording is controlled by SIM_METRICS:
+- auto (default): off until the first scrape, so a deployment nobody
+  scrapes pays one flag check per timed call.
+- on: record from process start.
+- off: never record; a scrape still returns the collector values.
+
+Hot paths check the flag themselves:
+
+    if registry.enabled:
+        start = time.perf_counter()
+        ...
+        TOKEN_SECONDS.labels(action.kind).observe(time.perf_counter() - start)
+
+With SIM_POOL_KIND=process the simulations run in worker processes and
+their timings are not visible to the API process.
+"""
+import contextlib
+import functools
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+
+METRICS_MODES = ('auto', 'on', 'off')
+# Seconds; simulation phases range from tens of microseconds to seconds
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        # Per bucket, not cumulative; the last slot is +Inf
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class Histogram:
+    """Prometheus histogram with optional labels (fixed at creation)."""
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._children = {}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, child in sorted(self._children.items()):
+            counts, total, count = child.snapshot()
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket
+                labels = _format_labels(self.labelnames, values, [('le', _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, mode='auto'):
+        if mode not in METRICS_MODES:
+            raise ValueError(f"Unknown SIM_METRICS mode {mode!r}; expected one of {METRICS_MODES}")
+        self.mode = mode
+        self.enabled = mode == 'on'
+        self._histograms = []
+        self._collectors = []
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        histogram = Histogram(self, name, documentation, labelnames, buckets)
+        self._histograms.append(histogram)
+        return histogram
+
+    def register_collector(self, collector):
+        """collector() yields (name, type, help, [(labels dict, value), ...])
+        and is called on every scrape."""
+        self._collectors.append(collector)
+        return collector
+
+    def register_cache(self, name, cache):
+        """Export an LRUCache's stats() under cache=name."""
+        self.register_collector(functools.partial(_cache_samples, name, cache))
+
+    def render(self):
+        """The Prometheus text exposition; in auto mode this starts recording."""
+        if self.mode == 'auto':
+            self.enabled = True
+        lines = []
+        for histogram in self._histograms:
+            lines.extend(histogram.render())
+        families = {}
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                family = families.setdefault(name, (kind, documentation, []))
+                family[2].extend(samples)
+        for name, (kind, documentation, samples) in families.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        for histogram in self._histograms:
+            histogram.clear()
+
+
+def _cache_samples(name, cache):
+    stats = cache.stats()
+    labels = {'cache': name}
+    yield 'fgo_cache_hits_total', 'counter', 'Cache lookups that found an entry.', [(labels, stats['hits'])]
+    yield 'fgo_cache_misses_total', 'counter', 'Cache lookups that found nothing.', [(labels, stats['misses'])]
+    yield 'fgo_cache_evictions_total', 'counter', 'Entries dropped to stay within max size.', [(labels, stats['evictions'])]
+    yield 'fgo_cache_entries', 'gauge', 'Entries currently cached.', [(labels, stats['size'])]
+    yield 'fgo_cache_hit_ratio', 'gauge', 'Hits over lookups since start (NaN before any lookup).', [(labels, stats['hit_rate'])]
+
+
+registry = MetricsRegistry(os.getenv('SIM_METRICS', 'auto'))
+
+DATA_LOAD_SECONDS = registry.histogram(
+    'fgo_sim_data_load_seconds', 'Time to load game data for a simulation (cache hits included).', ['source'])
+SETUP_SECONDS = registry.histogram(
+    'fgo_sim_setup_seconds', 'Time to build the Driver, team, quest and mystic code for a simulation.')
+TOKEN_SECONDS = registry.histogram(
+    'fgo_sim_token_seconds', 'Time to execute one command token, by token kind (np fires NPs, end_turn ends turns).',
+    ['kind'])
+SIMULATION_SECONDS = registry.histogram(
+    'fgo_sim_simulation_seconds', 'Time of a whole simulate() call.')
+MONGO_COMMAND_SECONDS = registry.histogram(
+    'fgo_mongo_command_seconds', 'MongoDB command latency as reported by the driver.',
+    ['command', 'collection', 'status'])
+
+
+def timed(histogram, *label_values):
+    """Decorator observing the call time of func while recording is on."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            child = histogram.labels(*label_values)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+@contextlib.contextmanager
+def time_block(histogram, *label_values):
+    if not registry.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(*label_values).observe(time.perf_counter() - start)
+
+
+def mongo_listener():
+    """A pymongo CommandListener feeding MONGO_COMMAND_SECONDS; pass it to
+    MongoClient(event_listeners=[...])."""
+    from pymongo import monitoring
+
+    class MongoCommandTimer(monitoring.CommandListener):
+        def __init__(self):
+            # request_id -> collection, only kept while recording
+            self._collections = {}
+
+        def started(self, event):
+            if registry.enabled:
+                collection = event.command.get(event.command_name)
+                if not isinstance(collection, str):
+                    # getMore names the collection separately
+                    collection = event.command.get('collection', '')
+                self._collections[event.request_id] = collection
+
+        def _finish(self, event, status):
+            collection = self._collections.pop(event.request_id, None)
+            if collection is not None and registry.enabled:
+                MONGO_COMMAND_SECONDS.labels(event.command_name, collection, status).observe(
+                    event.duration_micros / 1e6)
+
+        def succeeded(self, event):
+            self._finish(event, 'ok')
+
+        def failed(self, event):
+            self._finish(event, 'failed')
+
+    return MongoCommandTimer()
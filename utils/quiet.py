@@ -0,0 +1,38 @@
+import contextlib
+import logging
+import sys
+
+
+class NullWriter:
+    """File-like sink for the engine's per-action print() output."""
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def silence_engine():
+    """Drop engine prints and INFO logs for the rest of this process.
+
+    Meant for worker processes that only report results.
+    """
+    sys.stdout = NullWriter()
+    logging.disable(logging.INFO)
+
+
+@contextlib.contextmanager
+def quiet_engine():
+    # The engine prints and logs at INFO on every action; inside a benchmark
+    # that is thousands of lines per second and most of the run time.
+    # sys.stdout and logging.disable are process-wide, so this is for
+    # single-threaded tools only; overlapping uses restore them out of order.
+    # Request handlers build their Drivers with trace='off' instead.
+    previous = logging.root.manager.disable
+    logging.disable(logging.INFO)
+    try:
+        with contextlib.redirect_stdout(NullWriter()):
+            yield
+    finally:
+        logging.disable(previous)
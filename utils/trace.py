@@ -0,0 +1,141 @@
+"""Run-scoped trace of what the engine did, recorded as structured events.
+
+The engine used to format and print/log a line for every token, NP hit
+and buff whether or not anyone read it; in batch and API runs that text
+was most of the run time. Now every GameManager carries a Tracer and the
+hot paths guard their events with a flag check:
+
+    tracer = self.gm.tracer
+    if tracer.full:
+        tracer.emit('np_hit', servant=servant.name, ...)
+
+so with tracing off nothing is formatted or even collected. Events go
+into a preallocated ring buffer (the oldest are dropped once it is full)
+and are turned into text only when render() is called.
+
+Levels:
+- off: record nothing.
+- summary: tokens, NP totals, wave and turn outcomes.
+- full: also per-hit damage, damage terms, triggers and buff timers.
+- echo: full, and print/log each line as it happens, like the engine
+  always did. The default for a bare Driver, so interactive runs keep
+  their console output; SIM_TRACE overrides it.
+"""
+import logging
+import os
+
+OFF, SUMMARY, FULL = 0, 1, 2
+LEVELS = {'off': OFF, 'summary': SUMMARY, 'full': FULL, 'echo': FULL}
+
+TRACE_CAPACITY = int(os.getenv('SIM_TRACE_CAPACITY', '4096'))
+
+# kind -> (template, channel). echo sends 'print' lines to stdout, 'log'
+# lines to logging.info and 'both' to both, as the engine used to.
+TEMPLATES = {
+    'token': ("Executing TOKEN: {token}", 'both'),
+    'invalid_token': ("Invalid token: {token}", 'log'),
+    'skill_used': ("Skill {skill} of {servant} used. Cooldown remaining: {cooldown} turns", 'log'),
+    'skill_on_cooldown': ("{servant} skill {skill} is on cooldown: {cooldown} turns remaining", 'print'),
+    'mc_skill_used': ("Using Mystic Code skill: {name}", 'print'),
+    'mc_skill_on_cooldown': ("Mystic Code skill {skill} is on cooldown: {cooldown} turns remaining", 'print'),
+    'swap': ("Swapping frontline servant {front} with backline servant {back}", 'print'),
+    'invalid_swap': ("Invalid swap indices: frontline {front}, backline {back}", 'print'),
+    'buff_added': ("added buff {buff} to {target}", 'log'),
+    'trigger_check': ("run_triggered_buff check: buff={buff} trigger_type={trigger_type} card_type={card_type} svals={svals} tvals={tvals} count={count}", 'log'),
+    'trigger_grant': ("run_triggered_buff: granting NP {grant}% to {servant}", 'log'),
+    'trigger_counter': ("run_triggered_buff: detected counter-style trigger for {buff}", 'log'),
+    'np_overcharge': ("Servant {servant} has {gauge} NP% and can apply OVERCHARGE UP 1 * {times} times", 'print'),
+    'np_not_ready': ("{servant} does not have enough NP gauge: {gauge}", 'print'),
+    'np_fire': ("firing {kind} NP of servant {servant}", 'log'),
+    'np_terms': ("{servant} vs {target}: {terms}", 'log'),
+    'np_hit': ("{servant} deals {damage} to {target} who has {hp} hp left and gains {refund}% np", 'log'),
+    'np_defeated': ("{target} has been defeated by hit {hit}!", 'log'),
+    'np_damage': ("{servant} deals {damage} to {target} who has {hp} hp left and gains {refund}% np | HP: {hp}/{initial_hp} | Fraction Remaining: {fraction}", 'print'),
+    'np_se_damage': ("{servant} attacks {target} with Noble Phantasm for {damage:.0f} total damage! {target} is left with {hp} hp", 'print'),
+    'servant_removed': ("{message}", 'log'),
+    'party_buffs': ("{report}", 'print'),
+    'servant_died': ("Servant {servant} has died.", 'print'),
+    'servant_moved_up': ("Servant {servant} has moved to the front line.", 'print'),
+    'no_backline': ("No backline servants available.", 'print'),
+    'buff_timers': ("{target} buffs before/after decrement: {before} -> {after}", 'log'),
+    'wave_cleared': ("Wave {wave} completed.", 'print'),
+    'quest_cleared': ("All waves completed. Ending program.", 'print'),
+    'next_wave': ("Advancing to wave {wave}", 'print'),
+    'end_turn_failed': ("End turn failed: Enemies are still alive. {enemies}", 'print'),
+    'transform': ("{message}", 'print'),
+}
+
+
+def render_event(kind, fields):
+    template = TEMPLATES.get(kind)
+    try:
+        return template[0].format(**fields)
+    except (TypeError, KeyError, IndexError, ValueError):
+        return f"{kind} {fields}"
+
+
+class Tracer:
+    """Structured, bounded event log for one simulation run."""
+
+    __slots__ = ('level', 'summary', 'full', 'echo', 'capacity', 'dropped', '_events', '_next', '_count')
+
+    def __init__(self, level='off', capacity=None):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown trace level {level!r}; expected one of {sorted(LEVELS)}")
+        self.level = level
+        self.summary = LEVELS[level] >= SUMMARY
+        self.full = LEVELS[level] >= FULL
+        self.echo = level == 'echo'
+        self.capacity = capacity or TRACE_CAPACITY
+        self.dropped = 0
+        # Allocated once, and only when something will be recorded
+        self._events = [None] * self.capacity if self.summary else []
+        self._next = 0
+        self._count = 0
+
+    @classmethod
+    def from_env(cls, default='echo'):
+        return cls(os.getenv('SIM_TRACE', default))
+
+    def emit(self, kind, /, **fields):
+        """Record an event; callers check summary/full first."""
+        if self._count == self.capacity:
+            self.dropped += 1
+        else:
+            self._count += 1
+        self._events[self._next] = (kind, fields)
+        self._next = (self._next + 1) % self.capacity
+        if self.echo:
+            line = render_event(kind, fields)
+            channel = TEMPLATES.get(kind, (None, 'log'))[1]
+            if channel in ('print', 'both'):
+                print(line)
+            if channel in ('log', 'both'):
+                logging.info(line)
+
+    def events(self):
+        """Recorded (kind, fields) pairs, oldest first."""
+        if self._count < self.capacity:
+            return self._events[:self._count]
+        return self._events[self._next:] + self._events[:self._next]
+
+    def render(self):
+        return [render_event(kind, fields) for kind, fields in self.events()]
+
+    def text(self):
+        return "\n".join(self.render())
+
+    def clear(self):
+        self._next = self._count = self.dropped = 0
+
+    def __len__(self):
+        return self._count
+
+
+def make_tracer(trace=None):
+    """A Tracer from a level name, an existing Tracer, or SIM_TRACE."""
+    if isinstance(trace, Tracer):
+        return trace
+    if trace is None:
+        return Tracer.from_env()
+    return Tracer(trace)
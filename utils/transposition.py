@@ -0,0 +1,63 @@
+import hashlib
+import os
+
+from .lru import LRUCache
+
+TRANSPOSITION_TABLE_SIZE = int(os.getenv('TRANSPOSITION_TABLE_SIZE', '500000'))
+
+
+def state_digest(state_key):
+    """SHA-256 of the canonical serialization of a state key."""
+    return hashlib.sha256(repr(state_key).encode()).digest()
+
+
+class TranspositionTable:
+    """Bounded memory of visited search states.
+
+    States are stored under a SHA-256 digest of the state key's repr, not
+    under hash(state_key): tuple hashes collide easily (hash((-1,)) ==
+    hash((-2,))), and a collision would prune a reachable state. The key
+    is built from tuples, numbers, strings and None only, so its repr is a
+    faithful serialization, and a 32-byte digest keeps entries small where
+    full keys run to kilobytes. Each entry is a tuple of numbers, lower is
+    better in every position (e.g. cost, token count, action floor). A
+    state is dominated when a stored entry is no worse in every position.
+
+    Eviction is least-recently-used, so running out of room only loses
+    pruning opportunities, never correctness.
+    """
+
+    def __init__(self, max_size=TRANSPOSITION_TABLE_SIZE):
+        self._entries = LRUCache(max_size)
+        self.probes = 0
+        self.cutoffs = 0
+
+    def check_and_store(self, state_key, entry):
+        """Return True if state_key was already reached with a dominating entry.
+
+        Otherwise entry is recorded for the state and False is returned.
+        """
+        self.probes += 1
+        digest = state_digest(state_key)
+        stored = self._entries.get(digest)
+        if stored is not None and all(old <= new for old, new in zip(stored, entry)):
+            self.cutoffs += 1
+            return True
+        self._entries.put(digest, entry)
+        return False
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        stats = self._entries.stats()
+        return {
+            'size': stats['size'],
+            'max_size': stats['max_size'],
+            'evictions': stats['evictions'],
+            'probes': self.probes,
+            'cutoffs': self.cutoffs,
+        }
+
+    def __len__(self):
+        return len(self._entries)